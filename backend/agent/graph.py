@@ -2,26 +2,54 @@
 graph.py — LangGraph flow for Manufacturing BI Copilot.
 
 Pipeline:
-  ingest_question → fast_path_sql → guardrail → execute_sql
-                                                     ↓ (success)
-                                               suggest_chart → explain_answer → END
-                                                     ↓ (fail, retry_count == 0)
-                                               retry_sql → execute_sql
-                                                     ↓ (success or fail)
-                                               suggest_chart → explain_answer → END
+  ingest_question → fast_path_sql → analyze_sql → guardrail ─┬→ cost_gate → execute_sql ─┐
+                                                             └→ explain_answer ─────────┤
+                                                                                        │
+  execute_sql ↓ (success, or fail after retry)                                          │
+        suggest_chart ──────────────────────────────────────────────────→ finalize_answer → END
+  execute_sql ↓ (fail, retry_count == 0)
+        retry_sql → analyze_sql → guardrail → …   (re-checks and re-explains the corrected SQL)
+
+analyze_sql parses each candidate once; guardrail, cost_gate, the result
+cache and the logs reuse that parse.
+
+cost_gate EXPLAINs each candidate and auto-LIMITs or rejects queries whose
+estimated cost / row count is over budget (Postgres only; no-op elsewhere).
+
+explain_answer only needs the question and the SQL text, so its LLM call
+runs in the same superstep as execute_sql instead of after suggest_chart.
+It explains sql_candidates[0] as generated; when the executed SQL differs
+(a hedged run won by another candidate, a cost_gate auto-LIMIT),
+finalize_answer re-explains chosen_sql so the explanation always matches.
+
+Because of that fan-out, explain_answer can complete before execute_sql.
+/agent/nl2sql/stream therefore holds the explanation back and sends
+  sql → rows → [sql (retry) → rows] → chart → explanation → done
+with a single explanation event carrying the final value.
 """
 
 from langgraph.graph import StateGraph, END
 
+from backend.utils.metrics import timed_node
+
 from .state import AgentState
 from .nodes import (
     ingest_question,
     fast_path_sql,
+    analyze_sql_node,
     guardrail,
+    cost_gate,
     execute_sql_node,
     retry_sql,              # ✅ new import
     suggest_chart_node,
     explain_answer,
+    finalize_answer,
+    afinalize_answer,
+    afast_path_sql,
+    acost_gate,
+    aexecute_sql_node,
+    aretry_sql,
+    aexplain_answer,
 )
 
 
@@ -42,42 +70,74 @@ def _route_after_execute(state: AgentState) -> str:
     return "suggest_chart"
 
 
-def build_graph() -> StateGraph:
+def build_graph(use_async: bool = False) -> StateGraph:
     """
     Build and compile the agent graph with lightweight retry.
 
+    use_async=True registers the async node twins (LLM via ainvoke, SQL via
+    the asyncpg engine); drive that graph with ``ainvoke``. Cheap CPU-only
+    nodes (ingest, analyze, guardrail, chart) are shared by both variants.
+
     Flow:
         ingest_question
             ↓
         fast_path_sql   (single SQL, schema from cache)
             ↓
-        guardrail       (block dangerous DML/DDL)
+        analyze_sql     (parse once: type, tables, LIMIT, fingerprint)
             ↓
-        execute_sql     (run the query)
+        guardrail       (single read-only query only)
+            ↓ fan-out
+        cost_gate → execute_sql  ‖  explain_answer
             ↓ [conditional]
-          fail + no retry → retry_sql → execute_sql
+          fail + no retry → retry_sql → analyze_sql → guardrail → …
           success / 2nd attempt → suggest_chart
-            ↓
-        explain_answer
+            ↓ join (suggest_chart + explain_answer)
+        finalize_answer (re-explains chosen_sql if the explanation is stale)
             ↓
            END
+
+    cost_gate / execute_sql and explain_answer return partial updates over
+    disjoint keys, so they can safely write in the same superstep.
     """
     builder = StateGraph(AgentState)
 
-    # Register all nodes
-    builder.add_node("ingest_question", ingest_question)
-    builder.add_node("fast_path_sql",   fast_path_sql)
-    builder.add_node("guardrail",       guardrail)
-    builder.add_node("execute_sql",     execute_sql_node)
-    builder.add_node("retry_sql",       retry_sql)       # ✅ new node
-    builder.add_node("suggest_chart",   suggest_chart_node)
-    builder.add_node("explain_answer",  explain_answer)
+    if use_async:
+        sql_node, gate_node, exec_node, retry_node, explain_node, final_node = (
+            afast_path_sql, acost_gate, aexecute_sql_node, aretry_sql, aexplain_answer,
+            afinalize_answer,
+        )
+    else:
+        sql_node, gate_node, exec_node, retry_node, explain_node, final_node = (
+            fast_path_sql, cost_gate, execute_sql_node, retry_sql, explain_answer,
+            finalize_answer,
+        )
+
+    # Register all nodes — each wrapped with a latency histogram (/metrics)
+    nodes = {
+        "ingest_question": ingest_question,
+        "fast_path_sql":   sql_node,
+        "analyze_sql":     analyze_sql_node,
+        "guardrail":       guardrail,
+        "cost_gate":       gate_node,
+        "execute_sql":     exec_node,
+        "retry_sql":       retry_node,      # ✅ new node
+        "suggest_chart":   suggest_chart_node,
+        "explain_answer":  explain_node,
+        "finalize_answer": final_node,
+    }
+    for name, fn in nodes.items():
+        builder.add_node(name, timed_node(name, fn))
 
     # Straight edges
     builder.set_entry_point("ingest_question")
     builder.add_edge("ingest_question", "fast_path_sql")
-    builder.add_edge("fast_path_sql",   "guardrail")
-    builder.add_edge("guardrail",       "execute_sql")
+    builder.add_edge("fast_path_sql",   "analyze_sql")
+    builder.add_edge("analyze_sql",     "guardrail")
+
+    # Fan-out: run the query and explain it concurrently
+    builder.add_edge("guardrail",       "cost_gate")
+    builder.add_edge("cost_gate",       "execute_sql")
+    builder.add_edge("guardrail",       "explain_answer")
 
     # ✅ Conditional edge: retry once on failure
     builder.add_conditional_edges(
@@ -89,11 +149,12 @@ def build_graph() -> StateGraph:
         }
     )
 
-    # ✅ Retry loops back into execute_sql (not guardrail — LLM already filtered)
-    builder.add_edge("retry_sql",     "execute_sql")
+    # ✅ Retry loops back through analysis + guardrail (the parse is cheap),
+    # which fan out to cost_gate and explain_answer for the corrected SQL.
+    builder.add_edge("retry_sql",     "analyze_sql")
 
-    # Remaining straight edges
-    builder.add_edge("suggest_chart", "explain_answer")
-    builder.add_edge("explain_answer", END)
+    # Join: wait for both the chart and the (latest) explanation
+    builder.add_edge(["suggest_chart", "explain_answer"], "finalize_answer")
+    builder.add_edge("finalize_answer", END)
 
     return builder.compile()
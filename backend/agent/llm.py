@@ -0,0 +1,201 @@
+"""
+llm.py — Pluggable chat-model backend for the agent nodes.
+
+LLM_BACKEND selects what ``get_llm`` returns:
+
+  openai  ChatOpenAI (default)
+  record  ChatOpenAI, and every response is also written to a cassette
+  replay  no network: responses are served from cassettes, optionally
+          after a simulated delay (LLM_REPLAY_LATENCY_MS — a number of ms,
+          or "recorded" to sleep for the latency measured when recording)
+  stub    no network, no cassettes: every SQL prompt gets LLM_STUB_SQL and
+          every explain prompt a fixed sentence, after LLM_STUB_LATENCY_MS
+          (load tests)
+
+A cassette is one JSON file per prompt in LLM_CASSETTE_DIR, named by the
+SHA-256 of (model, temperature, messages). A replay miss raises
+``CassetteMiss`` rather than falling through to the API, so an offline run
+never silently goes online.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from langchain_openai import ChatOpenAI
+
+from backend.config import (
+    OPENAI_API_KEY,
+    OPENAI_MODEL,
+    LLM_BACKEND,
+    LLM_CASSETTE_DIR,
+    LLM_REPLAY_LATENCY_MS,
+    LLM_STUB_SQL,
+    LLM_STUB_LATENCY_MS,
+)
+
+logger = logging.getLogger("bi_copilot")
+
+Messages = List[Dict[str, str]]
+
+
+class LLMResponse(NamedTuple):
+    content: str
+
+
+class CassetteMiss(RuntimeError):
+    """Replay mode found no recorded response for a prompt."""
+
+
+def prompt_hash(model: str, temperature: float, messages: Messages) -> str:
+    payload = json.dumps(
+        {"model": model, "temperature": temperature, "messages": messages},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CassetteStore:
+    """Prompt-hash → recorded response, one JSON file per entry."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return None
+
+    def save(self, key: str, entry: Dict[str, Any]) -> None:
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        os.makedirs(self.directory, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(entry, fh, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+
+
+def _openai(temperature: float) -> ChatOpenAI:
+    if not OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY is not set.")
+    return ChatOpenAI(model=OPENAI_MODEL, temperature=temperature)
+
+
+class RecordingLLM:
+    """Calls OpenAI and writes each response to the cassette store."""
+
+    def __init__(self, store: CassetteStore, temperature: float = 0.0):
+        self._store = store
+        self._temperature = temperature
+        self._llm = _openai(temperature)
+
+    def _record(self, messages: Messages, content: str, latency_ms: float) -> None:
+        key = prompt_hash(OPENAI_MODEL, self._temperature, messages)
+        try:
+            self._store.save(key, {
+                "model": OPENAI_MODEL,
+                "temperature": self._temperature,
+                "messages": messages,
+                "content": content,
+                "latency_ms": latency_ms,
+            })
+        except OSError as exc:
+            logger.warning("Could not record LLM cassette %s: %s", key[:12], exc)
+
+    def invoke(self, messages: Messages) -> LLMResponse:
+        start = time.time()
+        resp = self._llm.invoke(messages)
+        self._record(messages, resp.content, (time.time() - start) * 1000.0)
+        return LLMResponse(resp.content)
+
+    async def ainvoke(self, messages: Messages) -> LLMResponse:
+        start = time.time()
+        resp = await self._llm.ainvoke(messages)
+        self._record(messages, resp.content, (time.time() - start) * 1000.0)
+        return LLMResponse(resp.content)
+
+
+class ReplayLLM:
+    """Serves recorded responses; never touches the network."""
+
+    def __init__(self, store: CassetteStore, temperature: float = 0.0,
+                 latency_ms: str = LLM_REPLAY_LATENCY_MS):
+        self._store = store
+        self._temperature = temperature
+        self._latency_ms = latency_ms
+
+    def _lookup(self, messages: Messages) -> Dict[str, Any]:
+        key = prompt_hash(OPENAI_MODEL, self._temperature, messages)
+        entry = self._store.load(key)
+        if entry is None:
+            raise CassetteMiss(
+                f"No recorded LLM response for prompt {key[:12]} in {self._store.directory}; "
+                "run once with LLM_BACKEND=record."
+            )
+        return entry
+
+    def _delay_s(self, entry: Dict[str, Any]) -> float:
+        if self._latency_ms == "recorded":
+            return float(entry.get("latency_ms", 0.0)) / 1000.0
+        return float(self._latency_ms or 0.0) / 1000.0
+
+    def invoke(self, messages: Messages) -> LLMResponse:
+        entry = self._lookup(messages)
+        delay = self._delay_s(entry)
+        if delay > 0:
+            time.sleep(delay)
+        return LLMResponse(entry["content"])
+
+    async def ainvoke(self, messages: Messages) -> LLMResponse:
+        entry = self._lookup(messages)
+        delay = self._delay_s(entry)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return LLMResponse(entry["content"])
+
+
+class StubLLM:
+    """Canned responses after a fixed delay — isolates our overhead under load."""
+
+    def __init__(self, sql: str = LLM_STUB_SQL, latency_ms: float = LLM_STUB_LATENCY_MS):
+        self._sql = sql
+        self._delay_s = latency_ms / 1000.0
+
+    def _content(self, messages: Messages) -> str:
+        # SQL prompts ask for JSON; the explain prompt asks for one sentence.
+        if any('{"sql"' in m.get("content", "") for m in messages):
+            return json.dumps({"sql": self._sql})
+        return "Stub insight for load testing."
+
+    def invoke(self, messages: Messages) -> LLMResponse:
+        if self._delay_s > 0:
+            time.sleep(self._delay_s)
+        return LLMResponse(self._content(messages))
+
+    async def ainvoke(self, messages: Messages) -> LLMResponse:
+        if self._delay_s > 0:
+            await asyncio.sleep(self._delay_s)
+        return LLMResponse(self._content(messages))
+
+
+def get_llm(temperature: float = 0.0, backend: str = LLM_BACKEND):
+    """Chat model for the configured backend; exposes ``invoke`` / ``ainvoke``."""
+    if backend == "openai":
+        return _openai(temperature)
+    if backend == "record":
+        return RecordingLLM(CassetteStore(LLM_CASSETTE_DIR), temperature)
+    if backend == "replay":
+        return ReplayLLM(CassetteStore(LLM_CASSETTE_DIR), temperature)
+    if backend == "stub":
+        return StubLLM()
+    raise ValueError(f"Unknown LLM_BACKEND {backend!r} (expected openai, record, replay or stub).")
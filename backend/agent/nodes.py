@@ -2,7 +2,8 @@
 nodes.py — Agent nodes for Manufacturing BI Copilot.
 
 Key changes vs. original:
-  - Schema is fetched ONCE at module load and cached (_SCHEMA_CACHE).
+  - Schema is fetched ONCE at startup and cached (_SCHEMA, versioned by
+    fingerprint and refreshed in the background only when it changes).
     Every request reuses the cache — no DB round-trip per query.
   - generate_candidates → fast_path_sql: produces ONE high-quality SQL query.
   - System prompt is tailored for manufacturing KPIs (OEE, downtime,
@@ -14,41 +15,103 @@ Key changes vs. original:
 
 import json
 import time
+import uuid
+import asyncio
 import logging
-from typing import Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
 
 import pandas as pd
-from langchain_openai import ChatOpenAI
-from langchain_community.utilities import SQLDatabase
 
-from backend.config import OPENAI_MODEL, OPENAI_API_KEY
+from backend.config import (
+    SCHEMA_RETRIEVAL_ENABLED,
+    SCHEMA_TOP_K,
+    SCHEMA_MIN_SCORE,
+    SCHEMA_REFRESH_INTERVAL_S,
+    SCHEMA_SNAPSHOT_PATH,
+    SCHEMA_REFLECT_WORKERS,
+    SQL_PREVIEW_ROWS,
+    CHART_SOURCE_ROWS,
+    SQL_PREVIEW_COUNT_TOTAL,
+    SQL_HEDGE_ENABLED,
+    SQL_HEDGE_TEMPERATURES,
+    SQL_MAX_ROWS,
+    SQL_STATEMENT_TIMEOUT_MS,
+    SQL_READ_ONLY,
+    SQL_COST_GATE_ENABLED,
+    SQL_MAX_PLAN_COST,
+    SQL_MAX_PLAN_ROWS,
+    SQL_COST_GATE_ACTION,
+)
 from .state import AgentState, SQLResult, SafetyFlags
-from backend.utils.db import get_engine, run_sql
+from .schema_cache import SchemaCache
+from .llm import get_llm
+from backend.utils.db import (
+    BoundedResult,
+    StatementCancel,
+    get_engine,
+    run_sql_bounded,
+    get_async_engine,
+    arun_sql_bounded,
+    explain_sql,
+    aexplain_sql,
+)
 from backend.utils.guardrails import check_sql_safety
 from backend.utils.charting import suggest_chart
+from backend.utils.result_cache import get_cached_result, cache_result
+from backend.utils.sql_analysis import SQLAnalysis, analyze_sql, with_limit
+from backend.utils.metrics import COST_GATE_REJECTIONS, GUARDRAIL_BLOCKS, HEDGE_WINS, RETRIES
 
 logger = logging.getLogger("bi_copilot")
 
 # ---------------------------------------------------------------------------
-# Schema cache — populated once at startup, reused for every request.
+# Schema cache — built once at startup, re-fingerprinted in the background
+# and rebuilt only when information_schema changes (see schema_cache.py).
 # ---------------------------------------------------------------------------
-_SCHEMA_CACHE: Optional[str] = None
+_SCHEMA = SchemaCache(get_engine, SCHEMA_SNAPSHOT_PATH, SCHEMA_REFLECT_WORKERS)
 
 
 def _get_cached_schema() -> str:
     """
-    Return the cached DB schema string.
+    Return the cached DB schema string (current version).
     Fetches from the database only on the first call; subsequent calls are
     instant (no network/IO overhead).
     """
-    global _SCHEMA_CACHE
-    if _SCHEMA_CACHE is None:
-        logger.info("Schema cache miss — fetching schema from database …")
-        engine = get_engine()
-        db = SQLDatabase(engine)
-        _SCHEMA_CACHE = db.get_table_info()
-        logger.info("Schema cached successfully (%d chars).", len(_SCHEMA_CACHE))
-    return _SCHEMA_CACHE
+    return _SCHEMA.get().full
+
+
+def _get_prompt_schema(state: AgentState, extra_tables=()) -> str:
+    """
+    Schema text for the prompt: only the tables relevant to the question
+    (top-k by the lexical index, plus FK targets and ``extra_tables``), or
+    the full schema when retrieval is off or not confident.
+
+    Reads one snapshot so the text and the recorded version always agree.
+    """
+    snap = _SCHEMA.get()
+    state["schema_version"] = snap.version
+    if not SCHEMA_RETRIEVAL_ENABLED:
+        return snap.full
+
+    tables = snap.index.select(state["question"], SCHEMA_TOP_K,
+                               SCHEMA_MIN_SCORE, extra=extra_tables)
+    if tables is None:
+        state["schema_tables"] = []
+        logger.info("Trace %s — schema %s retrieval: low confidence, using full schema.",
+                    state.get("trace_id"), snap.version)
+        return snap.full
+
+    state["schema_tables"] = tables
+    schema = snap.index.render(tables)
+    logger.info("Trace %s — schema %s retrieval: %d/%d tables (%d of %d chars): %s",
+                state.get("trace_id"), snap.version, len(tables),
+                len(snap.index.tables), len(schema), len(snap.full), tables)
+    return schema
+
+
+def get_schema_hash() -> str:
+    """Current schema version (fingerprint) — used to key answer caches."""
+    return _SCHEMA.get().version
 
 
 def warm_schema_cache() -> None:
@@ -56,20 +119,34 @@ def warm_schema_cache() -> None:
     Call this from the FastAPI startup event so the schema is ready before
     the first real request arrives.
     """
-    _get_cached_schema()
+    _SCHEMA.get()
+
+
+async def awarm_schema_cache() -> None:
+    """
+    Async path: make sure a snapshot exists without introspecting the
+    database on the event loop. Afterwards every ``_SCHEMA.get()`` is a
+    reference read, so the async nodes and the answer-cache key never block.
+    """
+    await _SCHEMA.aget()
+
+
+def start_schema_refresh() -> None:
+    """Start the background fingerprint/rebuild loop (lifespan startup)."""
+    _SCHEMA.start(SCHEMA_REFRESH_INTERVAL_S)
+
+
+def stop_schema_refresh() -> None:
+    _SCHEMA.stop()
 
 
 # ---------------------------------------------------------------------------
 # LLM helper
 # ---------------------------------------------------------------------------
 
-def _ensure_llm() -> ChatOpenAI:
-    if not OPENAI_API_KEY:
-        raise RuntimeError("OPENAI_API_KEY is not set.")
-    return ChatOpenAI(
-        model=OPENAI_MODEL,
-        temperature=0.0,   # deterministic output for production reliability
-    )
+def _ensure_llm():
+    """Chat model from the configured LLM_BACKEND (openai / record / replay)."""
+    return get_llm(temperature=0.0)   # deterministic output for production reliability
 
 
 # ---------------------------------------------------------------------------
@@ -123,13 +200,371 @@ A: {"sql": "SELECT customer_name, COUNT(*) AS total_orders, ROUND(100.0 * SUM(CA
 """
 
 
+# ---------------------------------------------------------------------------
+# Prompt builders / response parsers — shared by the sync and async nodes
+# ---------------------------------------------------------------------------
+
+def _fast_path_messages(state: AgentState) -> List[Dict[str, str]]:
+    question = state["question"]
+    schema = _get_prompt_schema(state)
+
+    user_prompt = (
+        f"SCHEMA:\n{schema}\n\n"
+        f"{_FEW_SHOT_EXAMPLES}\n"
+        f"Now write one SQL query for:\n"
+        f"Question: {question}\n"
+        "Return ONLY JSON: {\"sql\": \"<query>\"}"
+    )
+    return [
+        {"role": "system", "content": _MANUFACTURING_SYSTEM_PROMPT},
+        {"role": "user",   "content": user_prompt},
+    ]
+
+
+def _retry_messages(state: AgentState) -> List[Dict[str, str]]:
+    question   = state["question"]
+    failed_sql = state.get("chosen_sql", "")
+    # Keep whatever the failed query touched in view so the fix can see it.
+    touched    = _analysis(state, failed_sql).tables if failed_sql else frozenset()
+    schema     = _get_prompt_schema(state, extra_tables=touched)
+    error_msg  = state.get("last_error", "Unknown error")
+
+    user_prompt = (
+        f"SCHEMA:\n{schema}\n\n"
+        f"The following SQL query failed with this database error:\n"
+        f"SQL:   {failed_sql}\n"
+        f"Error: {error_msg}\n\n"
+        f"Original question: {question}\n\n"
+        "Fix ONLY what the error describes — do not rewrite the entire query "
+        "unless necessary. Return ONLY JSON: {\"sql\": \"<corrected query>\"}"
+    )
+    return [
+        {"role": "system", "content": _MANUFACTURING_SYSTEM_PROMPT},
+        {"role": "user",   "content": user_prompt},
+    ]
+
+
+def _explain_messages(state: AgentState, sql: str) -> List[Dict[str, str]]:
+    user_prompt = (
+        f"Question: {state['question']}\n"
+        f"SQL: {sql}\n\n"
+        "In ONE concise sentence (max 20 words), state the key manufacturing "
+        "insight this query reveals. No preamble."
+    )
+    return [
+        {"role": "system",
+         "content": "You are a terse manufacturing analyst. Respond in one sentence only."},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def _parse_sql_response(content: str, state: AgentState, node: str) -> str:
+    """Extract {"sql": ...} from the LLM reply; fall back to the raw text."""
+    try:
+        data = json.loads(content)
+        return data.get("sql", "").strip()
+    except Exception:
+        logger.exception("Trace %s — %s: failed to parse LLM JSON; using raw content.",
+                         state.get("trace_id"), node)
+        return content.strip()
+
+
+def _apply_fast_path(state: AgentState, content: str, tft_ms: float) -> AgentState:
+    sql = _parse_sql_response(content, state, "fast_path_sql")
+    state["sql_candidates"] = [sql] if sql else []
+    state["tft_ms"] = tft_ms
+    logger.info("Trace %s — fast_path_sql generated query in %.1f ms",
+                state.get("trace_id"), tft_ms)
+    return state
+
+
+def _hedge_temperatures() -> List[float]:
+    return [float(t) for t in SQL_HEDGE_TEMPERATURES.split(",") if t.strip()] or [0.0]
+
+
+def _apply_hedged_fast_path(state: AgentState, contents: List[str], tft_ms: float) -> AgentState:
+    """Parse every candidate reply; drop empties and duplicates (by normalized SQL)."""
+    candidates, seen = [], set()
+    for content in contents:
+        sql = _parse_sql_response(content, state, "fast_path_sql")
+        if not sql:
+            continue
+        key = analyze_sql(sql).normalized
+        if key not in seen:
+            seen.add(key)
+            candidates.append(sql)
+    state["sql_candidates"] = candidates
+    state["tft_ms"] = tft_ms
+    logger.info("Trace %s — fast_path_sql generated %d distinct candidate(s) from %d "
+                "in %.1f ms (hedged)", state.get("trace_id"), len(candidates),
+                len(contents), tft_ms)
+    return state
+
+
+def _apply_retry(state: AgentState, content: str, retry_tft_ms: float) -> AgentState:
+    sql = _parse_sql_response(content, state, "retry_sql")
+    state["sql_candidates"] = [sql] if sql else []
+    state["retry_count"]    = state.get("retry_count", 0) + 1
+    RETRIES.inc()
+    state["tft_ms"]         = state.get("tft_ms", 0.0) + retry_tft_ms
+    state["last_error"]     = None   # clear error for the next execute attempt
+
+    logger.info(
+        "Trace %s — retry_sql produced corrected query in %.1f ms (retry #%d)",
+        state.get("trace_id"), retry_tft_ms, state["retry_count"]
+    )
+    return state
+
+
+def _explain_target(state: AgentState) -> Optional[str]:
+    """The SQL to explain — the candidate about to run, not the executed one,
+    since explain_answer runs in parallel with execute_sql."""
+    candidates = state.get("sql_candidates", [])
+    return candidates[0] if candidates else None
+
+
+def _explanation_update(state: AgentState, sql: str, content: str) -> Dict[str, Any]:
+    logger.info("Trace %s — explanation added.", state.get("trace_id"))
+    return {"explanation": content.strip(), "explained_sql": sql}
+
+
+def _analysis(state: AgentState, sql: str) -> SQLAnalysis:
+    """The analyze_sql node's parse of ``sql`` (memoised fallback for SQL it never saw)."""
+    analysis = state.get("sql_analysis", {}).get(sql)
+    return analysis if analysis is not None else analyze_sql(sql)
+
+
+def _new_result(state: AgentState, sql: str) -> SQLResult:
+    return {
+        "sql": sql,
+        "success": False,
+        "error": None,
+        "blocked": state.get("safety_flags", {}).get("blocked", False),
+        "latency_ms": 0.0,
+        "preview_rows": [],
+        "columns": [],
+    }
+
+
+def _record_success(state: AgentState, result: SQLResult, res: BoundedResult,
+                    latency_ms: float, cache_hit: bool) -> None:
+    preview = res.rows[:SQL_PREVIEW_ROWS]
+    result.update({
+        "success": True,
+        "latency_ms": latency_ms,
+        "columns": res.columns,
+        "column_kinds": res.column_kinds,
+        "preview_rows": preview,
+        "truncated": res.truncated or len(res.rows) > len(preview),
+        "total_rows": res.total_rows,
+        "cache_hit": cache_hit,
+    })
+    if len(res.rows) > len(preview):
+        result["chart_rows"] = res.rows
+    logger.info("Trace %s — SQL executed in %.1f ms, %d rows returned "
+                "(truncated=%s, total=%s, cache_hit=%s).",
+                state.get("trace_id"), latency_ms, len(res.rows),
+                res.truncated, res.total_rows, cache_hit)
+
+
+def _record_failure(state: AgentState, result: SQLResult, exc: Exception) -> None:
+    result["error"] = str(exc)
+    logger.error("Trace %s — SQL execution error: %s", state.get("trace_id"), exc)
+
+
+def _candidate_done(state: AgentState, result: SQLResult, res: BoundedResult,
+                    start: float, cache_hit: bool, sql: str) -> None:
+    if not cache_hit:
+        cache_result(sql, res, _analysis(state, sql))
+    _record_success(state, result, res, (time.time() - start) * 1000.0, cache_hit)
+
+
+# Rows fetched per candidate: the response preview, or more for the chart.
+_FETCH_ROWS = max(SQL_PREVIEW_ROWS, CHART_SOURCE_ROWS)
+
+# Every agent statement: read-only transaction + per-statement timeout.
+_GUARDS = {"statement_timeout_ms": SQL_STATEMENT_TIMEOUT_MS, "read_only": SQL_READ_ONLY}
+
+
+def _rejection(state: AgentState, result: SQLResult) -> bool:
+    """Fail ``result`` without running it if the guardrail or cost gate rejected its SQL."""
+    sql = result["sql"]
+    blocked = state.get("safety_flags", {}).get("blocked_sql", {}).get(sql)
+    if blocked is not None:
+        reason = "Blocked by the safety guardrail: " + "; ".join(blocked)
+    else:
+        reason = state.get("cost_rejections", {}).get(sql)
+    if reason is None:
+        return False
+    result["error"] = reason
+    logger.warning("Trace %s — not executing: %s", state.get("trace_id"), reason)
+    return True
+
+
+def _cached_result(state: AgentState, sql: str) -> Optional[BoundedResult]:
+    """Result-cache lookup, skipped when the run must read fresh rows."""
+    if state.get("bypass_result_cache"):
+        return None
+    return get_cached_result(sql, _analysis(state, sql))
+
+
+def _needs_validation(state: AgentState, sql: str, validate: bool) -> bool:
+    """EXPLAIN before running, unless cost_gate already planned this SQL in this run."""
+    return validate and sql not in state.get("cost_planned", ())
+
+
+def _run_candidate(state: AgentState, engine, sql: str, validate: bool = False,
+                   cancel: Optional[StatementCancel] = None) -> SQLResult:
+    """Execute one candidate (result cache first); never raises."""
+    result = _new_result(state, sql)
+    if _rejection(state, result):
+        return result
+    start = time.time()
+    try:
+        res = _cached_result(state, sql)
+        cache_hit = res is not None
+        if not cache_hit:
+            if _needs_validation(state, sql, validate):
+                explain_sql(engine, sql, **_GUARDS)   # plan only — rejects broken SQL cheaply
+            # Stream at most _FETCH_ROWS rows — never the full result.
+            res = run_sql_bounded(engine, sql, _FETCH_ROWS,
+                                  count_total=SQL_PREVIEW_COUNT_TOTAL, cancel=cancel, **_GUARDS)
+        _candidate_done(state, result, res, start, cache_hit, sql)
+    except Exception as exc:
+        _record_failure(state, result, exc)
+    return result
+
+
+async def _arun_candidate(state: AgentState, engine, sql: str,
+                          validate: bool = False) -> SQLResult:
+    """Async twin of _run_candidate."""
+    result = _new_result(state, sql)
+    if _rejection(state, result):
+        return result
+    start = time.time()
+    try:
+        res = _cached_result(state, sql)
+        cache_hit = res is not None
+        if not cache_hit:
+            if _needs_validation(state, sql, validate):
+                await aexplain_sql(engine, sql, **_GUARDS)
+            res = await arun_sql_bounded(engine, sql, _FETCH_ROWS,
+                                         count_total=SQL_PREVIEW_COUNT_TOTAL, **_GUARDS)
+        _candidate_done(state, result, res, start, cache_hit, sql)
+    except Exception as exc:
+        _record_failure(state, result, exc)
+    return result
+
+
+def _plan_estimate(rows: List[list]) -> Tuple[float, float]:
+    """(total cost, estimated rows) of the top plan node from EXPLAIN (FORMAT JSON)."""
+    plan = rows[0][0]
+    if isinstance(plan, str):          # asyncpg hands json back as text
+        plan = json.loads(plan)
+    top = plan[0]["Plan"]
+    return float(top["Total Cost"]), float(top["Plan Rows"])
+
+
+def _over_budget(cost: float, est_rows: float) -> bool:
+    return cost > SQL_MAX_PLAN_COST or est_rows > SQL_MAX_PLAN_ROWS
+
+
+def _with_limit(state: AgentState, sql: str) -> Optional[str]:
+    """``sql`` with a top-level LIMIT SQL_MAX_ROWS, or None if it already has one."""
+    return with_limit(_analysis(state, sql), SQL_MAX_ROWS)
+
+
+def _rejection_reason(cost: float, est_rows: float) -> str:
+    return (f"Rejected by cost gate: estimated cost {cost:,.0f} (max {SQL_MAX_PLAN_COST:,.0f}), "
+            f"estimated rows {est_rows:,.0f} (max {SQL_MAX_PLAN_ROWS:,.0f}). "
+            "Add filters (e.g. a date range) or aggregate before returning rows.")
+
+
+def _cost_gate_update(state: AgentState, decisions: List[Tuple[str, Optional[str]]]
+                      ) -> Dict[str, Any]:
+    """
+    ``decisions`` holds (sql to run, rejection reason or None, planned) per
+    candidate. Rejected SQL stays in sql_candidates so execute_sql reports
+    the reason and retry_sql can rewrite it. SQL that EXPLAINed cleanly is
+    listed in cost_planned so hedged execution does not validate it again.
+    """
+    rejections = {sql: reason for sql, reason, _ in decisions if reason}
+    if rejections:
+        COST_GATE_REJECTIONS.inc(len(rejections))
+    candidates = [sql for sql, _, _ in decisions]
+    # Auto-LIMITed rewrites are new statements: analyse them once here.
+    analyses = dict(state.get("sql_analysis", {}))
+    for sql in candidates:
+        if sql not in analyses:
+            analyses[sql] = analyze_sql(sql)
+    return {
+        "sql_candidates": candidates,
+        "cost_rejections": rejections,
+        "cost_planned": [sql for sql, _, planned in decisions if planned],
+        "sql_analysis": analyses,
+    }
+
+
+def _hedged_results(state: AgentState, candidates: List[str],
+                    finished: List[SQLResult]) -> List[SQLResult]:
+    """
+    Winner first, then the other finished candidates, then placeholders for
+    the ones cancelled when the winner came in.
+    """
+    winner = next((r for r in finished if r.get("success")), None)
+    HEDGE_WINS.labels(
+        candidate=str(candidates.index(winner["sql"])) if winner else "none"
+    ).inc()
+    ordered = ([winner] if winner else []) + [r for r in finished if r is not winner]
+    done = {r["sql"] for r in finished}
+    for sql in candidates:
+        if sql not in done:
+            cancelled = _new_result(state, sql)
+            cancelled["error"] = "Abandoned: another candidate succeeded first."
+            ordered.append(cancelled)
+    logger.info("Trace %s — hedged execution: %s of %d candidate(s) won.",
+                state.get("trace_id"),
+                f"#{candidates.index(winner['sql'])}" if winner else "none",
+                len(candidates))
+    return ordered
+
+
+def _execution_update(executed_results: List[SQLResult],
+                      tfr_ms: float) -> Dict[str, Any]:
+    """
+    Build the partial state update for execute_sql. Only the keys this node
+    owns are returned, so it can share a superstep with explain_answer.
+    """
+    update: Dict[str, Any] = {"executed_results": executed_results, "tfr_ms": tfr_ms}
+
+    failed = [r for r in executed_results if not r.get("success")]
+    if failed:
+        update["last_error"] = failed[-1].get("error")
+
+    # Pick the first successful result as the chosen one
+    chosen = next((r for r in executed_results if r.get("success")), None)
+    if chosen is None and executed_results:
+        chosen = executed_results[0]  # surface error gracefully
+
+    if chosen:
+        update["chosen_sql"] = chosen["sql"]
+        try:
+            rows = chosen.get("chart_rows", chosen["preview_rows"])
+            df = pd.DataFrame(rows, columns=chosen["columns"])
+        except Exception:
+            df = None
+        update["chosen_df"] = df
+
+    return update
+
+
 # ---------------------------------------------------------------------------
 # Node implementations
 # ---------------------------------------------------------------------------
 
 def ingest_question(state: AgentState) -> AgentState:
     """Stamp trace ID and record ingest timestamp."""
-    trace_id = state.get("trace_id") or str(int(time.time() * 1000))
+    trace_id = state.get("trace_id") or uuid.uuid4().hex
     state["trace_id"] = trace_id
     state.setdefault("metadata", {})["ingest_time"] = time.time()
     logger.info("Trace %s — ingest_question: %s", trace_id, state.get("question"))
@@ -144,61 +579,74 @@ def fast_path_sql(state: AgentState) -> AgentState:
     Returns the SQL in state["sql_candidates"] (list of one) so the rest of
     the pipeline (guardrail, execute_sql) stays compatible.
     """
+    if SQL_HEDGE_ENABLED:
+        return _hedged_fast_path_sql(state)
+
     llm = _ensure_llm()
-    question = state["question"]
-    schema = _get_cached_schema()
+    start = time.time()
+    resp = llm.invoke(_fast_path_messages(state))
+    tft_ms = (time.time() - start) * 1000.0
+    return _apply_fast_path(state, resp.content, tft_ms)
 
-    user_prompt = (
-        f"SCHEMA:\n{schema}\n\n"
-        f"{_FEW_SHOT_EXAMPLES}\n"
-        f"Now write one SQL query for:\n"
-        f"Question: {question}\n"
-        "Return ONLY JSON: {\"sql\": \"<query>\"}"
-    )
+
+def _hedged_fast_path_sql(state: AgentState) -> AgentState:
+    """One candidate per SQL_HEDGE_TEMPERATURES entry, generated concurrently."""
+    messages = _fast_path_messages(state)
+    temperatures = _hedge_temperatures()
+
+    def generate(temperature: float) -> Optional[str]:
+        try:
+            return get_llm(temperature=temperature).invoke(messages).content
+        except Exception as exc:
+            logger.warning("Trace %s — hedged candidate (t=%.2f) failed: %s",
+                           state.get("trace_id"), temperature, exc)
+            return None
 
     start = time.time()
-    resp = llm.invoke(
-        [
-            {"role": "system", "content": _MANUFACTURING_SYSTEM_PROMPT},
-            {"role": "user",   "content": user_prompt},
-        ]
-    )
-    tft_ms = (time.time() - start) * 1000.0
+    with ThreadPoolExecutor(max_workers=len(temperatures),
+                            thread_name_prefix="hedge-llm") as pool:
+        contents = [c for c in pool.map(generate, temperatures) if c is not None]
+    if not contents:
+        raise RuntimeError("All hedged SQL candidates failed to generate.")
+    return _apply_hedged_fast_path(state, contents, (time.time() - start) * 1000.0)
 
-    sql = ""
-    try:
-        data = json.loads(resp.content)
-        sql = data.get("sql", "").strip()
-    except Exception:
-        logger.exception("Trace %s — failed to parse LLM JSON; using raw content.",
-                         state.get("trace_id"))
-        sql = resp.content.strip()
 
-    state["sql_candidates"] = [sql] if sql else []
-    state["tft_ms"] = tft_ms
-    logger.info("Trace %s — fast_path_sql generated query in %.1f ms",
-                state.get("trace_id"), tft_ms)
-    return state
+def analyze_sql_node(state: AgentState) -> Dict[str, Any]:
+    """
+    Parse every candidate once. guardrail, cost_gate, the result cache and
+    the logs read ``sql_analysis`` instead of rescanning the SQL text.
+    """
+    analyses = {sql: analyze_sql(sql) for sql in state.get("sql_candidates", [])}
+    for a in analyses.values():
+        logger.info("Trace %s — analyze_sql: %s fp=%s tables=%s limit=%s%s",
+                    state.get("trace_id"), a.statement_type, a.fingerprint,
+                    sorted(a.tables), a.has_limit,
+                    f" parse_error={a.error!r}" if a.error else "")
+    return {"sql_analysis": analyses}
 
 
 def guardrail(state: AgentState) -> AgentState:
-    """Block any DML/DDL that slipped through the prompt."""
+    """Block anything but a single read-only query (works on the parsed SQL)."""
     candidates = state.get("sql_candidates", [])
-    safety_flags: SafetyFlags = {"blocked": False, "reasons": []}
+    safety_flags: SafetyFlags = {"blocked": False, "reasons": [], "blocked_sql": {}}
     filtered = []
 
     for sql in candidates:
-        is_safe, reasons = check_sql_safety(sql)
+        analysis = _analysis(state, sql)
+        is_safe, reasons = check_sql_safety(sql, analysis)
         if is_safe:
             filtered.append(sql)
         else:
             safety_flags["blocked"] = True
+            GUARDRAIL_BLOCKS.inc()
             safety_flags.setdefault("reasons", []).extend(reasons)
-            logger.warning("Trace %s — guardrail BLOCKED query: %s | reasons: %s",
-                           state.get("trace_id"), sql[:80], reasons)
+            safety_flags["blocked_sql"][sql] = reasons
+            logger.warning("Trace %s — guardrail BLOCKED query fp=%s: %s | reasons: %s",
+                           state.get("trace_id"), analysis.fingerprint, sql[:80], reasons)
 
     # Fail-open: if everything was blocked, preserve candidate list so
     # execute_sql can surface a meaningful error rather than a silent empty.
+    # Blocked SQL is reported by execute_sql, never run.
     state["sql_candidates"] = filtered if filtered else candidates
     state["safety_flags"] = safety_flags
     logger.info("Trace %s — guardrail: %d candidate(s), blocked=%s",
@@ -206,67 +654,106 @@ def guardrail(state: AgentState) -> AgentState:
     return state
 
 
-def execute_sql_node(state: AgentState) -> AgentState:
-    """Execute the single candidate SQL and store results."""
+def cost_gate(state: AgentState) -> Dict[str, Any]:
+    """
+    EXPLAIN each candidate before it runs. Over SQL_MAX_PLAN_COST /
+    SQL_MAX_PLAN_ROWS the query is auto-LIMITed (SQL_COST_GATE_ACTION=limit)
+    or rejected. A candidate whose EXPLAIN fails passes through — execute_sql
+    surfaces the real error.
+    """
+    engine = get_engine()
+    if not SQL_COST_GATE_ENABLED or engine.dialect.name != "postgresql":
+        return {}
+
+    def plan(sql: str) -> Tuple[float, float]:
+        return _plan_estimate(explain_sql(engine, sql, label="cost_gate", fmt_json=True,
+                                          **_GUARDS))
+
+    decisions = [_gate_candidate(state, sql, plan) for sql in state.get("sql_candidates", [])]
+    return _cost_gate_update(state, decisions)
+
+
+def _gate_candidate(state: AgentState, sql: str, plan) -> Tuple[str, Optional[str], bool]:
+    if sql in state.get("safety_flags", {}).get("blocked_sql", {}):
+        return sql, None, False           # never planned; execute_sql reports the block
+    try:
+        cost, est_rows = plan(sql)
+    except Exception as exc:
+        logger.info("Trace %s — cost_gate: EXPLAIN failed, passing through: %s",
+                    state.get("trace_id"), exc)
+        return sql, None, False
+    if not _over_budget(cost, est_rows):
+        return sql, None, True
+
+    limited = _with_limit(state, sql) if SQL_COST_GATE_ACTION == "limit" else None
+    if limited is not None:
+        try:
+            limited_cost, limited_rows = plan(limited)
+        except Exception:
+            limited_cost, limited_rows = cost, est_rows
+        if not _over_budget(limited_cost, limited_rows):
+            logger.warning("Trace %s — cost_gate: auto-LIMIT %d applied (cost %.0f → %.0f).",
+                           state.get("trace_id"), SQL_MAX_ROWS, cost, limited_cost)
+            return limited, None, True
+        cost, est_rows = limited_cost, limited_rows
+
+    logger.warning("Trace %s — cost_gate rejected query (cost %.0f, rows %.0f): %s",
+                   state.get("trace_id"), cost, est_rows, sql[:80])
+    return sql, _rejection_reason(cost, est_rows), True
+
+
+def execute_sql_node(state: AgentState) -> Dict[str, Any]:
+    """Execute the candidate SQL(s); returns a partial state update."""
     engine = get_engine()
     candidates = state.get("sql_candidates", [])
+    if SQL_HEDGE_ENABLED and len(candidates) > 1:
+        return _hedged_execute_sql(state, engine, candidates)
+
     executed_results = []
     tfr_ms = 0.0
-
     for sql in candidates:
-        result: SQLResult = {
-            "sql": sql,
-            "success": False,
-            "error": None,
-            "blocked": state.get("safety_flags", {}).get("blocked", False),
-            "latency_ms": 0.0,
-            "preview_rows": [],
-            "columns": [],
-        }
-        start = time.time()
-        try:
-            cols, rows = run_sql(engine, sql)
-            latency_ms = (time.time() - start) * 1000.0
-            result.update({
-                "success": True,
-                "latency_ms": latency_ms,
-                "columns": cols,
-                "preview_rows": rows[:20],
-            })
-            tfr_ms = latency_ms
-            logger.info("Trace %s — SQL executed in %.1f ms, %d rows returned.",
-                        state.get("trace_id"), latency_ms, len(rows))
-        except Exception as exc:
-            result["error"] = str(exc)
-            state["last_error"] = str(exc)
-            logger.error("Trace %s — SQL execution error: %s", state.get("trace_id"), exc)
-
+        result = _run_candidate(state, engine, sql)
+        if result["success"]:
+            tfr_ms = result["latency_ms"]
         executed_results.append(result)
 
-    # Pick the first successful result as the chosen one
-    chosen = next((r for r in executed_results if r.get("success")), None)
-    if chosen is None and executed_results:
-        chosen = executed_results[0]  # surface error gracefully
-
-    state["executed_results"] = executed_results
-    state["tfr_ms"] = tfr_ms
+    return _execution_update(executed_results, tfr_ms)
 
-    if chosen:
-        state["chosen_sql"] = chosen["sql"]
-        try:
-            df = pd.DataFrame(chosen["preview_rows"], columns=chosen["columns"])
-        except Exception:
-            df = None
-        state["chosen_df"] = df
 
-    return state
+def _hedged_execute_sql(state: AgentState, engine, candidates: List[str]) -> Dict[str, Any]:
+    """
+    Validate + run every candidate in parallel; the first success wins.
+    Losers are cancelled on the server (StatementCancel), so they neither
+    keep running nor hold a pooled connection once the winner is in.
+    """
+    start = time.time()
+    finished: List[SQLResult] = []
+    cancels = [StatementCancel() for _ in candidates]
+    pool = ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix="hedge-sql")
+    try:
+        pending = {pool.submit(_run_candidate, state, engine, sql, True, cancel)
+                   for sql, cancel in zip(candidates, cancels)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            finished.extend(f.result() for f in done)
+            if any(r["success"] for r in finished):
+                break
+    finally:
+        for cancel in cancels:
+            cancel.cancel()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    tfr_ms = (time.time() - start) * 1000.0
+    return _execution_update(_hedged_results(state, candidates, finished), tfr_ms)
 
 
 def suggest_chart_node(state: AgentState) -> AgentState:
     """Suggest a Chart.js-compatible chart spec based on the result shape."""
     df = state.get("chosen_df")
     if isinstance(df, pd.DataFrame) and not df.empty:
-        chart_spec = suggest_chart(df)
+        chosen = next((r for r in state.get("executed_results", [])
+                       if r.get("success") and r.get("sql") == state.get("chosen_sql")), {})
+        chart_spec = suggest_chart(df, chosen.get("column_kinds"))
         state["chart_spec"] = chart_spec
         logger.info("Trace %s — chart: %s",
                     state.get("trace_id"),
@@ -276,38 +763,59 @@ def suggest_chart_node(state: AgentState) -> AgentState:
     return state
 
 
-def explain_answer(state: AgentState) -> AgentState:
+def explain_answer(state: AgentState) -> Dict[str, Any]:
     """
     Generate a ONE-sentence plain-English insight for the operator.
 
-    Kept intentionally brief to minimise final-hop LLM latency.
-    If no SQL was chosen, this node is a no-op.
+    Runs in parallel with execute_sql / suggest_chart — it only needs the
+    question and the SQL — so it returns a partial update ("explanation",
+    "explained_sql") that finalize_answer merges into metadata.
+    If there is no SQL candidate, this node is a no-op.
     """
-    chosen_sql = state.get("chosen_sql")
-    if not chosen_sql:
-        return state
+    sql = _explain_target(state)
+    if not sql:
+        return {}
 
     llm = _ensure_llm()
-    question = state["question"]
+    resp = llm.invoke(_explain_messages(state, sql))
+    return _explanation_update(state, sql, resp.content)
 
-    user_prompt = (
-        f"Question: {question}\n"
-        f"SQL: {chosen_sql}\n\n"
-        "In ONE concise sentence (max 20 words), state the key manufacturing "
-        "insight this query reveals. No preamble."
-    )
 
-    resp = llm.invoke(
-        [
-            {"role": "system",
-             "content": "You are a terse manufacturing analyst. Respond in one sentence only."},
-            {"role": "user", "content": user_prompt},
-        ]
-    )
+def _stale_explanation(state: AgentState) -> bool:
+    """
+    The parallel explain branch described sql_candidates[0] as it stood
+    before execution; a hedged run won by another candidate, or a cost_gate
+    auto-LIMIT rewrite, leaves it describing SQL that did not run.
+    """
+    chosen = state.get("chosen_sql")
+    return bool(chosen) and state.get("explained_sql") != chosen
 
-    state.setdefault("metadata", {})["explanation"] = resp.content.strip()
-    logger.info("Trace %s — explanation added.", state.get("trace_id"))
-    return state
+
+def _finalize_update(state: AgentState, update: Dict[str, Any]) -> Dict[str, Any]:
+    metadata = dict(state.get("metadata", {}))
+    metadata["explanation"] = update.get("explanation", state.get("explanation"))
+    return {**update, "metadata": metadata}
+
+
+def finalize_answer(state: AgentState) -> Dict[str, Any]:
+    """
+    Join point of the execute and explain branches before END. If the
+    explanation is for a different SQL than chosen_sql, chosen_sql is
+    re-explained; if that fails the explanation is dropped, never returned
+    for the wrong query.
+    """
+    update: Dict[str, Any] = {}
+    if _stale_explanation(state):
+        logger.info("Trace %s — re-explaining chosen SQL (explained a different one).",
+                    state.get("trace_id"))
+        try:
+            resp = _ensure_llm().invoke(_explain_messages(state, state["chosen_sql"]))
+            update = _explanation_update(state, state["chosen_sql"], resp.content)
+        except Exception as exc:
+            logger.warning("Trace %s — re-explain failed, dropping explanation: %s",
+                           state.get("trace_id"), exc)
+            update = {"explanation": None, "explained_sql": None}
+    return _finalize_update(state, update)
 
 def retry_sql(state: AgentState) -> AgentState:
     """
@@ -317,46 +825,159 @@ def retry_sql(state: AgentState) -> AgentState:
     self-correct. Common fixes: wrong column name, missing JOIN, bad alias.
     """
     llm = _ensure_llm()
-    question  = state["question"]
-    schema    = _get_cached_schema()
-    failed_sql = state.get("chosen_sql", "")
-    error_msg  = state.get("last_error", "Unknown error")
+    start = time.time()
+    resp = llm.invoke(_retry_messages(state))
+    retry_tft_ms = (time.time() - start) * 1000.0
+    return _apply_retry(state, resp.content, retry_tft_ms)
+
+
+# ---------------------------------------------------------------------------
+# Async node implementations — used by build_graph(use_async=True).
+# LLM calls go through ChatOpenAI.ainvoke and SQL through the async engine,
+# so a request never parks a worker thread while it waits on I/O.
+# ---------------------------------------------------------------------------
+
+async def afast_path_sql(state: AgentState) -> AgentState:
+    """Async twin of fast_path_sql."""
+    if SQL_HEDGE_ENABLED:
+        return await _ahedged_fast_path_sql(state)
+
+    llm = _ensure_llm()
+    start = time.time()
+    resp = await llm.ainvoke(_fast_path_messages(state))
+    tft_ms = (time.time() - start) * 1000.0
+    return _apply_fast_path(state, resp.content, tft_ms)
 
-    user_prompt = (
-        f"SCHEMA:\n{schema}\n\n"
-        f"The following SQL query failed with this database error:\n"
-        f"SQL:   {failed_sql}\n"
-        f"Error: {error_msg}\n\n"
-        f"Original question: {question}\n\n"
-        "Fix ONLY what the error describes — do not rewrite the entire query "
-        "unless necessary. Return ONLY JSON: {\"sql\": \"<corrected query>\"}"
-    )
 
+async def _ahedged_fast_path_sql(state: AgentState) -> AgentState:
+    """Async twin of _hedged_fast_path_sql (asyncio.gather over ainvoke)."""
+    messages = _fast_path_messages(state)
+    temperatures = _hedge_temperatures()
     start = time.time()
-    resp = llm.invoke(
-        [
-            {"role": "system", "content": _MANUFACTURING_SYSTEM_PROMPT},
-            {"role": "user",   "content": user_prompt},
-        ]
+    replies = await asyncio.gather(
+        *(get_llm(temperature=t).ainvoke(messages) for t in temperatures),
+        return_exceptions=True,
     )
-    retry_tft_ms = (time.time() - start) * 1000.0
+    contents = []
+    for temperature, reply in zip(temperatures, replies):
+        if isinstance(reply, BaseException):
+            logger.warning("Trace %s — hedged candidate (t=%.2f) failed: %s",
+                           state.get("trace_id"), temperature, reply)
+        else:
+            contents.append(reply.content)
+    if not contents:
+        raise RuntimeError("All hedged SQL candidates failed to generate.")
+    return _apply_hedged_fast_path(state, contents, (time.time() - start) * 1000.0)
+
+
+async def acost_gate(state: AgentState) -> Dict[str, Any]:
+    """Async twin of cost_gate; candidates are planned concurrently."""
+    engine = get_async_engine()
+    if not SQL_COST_GATE_ENABLED or engine.dialect.name != "postgresql":
+        return {}
 
-    sql = ""
+    # EXPLAIN results per SQL text, gathered up front; the shared decision
+    # logic then reads them synchronously.
+    candidates = state.get("sql_candidates", [])
+    plans: Dict[str, Any] = {}
+
+    async def fetch(sql: str) -> None:
+        try:
+            plans[sql] = _plan_estimate(await aexplain_sql(
+                engine, sql, label="cost_gate", fmt_json=True, **_GUARDS))
+        except Exception as exc:
+            plans[sql] = exc
+
+    blocked = state.get("safety_flags", {}).get("blocked_sql", {})
+    await asyncio.gather(*(fetch(sql) for sql in candidates if sql not in blocked))
+    if SQL_COST_GATE_ACTION == "limit":
+        over = [sql for sql, value in plans.items()
+                if not isinstance(value, Exception) and _over_budget(*value)]
+        await asyncio.gather(*(fetch(limited)
+                               for limited in (_with_limit(state, sql) for sql in over)
+                               if limited is not None))
+
+    def plan(sql: str) -> Tuple[float, float]:
+        value = plans.get(sql)
+        if value is None or isinstance(value, Exception):
+            raise value or RuntimeError("not planned")
+        return value
+
+    decisions = [_gate_candidate(state, sql, plan) for sql in candidates]
+    return _cost_gate_update(state, decisions)
+
+
+async def aexecute_sql_node(state: AgentState) -> Dict[str, Any]:
+    """Async twin of execute_sql_node (asyncpg via SQLAlchemy's async engine)."""
+    engine = get_async_engine()
+    candidates = state.get("sql_candidates", [])
+    if SQL_HEDGE_ENABLED and len(candidates) > 1:
+        return await _ahedged_execute_sql(state, engine, candidates)
+
+    executed_results = []
+    tfr_ms = 0.0
+    for sql in candidates:
+        result = await _arun_candidate(state, engine, sql)
+        if result["success"]:
+            tfr_ms = result["latency_ms"]
+        executed_results.append(result)
+
+    return _execution_update(executed_results, tfr_ms)
+
+
+async def _ahedged_execute_sql(state: AgentState, engine,
+                               candidates: List[str]) -> Dict[str, Any]:
+    """Async twin of _hedged_execute_sql; losers are cancelled mid-query."""
+    start = time.time()
+    finished: List[SQLResult] = []
+    pending = {asyncio.ensure_future(_arun_candidate(state, engine, sql, True))
+               for sql in candidates}
     try:
-        data = json.loads(resp.content)
-        sql = data.get("sql", "").strip()
-    except Exception:
-        logger.exception("Trace %s — retry_sql: failed to parse LLM JSON.",
-                         state.get("trace_id"))
-        sql = resp.content.strip()
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            finished.extend(t.result() for t in done)
+            if any(r["success"] for r in finished):
+                break
+    finally:
+        for task in pending:
+            task.cancel()   # asyncpg sends a cancel request for the running statement
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    tfr_ms = (time.time() - start) * 1000.0
+    return _execution_update(_hedged_results(state, candidates, finished), tfr_ms)
+
+
+async def aexplain_answer(state: AgentState) -> Dict[str, Any]:
+    """Async twin of explain_answer."""
+    sql = _explain_target(state)
+    if not sql:
+        return {}
 
-    state["sql_candidates"] = [sql] if sql else []
-    state["retry_count"]    = state.get("retry_count", 0) + 1
-    state["tft_ms"]         = state.get("tft_ms", 0.0) + retry_tft_ms
-    state["last_error"]     = None   # clear error for the next execute attempt
+    llm = _ensure_llm()
+    resp = await llm.ainvoke(_explain_messages(state, sql))
+    return _explanation_update(state, sql, resp.content)
 
-    logger.info(
-        "Trace %s — retry_sql produced corrected query in %.1f ms (retry #%d)",
-        state.get("trace_id"), retry_tft_ms, state["retry_count"]
-    )
-    return state
\ No newline at end of file
+
+async def afinalize_answer(state: AgentState) -> Dict[str, Any]:
+    """Async twin of finalize_answer."""
+    update: Dict[str, Any] = {}
+    if _stale_explanation(state):
+        logger.info("Trace %s — re-explaining chosen SQL (explained a different one).",
+                    state.get("trace_id"))
+        try:
+            resp = await _ensure_llm().ainvoke(_explain_messages(state, state["chosen_sql"]))
+            update = _explanation_update(state, state["chosen_sql"], resp.content)
+        except Exception as exc:
+            logger.warning("Trace %s — re-explain failed, dropping explanation: %s",
+                           state.get("trace_id"), exc)
+            update = {"explanation": None, "explained_sql": None}
+    return _finalize_update(state, update)
+
+
+async def aretry_sql(state: AgentState) -> AgentState:
+    """Async twin of retry_sql."""
+    llm = _ensure_llm()
+    start = time.time()
+    resp = await llm.ainvoke(_retry_messages(state))
+    retry_tft_ms = (time.time() - start) * 1000.0
+    return _apply_retry(state, resp.content, retry_tft_ms)
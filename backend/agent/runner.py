@@ -3,21 +3,162 @@ runner.py — Agent runner for the Manufacturing BI Copilot.
 
 The compiled graph is built once at import time and reused for every request,
 avoiding repeated graph compilation overhead.
+
+Answers are cached per (normalised question, schema hash): a repeated
+question skips both LLM hops and returns the cached SQL, chart spec and
+explanation. With ANSWER_CACHE_REFRESH_DATA (or refresh_data=True) only the
+cached SQL is re-executed — through the cost gate and straight against the
+database, not the SQL result cache — so the rows and chart reflect current
+data.
 """
 
+import copy
+import re
+import threading
 import time
+import uuid
 import logging
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 
+from backend.config import (
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_TTL_S,
+    ANSWER_CACHE_REFRESH_DATA,
+)
+from backend.utils.cache import TTLCache
+from backend.utils.metrics import record_cache
 from .state import AgentState
 from .graph import build_graph
+from .nodes import (
+    get_schema_hash,
+    awarm_schema_cache,
+    cost_gate,
+    acost_gate,
+    execute_sql_node,
+    aexecute_sql_node,
+    suggest_chart_node,
+    finalize_answer,
+    afinalize_answer,
+)
 
 logger = logging.getLogger("bi_copilot")
 
 # Compile once at module load — reused across all requests.
 _graph = build_graph()
+_async_graph = build_graph(use_async=True)
+
+# ---------------------------------------------------------------------------
+# Answer cache
+# ---------------------------------------------------------------------------
+_ANSWER_CACHE = TTLCache(maxsize=ANSWER_CACHE_SIZE, ttl_s=ANSWER_CACHE_TTL_S)
+_saved_latency_ms = 0.0
+_saved_latency_lock = threading.Lock()     # hits are recorded from worker threads
+
+
+def _normalize_question(question: str) -> str:
+    """Lower-case, collapse whitespace and drop trailing punctuation."""
+    q = re.sub(r"\s+", " ", question.strip().lower())
+    return q.rstrip(" ?.!")
+
+
+def _answer_cache_key(question: str) -> Tuple[str, str]:
+    return (_normalize_question(question), get_schema_hash())
+
+
+def answer_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters plus the LLM/pipeline latency saved by cache hits."""
+    stats = _ANSWER_CACHE.stats()
+    with _saved_latency_lock:
+        stats["saved_latency_ms"] = _saved_latency_ms
+    return stats
+
+
+def clear_answer_cache() -> None:
+    _ANSWER_CACHE.clear()
+
+
+def _lookup_answer(question: str) -> Optional[AgentState]:
+    """Return a copy of the cached final state for this question, or None."""
+    global _saved_latency_ms
+    try:
+        key = _answer_cache_key(question)
+    except Exception as exc:
+        logger.warning("Answer cache disabled for this request: %s", exc)
+        return None
+
+    cached = _ANSWER_CACHE.get(key)
+    record_cache("answer", cached is not None)
+    if cached is None:
+        return None
+
+    state: AgentState = copy.deepcopy(cached)
+    state["question"] = question
+    state["trace_id"] = uuid.uuid4().hex
+    state.setdefault("metadata", {})["cache_hit"] = True
+    state["tft_ms"] = 0.0
+    state["tfr_ms"] = 0.0
+    with _saved_latency_lock:
+        _saved_latency_ms += cached.get("metadata", {}).get("total_latency_ms", 0.0)
+
+    # Re-running the SQL (refresh_data) reuses the LLM-produced SQL as-is.
+    state["sql_candidates"] = [state["chosen_sql"]] if state.get("chosen_sql") else []
+    return state
+
+
+async def _alookup_answer(question: str) -> Optional[AgentState]:
+    """_lookup_answer for the async path: a cold schema is loaded off the event loop."""
+    try:
+        await awarm_schema_cache()
+    except Exception as exc:
+        logger.warning("Answer cache disabled for this request: %s", exc)
+        return None
+    return _lookup_answer(question)
+
+
+def _prepare_refresh(state: AgentState) -> None:
+    """
+    A refreshed cache hit re-runs its SQL through cost_gate and execute_sql
+    against the database itself, never the SQL result cache.
+    """
+    state["cost_rejections"] = {}
+    state["cost_planned"] = []
+    state["bypass_result_cache"] = True
+
+
+def _store_answer(question: str, state: AgentState) -> None:
+    """Cache the final state — only successful, unblocked answers are kept."""
+    executed = state.get("executed_results", [])
+    if not any(r.get("success") for r in executed):
+        return
+    if state.get("safety_flags", {}).get("blocked"):
+        return
+    try:
+        key = _answer_cache_key(question)
+    except Exception:
+        return
+    _ANSWER_CACHE.set(key, copy.deepcopy(state))
+
+
+def _finish(question: str, final_state: AgentState, start: float,
+            cache_hit: bool) -> AgentState:
+    total_latency_ms = (time.time() - start) * 1000.0
+    final_state.setdefault("metadata", {})["total_latency_ms"] = total_latency_ms
+    final_state["metadata"].setdefault("cache_hit", False)
+
+    if not cache_hit:
+        _store_answer(question, final_state)
+
+    logger.info(
+        "Trace %s — run_agent complete. total_latency_ms=%.2f cache_hit=%s schema=%s",
+        final_state.get("trace_id"),
+        total_latency_ms,
+        cache_hit,
+        final_state.get("schema_version"),
+    )
+    return final_state
 
 
-def run_agent(question: str) -> AgentState:
+def run_agent(question: str, refresh_data: Optional[bool] = None) -> AgentState:
     """
     Run the fast-path agent for a single natural-language question.
 
@@ -25,19 +166,95 @@ def run_agent(question: str) -> AgentState:
       - chosen_sql      : the generated SQL query
       - executed_results: list with one SQLResult entry
       - chart_spec      : Chart.js-compatible chart specification (or None)
-      - metadata        : total_latency_ms, explanation, ingest_time
+      - metadata        : total_latency_ms, explanation, ingest_time, cache_hit
       - tft_ms / tfr_ms : individual latency measurements
+
+    refresh_data overrides ANSWER_CACHE_REFRESH_DATA for this call.
     """
-    init_state: AgentState = {"question": question}
+    if refresh_data is None:
+        refresh_data = ANSWER_CACHE_REFRESH_DATA
 
     start = time.time()
-    final_state = _graph.invoke(init_state)
-    total_latency_ms = (time.time() - start) * 1000.0
+    final_state = _lookup_answer(question)
+    cache_hit = final_state is not None
 
-    final_state.setdefault("metadata", {})["total_latency_ms"] = total_latency_ms
-    logger.info(
-        "Trace %s — run_agent complete. total_latency_ms=%.2f",
-        final_state.get("trace_id"),
-        total_latency_ms,
-    )
-    return final_state
+    if cache_hit:
+        if refresh_data and final_state["sql_candidates"]:
+            _prepare_refresh(final_state)
+            final_state.update(cost_gate(final_state))
+            final_state.update(execute_sql_node(final_state))
+            final_state = suggest_chart_node(final_state)
+            final_state.update(finalize_answer(final_state))
+    else:
+        init_state: AgentState = {"question": question}
+        final_state = _graph.invoke(init_state)
+
+    return _finish(question, final_state, start, cache_hit)
+
+
+async def arun_agent(question: str, refresh_data: Optional[bool] = None) -> AgentState:
+    """
+    Async variant of run_agent — drives the async graph with ``ainvoke`` so
+    the request never occupies a worker thread while waiting on the LLM/DB.
+    """
+    if refresh_data is None:
+        refresh_data = ANSWER_CACHE_REFRESH_DATA
+
+    start = time.time()
+    final_state = await _alookup_answer(question)
+    cache_hit = final_state is not None
+
+    if cache_hit:
+        if refresh_data and final_state["sql_candidates"]:
+            _prepare_refresh(final_state)
+            final_state.update(await acost_gate(final_state))
+            final_state.update(await aexecute_sql_node(final_state))
+            final_state = suggest_chart_node(final_state)
+            final_state.update(await afinalize_answer(final_state))
+    else:
+        init_state: AgentState = {"question": question}
+        final_state = await _async_graph.ainvoke(init_state)
+
+    return _finish(question, final_state, start, cache_hit)
+
+
+async def astream_agent(
+    question: str, refresh_data: Optional[bool] = None
+) -> AsyncIterator[Tuple[str, AgentState]]:
+    """
+    Stream the async graph node by node.
+
+    Yields ``(node_name, state_so_far)`` as each LangGraph node completes,
+    then a final ``("__end__", final_state)`` once metadata is stamped.
+    Cache hits replay the cached nodes immediately so callers see the same
+    event sequence either way.
+    """
+    if refresh_data is None:
+        refresh_data = ANSWER_CACHE_REFRESH_DATA
+
+    start = time.time()
+    state = await _alookup_answer(question)
+    cache_hit = state is not None
+
+    if cache_hit:
+        yield "fast_path_sql", state
+        if refresh_data and state["sql_candidates"]:
+            _prepare_refresh(state)
+            state.update(await acost_gate(state))
+            state.update(await aexecute_sql_node(state))
+            yield "execute_sql", state
+            state = suggest_chart_node(state)
+            state.update(await afinalize_answer(state))
+        else:
+            yield "execute_sql", state
+        yield "suggest_chart", state
+        yield "explain_answer", state
+    else:
+        state = {"question": question}
+        async for chunk in _async_graph.astream(state, stream_mode="updates"):
+            for node, update in chunk.items():
+                if update:
+                    state.update(update)
+                yield node, state
+
+    yield "__end__", _finish(question, state, start, cache_hit)
@@ -0,0 +1,222 @@
+"""
+schema_cache.py — Versioned prompt-schema cache with background refresh.
+
+A cheap fingerprint (hash of the (table, column, type) tuples in
+information_schema) identifies the schema version. A daemon thread
+re-fingerprints every SCHEMA_REFRESH_INTERVAL_S seconds and only rebuilds
+the prompt schema — DDL, sample rows, retrieval index — when the
+fingerprint changes. The new snapshot is swapped in with a single reference
+assignment, so readers always see one consistent version and never block
+on a rebuild.
+
+The rendered snapshot is also persisted to SCHEMA_SNAPSHOT_PATH. A new
+worker loads that file, checks it against the live fingerprint (one catalog
+query) and is ready immediately; tables are only re-reflected — in
+parallel — when the file is missing or stale.
+
+Async callers use ``aget``, which runs that first build in a worker thread
+instead of on the event loop.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from .schema_index import SchemaIndex, reflect_tables
+
+logger = logging.getLogger("bi_copilot")
+
+_FINGERPRINT_SQL = """
+    SELECT table_name, column_name, data_type
+    FROM information_schema.columns
+    WHERE table_schema = current_schema()
+    ORDER BY table_name, ordinal_position
+"""
+
+
+def fingerprint_schema(engine: Engine) -> str:
+    """
+    Short hash of every (table, column, type) tuple in the default schema.
+    One catalog query — far cheaper than reflecting the tables.
+    """
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            rows = conn.execute(text(_FINGERPRINT_SQL)).fetchall()
+        tuples = [tuple(str(v) for v in r) for r in rows]
+    else:
+        inspector = inspect(engine)
+        tuples = [
+            (t, c["name"], str(c["type"]))
+            for t in sorted(inspector.get_table_names())
+            for c in inspector.get_columns(t)
+        ]
+    digest = hashlib.sha256(repr(tuples).encode("utf-8")).hexdigest()
+    return digest[:16]
+
+
+@dataclass(frozen=True)
+class SchemaSnapshot:
+    version: str                 # schema fingerprint
+    full: str                    # full prompt schema (all tables)
+    index: SchemaIndex = field(repr=False)
+    built_at: float = 0.0
+
+
+class SchemaCache:
+    """Holds the current SchemaSnapshot and refreshes it in the background."""
+
+    def __init__(self, engine_factory, snapshot_path: str = "", workers: int = 1):
+        self._engine_factory = engine_factory
+        self._snapshot_path = snapshot_path
+        self._workers = workers
+        self._snapshot: Optional[SchemaSnapshot] = None
+        self._build_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # -- reads ---------------------------------------------------------------
+
+    def get(self) -> SchemaSnapshot:
+        """Current snapshot; builds it synchronously on first use only."""
+        snap = self._snapshot
+        if snap is None:
+            with self._build_lock:
+                if self._snapshot is None:
+                    engine = self._engine_factory()
+                    version = fingerprint_schema(engine)
+                    snap = self._load(engine, version)
+                    if snap is None:
+                        logger.info("Schema cache miss — fetching schema from database …")
+                        snap = self._build(engine, version)
+                    self._swap(snap)
+                snap = self._snapshot
+        return snap
+
+    async def aget(self) -> SchemaSnapshot:
+        """Async ``get``: a cold build runs in a worker thread, off the event loop."""
+        snap = self._snapshot
+        if snap is None:
+            snap = await asyncio.to_thread(self.get)
+        return snap
+
+    @property
+    def version(self) -> Optional[str]:
+        snap = self._snapshot
+        return snap.version if snap else None
+
+    # -- refresh -------------------------------------------------------------
+
+    def _build(self, engine: Engine, version: str) -> SchemaSnapshot:
+        start = time.time()
+        index = SchemaIndex(reflect_tables(engine, workers=self._workers))
+        snap = SchemaSnapshot(version=version, full=index.full_schema(),
+                              index=index, built_at=time.time())
+        logger.info("Schema %s built in %.0f ms (%d tables, %d chars).",
+                    version, (time.time() - start) * 1000.0,
+                    len(index.tables), len(snap.full))
+        self._save(engine, snap)
+        return snap
+
+    # -- disk persistence ----------------------------------------------------
+
+    @staticmethod
+    def _database_id(engine: Engine) -> str:
+        return engine.url.render_as_string(hide_password=True)
+
+    def _load(self, engine: Engine, version: str) -> Optional[SchemaSnapshot]:
+        """Load the on-disk snapshot if it matches this database and version."""
+        if not self._snapshot_path or not os.path.exists(self._snapshot_path):
+            return None
+        start = time.time()
+        try:
+            with open(self._snapshot_path, "r", encoding="utf-8") as fh:
+                data: Dict[str, Any] = json.load(fh)
+        except (OSError, ValueError) as exc:
+            logger.warning("Schema snapshot unreadable (%s); rebuilding.", exc)
+            return None
+
+        if data.get("database") != self._database_id(engine) or data.get("version") != version:
+            logger.info("Schema snapshot stale (%s ≠ %s); rebuilding.",
+                        data.get("version"), version)
+            return None
+
+        index = SchemaIndex(data["tables"])
+        snap = SchemaSnapshot(version=version, full=index.full_schema(),
+                              index=index, built_at=data.get("built_at", 0.0))
+        logger.info("Schema %s loaded from %s in %.1f ms (%d tables).",
+                    version, self._snapshot_path, (time.time() - start) * 1000.0,
+                    len(index.tables))
+        return snap
+
+    def _save(self, engine: Engine, snap: SchemaSnapshot) -> None:
+        """Write the snapshot atomically (tmp file + rename); never fatal."""
+        if not self._snapshot_path:
+            return
+        payload = {
+            "database": self._database_id(engine),
+            "version": snap.version,
+            "built_at": snap.built_at,
+            "tables": snap.index.tables,
+        }
+        tmp_path = f"{self._snapshot_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self._snapshot_path) or ".", exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump(payload, fh)
+            os.replace(tmp_path, self._snapshot_path)
+        except OSError as exc:
+            logger.warning("Could not persist schema snapshot: %s", exc)
+
+    def _swap(self, snap: SchemaSnapshot) -> None:
+        old = self._snapshot
+        self._snapshot = snap          # atomic reference swap
+        if old is not None and old.version != snap.version:
+            logger.warning("Schema version changed: %s → %s", old.version, snap.version)
+
+    def refresh(self) -> bool:
+        """
+        Re-fingerprint and rebuild only if the schema changed.
+        Returns True when a new snapshot was swapped in.
+        """
+        engine = self._engine_factory()
+        version = fingerprint_schema(engine)
+        if self._snapshot is not None and self._snapshot.version == version:
+            return False
+        with self._build_lock:
+            if self._snapshot is not None and self._snapshot.version == version:
+                return False
+            self._swap(self._build(engine, version))
+        return True
+
+    def _loop(self, interval_s: float) -> None:
+        while not self._stop.wait(interval_s):
+            try:
+                self.refresh()
+            except Exception as exc:
+                # Keep serving the last good snapshot.
+                logger.error("Schema refresh failed: %s", exc)
+
+    def start(self, interval_s: float) -> None:
+        if interval_s <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop, args=(interval_s,), name="schema-refresh", daemon=True
+        )
+        self._thread.start()
+        logger.info("Schema refresh thread started (every %.0f s).", interval_s)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
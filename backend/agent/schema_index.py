@@ -0,0 +1,168 @@
+"""
+schema_index.py — Lexical index over the DB schema for prompt trimming.
+
+The full ``SQLDatabase.get_table_info()`` dump (DDL + sample rows for every
+table) grows linearly with the schema, and so do prompt size, cost and
+time-to-first-token. This module keeps the per-table DDL blocks separately
+and scores them against the question with a small TF-IDF over table names,
+column names and comments — no embeddings, no network. Only the top-k
+tables (plus the tables they reference by foreign key) go into the prompt;
+when nothing matches confidently the full schema is used instead.
+"""
+
+import math
+import re
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from typing_extensions import TypedDict
+from langchain_community.utilities import SQLDatabase
+
+logger = logging.getLogger("bi_copilot")
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("""
+a an and are as at be by can do does for from get give how i in is it list
+me my of on or per show that the their them this to was were what when
+where which who with all any each last over our please total vs
+""".split())
+
+
+class TableDoc(TypedDict, total=False):
+    name: str
+    ddl: str                 # get_table_info() block: CREATE TABLE + sample rows
+    columns: List[str]
+    comments: List[str]      # table + column comments
+    references: List[str]    # tables referenced via foreign keys
+
+
+def _stem(token: str) -> str:
+    """Very light plural folding: machines → machine, entries → entry."""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def _tokens(text: str) -> List[str]:
+    return [_stem(t) for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def reflect_tables(engine: Engine, table_names: Optional[Iterable[str]] = None,
+                   workers: int = 1) -> Dict[str, TableDoc]:
+    """
+    Reflect per-table DDL blocks, columns, comments and FK references.
+
+    Each DDL block is what ``get_table_info([table])`` renders, so joining
+    all blocks gives the same content as a full ``get_table_info()`` call.
+    With ``workers > 1`` tables are reflected concurrently; each worker uses
+    its own SQLDatabase/Inspector, since neither is thread-safe.
+    """
+    names = sorted(table_names) if table_names is not None else sorted(inspect(engine).get_table_names())
+
+    def one(name: str) -> TableDoc:
+        db = SQLDatabase(engine, include_tables=[name])
+        return _reflect_one(db, inspect(engine), name)
+
+    if workers <= 1 or len(names) <= 1:
+        return {name: one(name) for name in names}
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="schema-reflect") as pool:
+        return dict(zip(names, pool.map(one, names)))
+
+
+def _reflect_one(db: SQLDatabase, inspector, name: str) -> TableDoc:
+    columns = inspector.get_columns(name)
+    comments = [c["comment"] for c in columns if c.get("comment")]
+    try:
+        table_comment = (inspector.get_table_comment(name) or {}).get("text")
+    except NotImplementedError:
+        table_comment = None
+    if table_comment:
+        comments.insert(0, table_comment)
+
+    return {
+        "name": name,
+        "ddl": db.get_table_info([name]),
+        "columns": [c["name"] for c in columns],
+        "comments": comments,
+        "references": sorted({
+            fk["referred_table"] for fk in inspector.get_foreign_keys(name)
+            if fk.get("referred_table") and fk["referred_table"] != name
+        }),
+    }
+
+
+class SchemaIndex:
+    """TF-IDF scorer over table documents; immutable once built."""
+
+    # Matches on the table name itself count more than column/comment hits.
+    _NAME_WEIGHT = 2.0
+
+    def __init__(self, tables: Dict[str, TableDoc]):
+        self.tables = tables
+        self._name_terms: Dict[str, Counter] = {}
+        self._body_terms: Dict[str, Counter] = {}
+        df: Counter = Counter()
+
+        for name, doc in tables.items():
+            name_terms = Counter(_tokens(name.replace("_", " ")))
+            body = " ".join(doc.get("columns", [])).replace("_", " ")
+            body_terms = Counter(_tokens(body + " " + " ".join(doc.get("comments", []))))
+            self._name_terms[name] = name_terms
+            self._body_terms[name] = body_terms
+            df.update(set(name_terms) | set(body_terms))
+
+        n = max(len(tables), 1)
+        self._idf = {term: math.log(1.0 + n / cnt) for term, cnt in df.items()}
+
+    def full_schema(self) -> str:
+        return "\n\n".join(doc["ddl"] for doc in self.tables.values())
+
+    def score(self, question: str) -> Dict[str, float]:
+        q_terms = set(_tokens(question))
+        scores: Dict[str, float] = {}
+        for name in self.tables:
+            s = 0.0
+            for term in q_terms:
+                idf = self._idf.get(term)
+                if idf is None:
+                    continue
+                if term in self._name_terms[name]:
+                    s += self._NAME_WEIGHT * idf
+                if term in self._body_terms[name]:
+                    s += idf
+            scores[name] = s
+        return scores
+
+    def select(self, question: str, top_k: int, min_score: float,
+               extra: Iterable[str] = ()) -> Optional[List[str]]:
+        """
+        Return the tables to include for ``question``, or None to signal
+        "low confidence — use the full schema".
+        """
+        if len(self.tables) <= top_k:
+            return None
+
+        scores = self.score(question)
+        ranked = sorted((s, t) for t, s in scores.items() if s > 0)
+        ranked.reverse()
+        if not ranked or ranked[0][0] < min_score:
+            return None
+
+        chosen = [t for _, t in ranked[:top_k]]
+        chosen += [t for t in extra if t in self.tables and t not in chosen]
+        # Pull in FK targets so the LLM can write the joins.
+        for t in list(chosen):
+            for ref in self.tables[t].get("references", []):
+                if ref in self.tables and ref not in chosen:
+                    chosen.append(ref)
+        return chosen
+
+    def render(self, table_names: Iterable[str]) -> str:
+        return "\n\n".join(self.tables[t]["ddl"] for t in table_names if t in self.tables)
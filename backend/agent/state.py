@@ -9,6 +9,8 @@ from typing import List, Optional, Dict, Any
 from typing_extensions import TypedDict
 import pandas as pd
 
+from backend.utils.sql_analysis import SQLAnalysis
+
 
 class SQLResult(TypedDict, total=False):
     sql: str
@@ -17,24 +19,36 @@ class SQLResult(TypedDict, total=False):
     blocked: bool
     latency_ms: float
     preview_rows: List[List[Any]]
+    chart_rows: List[List[Any]]   # up to CHART_SOURCE_ROWS rows behind the chart
     columns: List[str]
+    column_kinds: Optional[List[Optional[str]]]  # time/numeric/category from DB types
+    truncated: bool               # more rows existed beyond the preview cap
+    total_rows: Optional[int]     # exact row count when known
+    cache_hit: bool               # served from the SQL result cache
 
 
 class SafetyFlags(TypedDict, total=False):
     blocked: bool
     reasons: List[str]
+    blocked_sql: Dict[str, List[str]]   # sql → reasons; never executed
 
 
 class AgentState(TypedDict, total=False):
     # Core I/O
     question: str
     schema_snapshot: str          # kept for compatibility; populated from cache
+    schema_tables: List[str]      # tables picked by schema retrieval ([] = full schema)
+    schema_version: str           # fingerprint of the schema the prompt used
 
     # SQL pipeline
     sql_candidates: List[str]     # always a list of 1 in fast-path mode
     executed_results: List[SQLResult]
     chosen_sql: Optional[str]
     chosen_df: Optional[pd.DataFrame]
+    sql_analysis: Dict[str, SQLAnalysis]  # sql → parse, set by analyze_sql
+    cost_rejections: Dict[str, str]  # sql → reason, set by cost_gate
+    cost_planned: List[str]       # sql cost_gate EXPLAINed cleanly (already validated)
+    bypass_result_cache: bool     # answer-cache refresh: always hit the database
 
     retry_count: int            # how many retries have been attempted
     last_error: Optional[str]   # last SQL execution error message
@@ -42,6 +56,8 @@ class AgentState(TypedDict, total=False):
     # Downstream artefacts
     chart_spec: Optional[Dict[str, Any]]
     safety_flags: SafetyFlags
+    explanation: Optional[str]    # written by the parallel explain branch
+    explained_sql: Optional[str]  # SQL the explanation was generated for
 
     # Latency telemetry
     tft_ms: float                 # Time-to-First-Token (LLM generation)
@@ -5,9 +5,11 @@ from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from fastapi import Request
-from backend.kpis.router import router as kpi_router
-from fastapi.responses import JSONResponse
+from backend.kpis.router import router as kpi_router, rollup as kpi_rollup
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 import asyncio
+import json
 
 import os
 from dotenv import load_dotenv
@@ -24,13 +26,33 @@ from typing import Any, Dict, List, Optional
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from sqlalchemy import text
 
 from backend.utils.logging_config import setup_logging
-from backend.utils.db import get_engine, run_sql
-from backend.agent.runner import run_agent
-from backend.agent.nodes import warm_schema_cache
-from backend.config import OPENAI_API_KEY, OPENAI_MODEL
+from backend.utils.db import get_engine, run_sql, dispose_async_engine, iter_sql_batches
+from backend.utils.cache import TTLCache
+from backend.utils.query_log import QueryLogWriter
+from backend.utils.metrics import register_query_log, render_metrics
+from backend.utils.export import EXPORT_FORMATS, encode as encode_export
+from backend.utils.compact import LabelTable, compact_chart, compact_columns, compact_response
+from backend.utils.guardrails import check_sql_safety
+from backend.agent.runner import run_agent, arun_agent, astream_agent, answer_cache_stats
+from backend.utils.result_cache import invalidate_tables, result_cache_stats
+from backend.agent.nodes import awarm_schema_cache, start_schema_refresh, stop_schema_refresh
+from backend.config import (
+    OPENAI_API_KEY,
+    OPENAI_MODEL,
+    AGENT_ASYNC,
+    EXPORT_BATCH_ROWS,
+    EXPORT_STATEMENT_TIMEOUT_MS,
+    SQL_READ_ONLY,
+    TRACE_STORE_SIZE,
+    TRACE_STORE_TTL_S,
+    KPI_ROLLUP_ENABLED,
+    KPI_ROLLUP_REFRESH_S,
+    QUERY_LOG_QUEUE_SIZE,
+    QUERY_LOG_BATCH_SIZE,
+    QUERY_LOG_FLUSH_S,
+)
 
 setup_logging()
 logger = logging.getLogger("bi_copilot")
@@ -44,12 +66,22 @@ logger = logging.getLogger("bi_copilot")
 async def lifespan(app: FastAPI):
     logger.info("Startup: warming schema cache …")
     try:
-        warm_schema_cache()
+        await awarm_schema_cache()
         logger.info("Startup: schema cache ready.")
     except Exception as exc:
         logger.error("Startup: schema cache warm-up failed: %s", exc)
+    start_schema_refresh()
+    _QUERY_LOG.start()
+    if KPI_ROLLUP_ENABLED:
+        # Initial load runs off the event loop; refreshes continue on a thread.
+        await asyncio.to_thread(kpi_rollup.start, KPI_ROLLUP_REFRESH_S)
     yield
     logger.info("Shutdown: cleaning up.")
+    stop_schema_refresh()
+    kpi_rollup.stop()
+    # Flush queued query logs off the event loop before the pool goes away.
+    await asyncio.to_thread(_QUERY_LOG.stop)
+    await dispose_async_engine()
 
 
 # ---------------------------------------------------------------------------
@@ -92,10 +124,17 @@ class SQLResultItem(BaseModel):
     latency_ms: float = 0.0
     columns: List[str] = []
     preview_rows: List[List[Any]] = []
+    truncated: bool = False
+    total_rows: Optional[int] = None
+
+
+class CacheInvalidateRequest(BaseModel):
+    tables: List[str]
 
 
 class NLQueryResponse(BaseModel):
     question: str
+    trace_id: Optional[str] = None
     chosen_sql: Optional[str]
     result: Optional[SQLResultItem]
     chart: Optional[Dict[str, Any]]
@@ -104,12 +143,22 @@ class NLQueryResponse(BaseModel):
     total_latency_ms: float
     explanation: Optional[str]
     safety_blocked: bool = False
+    cache_hit: bool = False
+    schema_version: Optional[str] = None
 
 
 # ---------------------------------------------------------------------------
 # Query log helper
 # ---------------------------------------------------------------------------
 
+_QUERY_LOG = QueryLogWriter(
+    maxsize=QUERY_LOG_QUEUE_SIZE,
+    batch_size=QUERY_LOG_BATCH_SIZE,
+    flush_s=QUERY_LOG_FLUSH_S,
+)
+register_query_log(_QUERY_LOG.stats)
+
+
 def _save_query_log(
     user_email: str,
     question: str,
@@ -117,44 +166,110 @@ def _save_query_log(
     result_item: Optional[SQLResultItem],
 ) -> None:
     """
-    Persist every nl2sql call to query_logs.
-    Failures here are caught and logged — never allowed to break the API response.
+    Queue every nl2sql call for query_logs. The row is written in a batch by
+    the background writer; under backpressure it is dropped, never awaited.
     """
-    try:
-        engine = get_engine()
-        with engine.connect() as conn:
-            conn.execute(
-                text("""
-                    INSERT INTO query_logs (
-                        user_email, question, chosen_sql,
-                        success, error,
-                        tft_ms, tfr_ms, total_latency_ms,
-                        safety_blocked, retried
-                    ) VALUES (
-                        :email, :question, :sql,
-                        :success, :error,
-                        :tft, :tfr, :total,
-                        :safety_blocked, :retried
-                    )
-                """),
-                {
-                    "email":         user_email,
-                    "question":      question,
-                    "sql":           state.get("chosen_sql"),
-                    "success":       result_item.success if result_item else False,
-                    "error":         result_item.error if result_item else None,
-                    "tft":           state.get("tft_ms", 0.0),
-                    "tfr":           state.get("tfr_ms", 0.0),
-                    "total":         state.get("metadata", {}).get("total_latency_ms", 0.0),
-                    "safety_blocked": state.get("safety_flags", {}).get("blocked", False),
-                    "retried":       state.get("retry_count", 0) > 0,
-                },
-            )
-            conn.commit()
-            logger.info("Query log saved for user: %s", user_email)
-    except Exception as exc:
-        # Never crash the request because of a logging failure
-        logger.error("Failed to save query log: %s", exc)
+    _QUERY_LOG.submit({
+        "user_email":       user_email,
+        "question":         question,
+        "chosen_sql":       state.get("chosen_sql"),
+        "success":          result_item.success if result_item else False,
+        "error":            result_item.error if result_item else None,
+        "tft_ms":           state.get("tft_ms", 0.0),
+        "tfr_ms":           state.get("tfr_ms", 0.0),
+        "total_latency_ms": state.get("metadata", {}).get("total_latency_ms", 0.0),
+        "safety_blocked":   state.get("safety_flags", {}).get("blocked", False),
+        "retried":          state.get("retry_count", 0) > 0,
+    })
+
+
+# ---------------------------------------------------------------------------
+# Response helpers
+# ---------------------------------------------------------------------------
+
+# Completed traces (trace_id → chosen SQL + owner) for /agent/export.
+# Per-process: not shared between workers (see export_trace).
+_TRACES = TTLCache(maxsize=TRACE_STORE_SIZE, ttl_s=TRACE_STORE_TTL_S)
+
+
+def _remember_trace(state: dict, user_email: str) -> None:
+    if state.get("trace_id") and state.get("chosen_sql"):
+        _TRACES.set(state["trace_id"], {"sql": state["chosen_sql"], "owner": user_email})
+
+
+def _user_email(current_user: Any) -> str:
+    return current_user if isinstance(current_user, str) else current_user.get("email", "unknown")
+
+
+def _result_item(state: dict) -> Optional[SQLResultItem]:
+    executed = state.get("executed_results", [])
+    if not executed:
+        return None
+    r = executed[0]
+    return SQLResultItem(
+        sql=r.get("sql", ""),
+        success=r.get("success", False),
+        error=r.get("error"),
+        latency_ms=r.get("latency_ms", 0.0),
+        columns=r.get("columns", []),
+        preview_rows=r.get("preview_rows", []),
+        truncated=r.get("truncated", False),
+        total_rows=r.get("total_rows"),
+    )
+
+
+def _response_fields(question: str, state: dict) -> Dict[str, Any]:
+    """NLQueryResponse fields other than ``result`` and ``chart``."""
+    return {
+        "question": question,
+        "trace_id": state.get("trace_id"),
+        "chosen_sql": state.get("chosen_sql"),
+        "tft_ms": state.get("tft_ms", 0.0),
+        "tfr_ms": state.get("tfr_ms", 0.0),
+        "total_latency_ms": state.get("metadata", {}).get("total_latency_ms", 0.0),
+        "explanation": state.get("metadata", {}).get("explanation"),
+        "safety_blocked": state.get("safety_flags", {}).get("blocked", False),
+        "cache_hit": state.get("metadata", {}).get("cache_hit", False),
+        "schema_version": state.get("schema_version"),
+    }
+
+
+def _build_response(
+    question: str, state: dict, result_item: Optional[SQLResultItem]
+) -> NLQueryResponse:
+    return NLQueryResponse(
+        result=result_item,
+        chart=state.get("chart_spec"),
+        **_response_fields(question, state),
+    )
+
+
+def _compact_body(question: str, state: dict) -> Dict[str, Any]:
+    """
+    NLQueryResponse in the compact format (see backend.utils.compact):
+    columnar rows, and one label table shared by text/date columns and the
+    chart labels. Built from the agent state, skipping pydantic.
+    """
+    table = LabelTable()
+    result = None
+    executed = state.get("executed_results", [])
+    if executed:
+        r = executed[0]
+        result = {
+            "sql": r.get("sql", ""),
+            "success": r.get("success", False),
+            "error": r.get("error"),
+            "latency_ms": r.get("latency_ms", 0.0),
+            **compact_columns(r.get("columns", []), r.get("preview_rows", []), table),
+            "truncated": r.get("truncated", False),
+            "total_rows": r.get("total_rows"),
+        }
+    return {
+        **_response_fields(question, state),
+        "result": result,
+        "chart": compact_chart(state.get("chart_spec"), table),
+        "labels": table.labels,
+    }
 
 
 # ---------------------------------------------------------------------------
@@ -166,47 +281,183 @@ def _save_query_log(
 async def nl2sql(
     request: Request,
     req: NLQueryRequest,
+    format: str = "json",
     current_user: dict = Depends(get_current_user),
 ):
+    """
+    ``format=compact`` returns the compact columnar encoding (orjson,
+    brotli/gzip per Accept-Encoding) instead of the NLQueryResponse JSON.
+    """
+    if format not in ("json", "compact"):
+        raise HTTPException(status_code=400, detail="format must be json or compact.")
     if not req.question.strip():
         raise HTTPException(status_code=400, detail="Question must not be empty.")
 
-    state = await asyncio.to_thread(run_agent, question=req.question)
+    if AGENT_ASYNC:
+        # Fully async graph — no worker thread is held while waiting on I/O.
+        state = await arun_agent(question=req.question)
+    else:
+        state = await asyncio.to_thread(run_agent, question=req.question)
 
-    executed = state.get("executed_results", [])
-    result_item = None
-    if executed:
-        r = executed[0]
-        result_item = SQLResultItem(
-            sql=r.get("sql", ""),
-            success=r.get("success", False),
-            error=r.get("error"),
-            latency_ms=r.get("latency_ms", 0.0),
-            columns=r.get("columns", []),
-            preview_rows=r.get("preview_rows", []),
-        )
-
-    # ✅ Save to query_logs — runs after response is built, never blocks it
+    result_item = _result_item(state)
+
+    _remember_trace(state, _user_email(current_user))
+
+    # ✅ Queue for query_logs — batched by a background writer, never blocks
     _save_query_log(
-        user_email=current_user if isinstance(current_user, str) else current_user.get("email", "unknown"),
+        user_email=_user_email(current_user),
         question=req.question,
         state=state,
         result_item=result_item,
     )
 
-    return NLQueryResponse(
-        question=req.question,
-        chosen_sql=state.get("chosen_sql"),
-        result=result_item,
-        chart=state.get("chart_spec"),
-        tft_ms=state.get("tft_ms", 0.0),
-        tfr_ms=state.get("tfr_ms", 0.0),
-        total_latency_ms=state.get("metadata", {}).get("total_latency_ms", 0.0),
-        explanation=state.get("metadata", {}).get("explanation"),
-        safety_blocked=state.get("safety_flags", {}).get("blocked", False),
+    if format == "compact":
+        return compact_response(request, "nl2sql", _compact_body(req.question, state))
+    return _build_response(req.question, state, result_item)
+
+
+def _sse(event: str, data: Any) -> str:
+    """Format one server-sent event; payload is JSON-encoded."""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+@app.post("/agent/nl2sql/stream")
+@limiter.limit("20/minute")
+async def nl2sql_stream(
+    request: Request,
+    req: NLQueryRequest,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Server-sent-events variant of /agent/nl2sql.
+
+    Events are emitted in this order:
+      sql → rows → chart → explanation → done (full NLQueryResponse)
+    with a second sql (retry=true) → rows pair before chart when the first
+    query failed. sql / rows / chart go out as their nodes complete, so the
+    client can render the table before the explanation. The explain branch
+    runs in parallel and may finish first, so its output is held back and
+    sent exactly once, after chart — the final value, describing chosen_sql.
+    """
+    if not req.question.strip():
+        raise HTTPException(status_code=400, detail="Question must not be empty.")
+
+    async def event_stream():
+        try:
+            async for node, state in astream_agent(question=req.question):
+                if node in ("fast_path_sql", "retry_sql"):
+                    candidates = state.get("sql_candidates", [])
+                    yield _sse("sql", {
+                        "chosen_sql": candidates[0] if candidates else None,
+                        "tft_ms": state.get("tft_ms", 0.0),
+                        "retry": node == "retry_sql",
+                    })
+                elif node == "execute_sql":
+                    yield _sse("rows", {
+                        "chosen_sql": state.get("chosen_sql"),
+                        "result": _result_item(state),
+                        "tfr_ms": state.get("tfr_ms", 0.0),
+                        "safety_blocked": state.get("safety_flags", {}).get("blocked", False),
+                    })
+                elif node == "suggest_chart":
+                    yield _sse("chart", {"chart": state.get("chart_spec")})
+                elif node == "__end__":
+                    yield _sse("explanation", {
+                        "explanation": state.get("metadata", {}).get("explanation"),
+                    })
+                    result_item = _result_item(state)
+                    _remember_trace(state, _user_email(current_user))
+                    _save_query_log(
+                        user_email=_user_email(current_user),
+                        question=req.question,
+                        state=state,
+                        result_item=result_item,
+                    )
+                    yield _sse("done", _build_response(req.question, state, result_item))
+        except Exception as exc:
+            logger.error("Streaming nl2sql failed: %s", exc, exc_info=True)
+            yield _sse("error", {"detail": "An internal error occurred. Please try again."})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/agent/export/{trace_id}")
+@limiter.limit("10/minute")
+def export_trace(
+    request: Request,
+    trace_id: str,
+    format: str = "csv",
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Stream the FULL result of a completed trace's chosen_sql as CSV, NDJSON
+    or Arrow IPC. Rows are read through a server-side cursor and encoded
+    batch by batch, so memory stays flat and bytes flow before the query
+    has finished.
+
+    Traces live in this process's memory (_TRACES), so export works only
+    against the worker that answered the question. With several workers
+    (uvicorn --workers N, multiple dynos) an export routed elsewhere gets a
+    404; run a single worker, or use sticky sessions, if exports matter.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400,
+                            detail=f"format must be one of {sorted(EXPORT_FORMATS)}.")
+    if format == "arrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="Arrow export requires pyarrow.")
+
+    trace = _TRACES.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired trace.")
+    if trace["owner"] != _user_email(current_user) and current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not your trace.")
+
+    sql = trace["sql"]
+    is_safe, reasons = check_sql_safety(sql)
+    if not is_safe:
+        logger.warning("Export blocked for trace %s: %s", trace_id, reasons)
+        raise HTTPException(status_code=400, detail="Query blocked by the safety guardrail.")
+
+    media_type, ext = EXPORT_FORMATS[format]
+    batches = iter_sql_batches(get_engine(), sql, EXPORT_BATCH_ROWS, read_only=SQL_READ_ONLY,
+                               statement_timeout_ms=EXPORT_STATEMENT_TIMEOUT_MS)
+    return StreamingResponse(
+        encode_export(format, batches),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="trace_{trace_id}.{ext}"'},
     )
 
 
+@app.get("/agent/cache/stats")
+def cache_stats(current_user: dict = Depends(get_current_user)):
+    """Answer-cache hit/miss counters and the latency saved by hits."""
+    return {
+        "answer_cache": answer_cache_stats(),
+        "result_cache": result_cache_stats(),
+    }
+
+
+@app.post("/agent/cache/invalidate")
+def cache_invalidate(
+    req: CacheInvalidateRequest,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Drop cached SQL results that read any of the given tables.
+    Call this from the ETL after loading e.g. machine_production_daily.
+    """
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin role required.")
+    return {"invalidated": invalidate_tables(req.tables)}
+
+
 # ---------------------------------------------------------------------------
 # Health
 # ---------------------------------------------------------------------------
@@ -216,6 +467,13 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint: per-node / per-query latency, counters, pool and query-log gauges."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 # ---------------------------------------------------------------------------
 # Global exception handler
 # ---------------------------------------------------------------------------
@@ -4,11 +4,33 @@ from jose import jwt, JWTError
 from sqlalchemy import text
 from .models import UserCreate, UserLogin, Token
 from .utils import hash_password, verify_password, create_access_token, SECRET_KEY, ALGORITHM
+from backend.config import AUTH_USER_CACHE_SIZE, AUTH_USER_CACHE_TTL_S
+from backend.utils.cache import TTLCache
 from backend.utils.db import get_engine
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 security = HTTPBearer()
 
+# email → {"role", "is_active"}; lookups scale with unique users, not requests.
+_USER_CACHE = TTLCache(maxsize=AUTH_USER_CACHE_SIZE, ttl_s=AUTH_USER_CACHE_TTL_S)
+
+
+def invalidate_user(email: str) -> None:
+    """Call whenever a user's role / active flag changes."""
+    _USER_CACHE.pop(email)
+
+
+def _load_user(email: str) -> dict:
+    engine = get_engine()
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("SELECT role, is_active FROM users WHERE email = :email"),
+            {"email": email}
+        ).fetchone()
+    if not row:
+        return {"role": "operator", "is_active": True}
+    return {"role": row[0] or "operator", "is_active": row[1] is not False}
+
 
 @router.post("/register", response_model=Token)
 def register(user: UserCreate):
@@ -27,6 +49,7 @@ def register(user: UserCreate):
             {"email": user.email, "pw": hash_password(user.password)}
         )
         conn.commit()
+    invalidate_user(user.email)
     token = create_access_token({"sub": user.email})
     return Token(access_token=token)
 
@@ -72,6 +95,7 @@ def refresh_token(credentials: HTTPAuthorizationCredentials = Depends(security))
             {"email": email}
         ).fetchone()
     if not row:
+        invalidate_user(email)
         raise HTTPException(status_code=401, detail="User not found or inactive.")
 
     # Issue a fresh token — resets the 8-hour clock
@@ -91,14 +115,10 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
         if not email:
             raise HTTPException(status_code=401, detail="Invalid token.")
 
-        # Fetch role from DB
-        engine = get_engine()
-        with engine.connect() as conn:
-            row = conn.execute(
-                text("SELECT role FROM users WHERE email = :email"),
-                {"email": email}
-            ).fetchone()
-        role = row[0] if row else "operator"
-        return {"email": email, "role": role}
+        # Role / active flag from the TTL cache — DB only on a miss
+        user = _USER_CACHE.get_or_load(email, lambda: _load_user(email))
+        if not user["is_active"]:
+            raise HTTPException(status_code=401, detail="User not found or inactive.")
+        return {"email": email, "role": user["role"]}
     except JWTError:
         raise HTTPException(status_code=401, detail="Token expired or invalid.")
\ No newline at end of file
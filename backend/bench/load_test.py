@@ -0,0 +1,320 @@
+"""
+load_test.py — Closed-loop load test of the FastAPI app, in-process.
+
+N concurrent clients drive /agent/nl2sql, /kpis/* and /auth/login through
+httpx's ASGI transport. The full app runs, lifespan included, on one event
+loop, i.e. the request path of a single uvicorn worker minus HTTP parsing.
+The LLM is the ``stub`` backend with a fixed latency. The database is a
+seeded SQLite file by default, or any URL given with --database-url (e.g. a
+local Postgres that has the real schema):
+
+    python -m backend.bench.load_test --concurrency 32 --duration 30 \\
+        --llm-latency-ms 400 --mix nl2sql=6,kpis=3,login=1 --out load.json
+
+The JSON report has:
+  - throughput
+  - latency percentiles, per endpoint and overall
+  - status counts
+  - saturation samples: DB pool checkouts and overflow, anyio worker-thread
+    tokens (sync endpoints), and the asyncio default executor
+    (``asyncio.to_thread``) — busy threads, queue depth and the time each
+    call waited in the queue before a thread picked it up
+
+On SQLite the KPI queries, which are Postgres SQL, take their error
+fallback. Point --database-url at Postgres for representative KPI numbers.
+Rate limiting is disabled for the run.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import numpy as np
+
+from backend.utils.sqlite_seed import seed_sqlite
+
+_KPI_PATHS = ("/kpis/summary", "/kpis/oee-trend", "/kpis/downtime-breakdown")
+
+
+class InstrumentedExecutor(ThreadPoolExecutor):
+    """Default executor that records how long each call queued for a thread."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.queue_ms: List[float] = []
+        self._busy = 0
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self) -> int:
+        return self._busy
+
+    @property
+    def queued(self) -> int:
+        return self._work_queue.qsize()
+
+    def submit(self, fn, /, *args, **kwargs):
+        enqueued = time.perf_counter()
+
+        def run():
+            with self._lock:
+                self.queue_ms.append((time.perf_counter() - enqueued) * 1000.0)
+                self._busy += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._busy -= 1
+
+        return super().submit(run)
+
+
+# ---------------------------------------------------------------------------
+# Reporting
+# ---------------------------------------------------------------------------
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    arr = np.asarray(values, dtype=float)
+    return {
+        "n": int(arr.size),
+        "mean": float(arr.mean()),
+        "p50": float(np.percentile(arr, 50)),
+        "p90": float(np.percentile(arr, 90)),
+        "p95": float(np.percentile(arr, 95)),
+        "p99": float(np.percentile(arr, 99)),
+        "max": float(arr.max()),
+    }
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    return {"mean": float(np.mean(samples)), "max": float(np.max(samples))}
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+
+# ---------------------------------------------------------------------------
+# Load generation
+# ---------------------------------------------------------------------------
+
+async def _run(args, questions: List[str]) -> Dict[str, Any]:
+    # Imported here: backend.config reads the environment set up by main().
+    import anyio.to_thread
+    import httpx
+
+    from backend import app as app_module
+    from backend.utils import db
+
+    executor = InstrumentedExecutor(max_workers=args.executor_workers,
+                                    thread_name_prefix="to-thread")
+    asyncio.get_running_loop().set_default_executor(executor)
+    thread_limiter = anyio.to_thread.current_default_thread_limiter()
+    app_module.limiter.enabled = False
+
+    mix = {}
+    for part in args.mix.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    names, weights = list(mix), list(mix.values())
+
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    statuses: Dict[str, Dict[str, int]] = {name: {} for name in names}
+    samples: Dict[str, List[float]] = {k: [] for k in (
+        "pool_checked_out", "pool_overflow", "async_pool_checked_out",
+        "threadpool_borrowed", "threadpool_waiting", "executor_busy", "executor_queued",
+    )}
+    counter = {"sent": 0}
+    stop = asyncio.Event()
+
+    async def sample_loop():
+        while not stop.is_set():
+            if db._engine is not None:
+                samples["pool_checked_out"].append(db._engine.pool.checkedout())
+                samples["pool_overflow"].append(db._engine.pool.overflow())
+            if db._async_engine is not None:
+                samples["async_pool_checked_out"].append(
+                    db._async_engine.sync_engine.pool.checkedout())
+            stats = thread_limiter.statistics()
+            samples["threadpool_borrowed"].append(stats.borrowed_tokens)
+            samples["threadpool_waiting"].append(stats.tasks_waiting)
+            samples["executor_busy"].append(executor.busy)
+            samples["executor_queued"].append(executor.queued)
+            try:
+                await asyncio.wait_for(stop.wait(), args.sample_interval_s)
+            except asyncio.TimeoutError:
+                pass
+
+    async with app_module.app.router.lifespan_context(app_module.app):
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                     timeout=None) as client:
+            resp = await client.post("/auth/login",
+                                     json={"email": args.email, "password": args.password})
+            resp.raise_for_status()
+            headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+            async def request(rng: random.Random, name: str):
+                if name == "nl2sql":
+                    question = rng.choice(questions)
+                    if not args.repeat_questions:
+                        # Unique text → answer-cache miss; the full pipeline runs.
+                        question = f"{question} (#{counter['sent']})"
+                    return await client.post("/agent/nl2sql", headers=headers,
+                                             json={"question": question})
+                if name == "kpis":
+                    return await client.get(rng.choice(_KPI_PATHS), headers=headers)
+                if name == "login":
+                    return await client.post("/auth/login", json={
+                        "email": args.email, "password": args.password})
+                raise ValueError(f"unknown endpoint in --mix: {name}")
+
+            deadline = time.perf_counter() + args.duration
+
+            async def client_loop(i: int):
+                rng = random.Random(args.seed + i)
+                while time.perf_counter() < deadline and (
+                        not args.requests or counter["sent"] < args.requests):
+                    counter["sent"] += 1
+                    name = rng.choices(names, weights)[0]
+                    start = time.perf_counter()
+                    try:
+                        status = str((await request(rng, name)).status_code)
+                    except Exception as exc:
+                        status = type(exc).__name__
+                    latencies[name].append((time.perf_counter() - start) * 1000.0)
+                    statuses[name][status] = statuses[name].get(status, 0) + 1
+
+            sampler = asyncio.create_task(sample_loop())
+            started = time.perf_counter()
+            await asyncio.gather(*(client_loop(i) for i in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await sampler
+
+    executor.shutdown(wait=False)
+    total = sum(len(v) for v in latencies.values())
+    errors = sum(n for s in statuses.values() for code, n in s.items() if code != "200")
+    pool = db._engine.pool if db._engine is not None else None
+
+    return {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "database": "sqlite" if args.database_url.startswith("sqlite") else "external",
+        "config": {
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "requests": args.requests,
+            "mix": mix,
+            "llm_latency_ms": args.llm_latency_ms,
+            "agent_async": os.environ.get("AGENT_ASYNC"),
+            "repeat_questions": args.repeat_questions,
+            "executor_workers": args.executor_workers,
+        },
+        "elapsed_s": elapsed,
+        "requests_total": total,
+        "errors_total": errors,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "latency_ms": _percentiles([x for v in latencies.values() for x in v]),
+        "endpoints": {
+            name: {
+                "requests": len(latencies[name]),
+                "throughput_rps": len(latencies[name]) / elapsed if elapsed else 0.0,
+                "status": statuses[name],
+                "latency_ms": _percentiles(latencies[name]),
+            }
+            for name in names
+        },
+        "saturation": {
+            "db_pool_size": pool.size() if pool is not None else None,
+            "db_pool_checked_out": _summary(samples["pool_checked_out"]),
+            "db_pool_overflow": _summary(samples["pool_overflow"]),
+            "async_db_pool_checked_out": _summary(samples["async_pool_checked_out"]),
+            "threadpool_tokens": thread_limiter.total_tokens,
+            "threadpool_borrowed": _summary(samples["threadpool_borrowed"]),
+            "threadpool_waiting": _summary(samples["threadpool_waiting"]),
+            "to_thread_workers": args.executor_workers,
+            "to_thread_busy": _summary(samples["executor_busy"]),
+            "to_thread_queued": _summary(samples["executor_queued"]),
+            "to_thread_queue_ms": _percentiles(executor.queue_ms),
+        },
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds")
+    parser.add_argument("--requests", type=int, default=0,
+                        help="stop after N requests (0 = run for --duration)")
+    parser.add_argument("--mix", default="nl2sql=6,kpis=3,login=1",
+                        help="endpoint weights: nl2sql, kpis, login")
+    parser.add_argument("--llm-latency-ms", type=float, default=500.0)
+    parser.add_argument("--database-url", default="",
+                        help="default: a freshly seeded SQLite file")
+    parser.add_argument("--agent-async", choices=("true", "false"), default=None,
+                        help="default: true for external databases, false for SQLite")
+    parser.add_argument("--email", default="bench@example.com")
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--repeat-questions", action="store_true",
+                        help="reuse question text (exercises the answer cache)")
+    parser.add_argument("--executor-workers", type=int, default=min(32, (os.cpu_count() or 1) + 4),
+                        help="asyncio default executor size (asyncio.to_thread)")
+    parser.add_argument("--sample-interval-s", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="bi-copilot-bench-")
+    if not args.database_url:
+        from backend.auth.utils import hash_password
+
+        path = os.path.join(workdir, "bench.db")
+        seed_sqlite(path, args.email, hash_password(args.password))
+        args.database_url = f"sqlite:///{path}"
+
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["AGENT_ASYNC"] = args.agent_async or (
+        "false" if args.database_url.startswith("sqlite") else "true")
+    os.environ["LLM_BACKEND"] = "stub"
+    os.environ["LLM_STUB_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ.setdefault("SCHEMA_SNAPSHOT_PATH", os.path.join(workdir, "schema.json"))
+
+    dataset = os.environ.get("DATASET_PATH") or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "data", "nl_sql_all_100.csv")
+    try:
+        import pandas as pd
+        questions = pd.read_csv(dataset)["nl"].tolist()
+    except (OSError, KeyError):
+        questions = ["Total units produced per day"]
+
+    report = asyncio.run(_run(args, questions))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+pipeline_latency.py — Deterministic end-to-end latency benchmark of the agent.
+
+Runs the full LangGraph pipeline (schema → SQL → guardrail → execute →
+chart / explain) over a fixed list of questions with the LLM served from
+cassettes, so LLM time is a constant you choose and run-to-run differences
+come from our code and the database:
+
+    # once, online: record the cassettes
+    LLM_BACKEND=record python -m backend.bench.pipeline_latency --limit 20
+
+    # offline / CI: replay with a fixed 300 ms per LLM call
+    LLM_REPLAY_LATENCY_MS=300 python -m backend.bench.pipeline_latency \\
+        --limit 20 --repeat 5 --out bench_pipeline.json
+
+LLM_BACKEND defaults to "replay" here. Answer and result caches are cleared
+before every question unless --warm is given.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+os.environ.setdefault("LLM_BACKEND", "replay")
+
+import numpy as np
+import pandas as pd
+
+from backend.config import DATASET_PATH, LLM_BACKEND, LLM_REPLAY_LATENCY_MS
+from backend.agent.runner import arun_agent, clear_answer_cache, run_agent
+from backend.utils.db import dispose_async_engine
+from backend.utils.metrics import NODE_LATENCY
+from backend.utils.result_cache import clear_result_cache
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    arr = np.asarray(values, dtype=float)
+    return {
+        "n": int(arr.size),
+        "mean": float(arr.mean()),
+        "p50": float(np.percentile(arr, 50)),
+        "p95": float(np.percentile(arr, 95)),
+        "p99": float(np.percentile(arr, 99)),
+        "max": float(arr.max()),
+    }
+
+
+def _node_means_ms() -> Dict[str, Dict[str, float]]:
+    """Per-node call count and mean latency from the Prometheus histograms."""
+    sums: Dict[str, float] = {}
+    counts: Dict[str, float] = {}
+    for metric in NODE_LATENCY.collect():
+        for sample in metric.samples:
+            node = sample.labels.get("node")
+            if sample.name.endswith("_sum"):
+                sums[node] = sample.value
+            elif sample.name.endswith("_count"):
+                counts[node] = sample.value
+    return {
+        node: {"calls": int(counts[node]), "mean_ms": 1000.0 * sums[node] / counts[node]}
+        for node in sorted(counts) if counts[node]
+    }
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+
+def run_benchmark(questions: List[str], repeat: int, use_async: bool, warm: bool) -> Dict[str, Any]:
+    total_ms: List[float] = []
+    tft_ms: List[float] = []
+    tfr_ms: List[float] = []
+    failures = 0
+
+    def record(state: Dict[str, Any], start: float) -> None:
+        nonlocal failures
+        total_ms.append((time.perf_counter() - start) * 1000.0)
+        tft_ms.append(state.get("tft_ms", 0.0))
+        tfr_ms.append(state.get("tfr_ms", 0.0))
+        if not any(r.get("success") for r in state.get("executed_results", [])):
+            failures += 1
+
+    def reset() -> None:
+        if not warm:
+            clear_answer_cache()
+            clear_result_cache()
+
+    async def run_async() -> None:
+        # One event loop for the whole run: the asyncpg pool is loop-bound.
+        for _ in range(repeat):
+            for question in questions:
+                reset()
+                start = time.perf_counter()
+                record(await arun_agent(question=question), start)
+        await dispose_async_engine()
+
+    if use_async:
+        asyncio.run(run_async())
+    else:
+        for _ in range(repeat):
+            for question in questions:
+                reset()
+                start = time.perf_counter()
+                record(run_agent(question=question), start)
+
+    return {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "llm_backend": LLM_BACKEND,
+        "llm_replay_latency_ms": LLM_REPLAY_LATENCY_MS,
+        "mode": "async" if use_async else "sync",
+        "warm_caches": warm,
+        "questions": len(questions),
+        "repeat": repeat,
+        "failures": failures,
+        "total_ms": _percentiles(total_ms),
+        "tft_ms": _percentiles(tft_ms),
+        "tfr_ms": _percentiles(tfr_ms),
+        "nodes": _node_means_ms(),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--limit", type=int, default=20, help="first N questions (0 = all)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="drive the async graph (arun_agent)")
+    parser.add_argument("--warm", action="store_true", help="keep answer/result caches")
+    parser.add_argument("--out", default="", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    questions = pd.read_csv(args.dataset)["nl"].tolist()
+    if args.limit:
+        questions = questions[:args.limit]
+
+    report = run_benchmark(questions, args.repeat, args.use_async, args.warm)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+serialization.py — Response encoding benchmark for /agent/nl2sql.
+
+Builds a synthetic agent state (date / text / integer / NUMERIC columns and
+the chart suggest_chart makes from them) and measures, for the default
+NLQueryResponse JSON and the compact format, the CPU time per
+serialisation and the body size raw, gzip and brotli:
+
+    python -m backend.bench.serialization --rows 20 --chart-rows 5000 --out bench_serialization.json
+
+No database or LLM is needed.
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from backend.app import _build_response, _compact_body, _result_item
+from backend.utils.charting import suggest_chart
+from backend.utils.compact import brotli, compress, dumps
+
+_COLUMNS = ["production_date", "line", "units_produced", "oee"]
+_KINDS = ["time", "category", "numeric", "numeric"]
+
+
+def synthetic_state(rows: int, chart_rows: int, seed: int = 0) -> Dict[str, Any]:
+    rng = np.random.default_rng(seed)
+    lines = [f"Line {c}" for c in "ABCDEFGH"]
+    n = max(rows, chart_rows)
+    data = [
+        [date(2024, 1, 1) + timedelta(days=i // len(lines)), lines[i % len(lines)],
+         int(rng.integers(500, 1500)), Decimal(f"{rng.uniform(60, 99):.1f}")]
+        for i in range(n)
+    ]
+    df = pd.DataFrame(data[:chart_rows], columns=_COLUMNS)
+    return {
+        "trace_id": "bench",
+        "chosen_sql": "SELECT production_date, line, units_produced, oee FROM …",
+        "executed_results": [{
+            "sql": "SELECT …", "success": True, "latency_ms": 12.0,
+            "columns": _COLUMNS, "preview_rows": data[:rows],
+            "truncated": n > rows, "total_rows": n,
+        }],
+        "chart_spec": suggest_chart(df, _KINDS),
+        "metadata": {"total_latency_ms": 1500.0, "explanation": "OEE held steady."},
+        "tft_ms": 900.0, "tfr_ms": 12.0,
+    }
+
+
+def _default_body(state: Dict[str, Any]) -> bytes:
+    # What FastAPI does for response_model=NLQueryResponse: build/validate the
+    # model, jsonable_encoder it, render with the stdlib encoder.
+    response = _build_response("bench", state, _result_item(state))
+    return JSONResponse(jsonable_encoder(response)).body
+
+
+def _compact_body_bytes(state: Dict[str, Any]) -> bytes:
+    return dumps({"format": "compact-v1", **_compact_body("bench", state)})
+
+
+def _measure(encode: Callable[[Dict[str, Any]], bytes], state: Dict[str, Any],
+             repeat: int) -> Dict[str, Any]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = encode(state)
+        timings.append((time.perf_counter() - start) * 1000.0)
+    sizes = {"identity": len(body), "gzip": len(compress(body, "gzip"))}
+    if brotli is not None:
+        sizes["br"] = len(compress(body, "br"))
+    return {
+        "serialize_ms_p50": float(np.percentile(timings, 50)),
+        "serialize_ms_p95": float(np.percentile(timings, 95)),
+        "bytes": sizes,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=20, help="preview rows in the result")
+    parser.add_argument("--chart-rows", type=int, default=20, help="rows behind the chart")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--out", default="", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    state = synthetic_state(args.rows, args.chart_rows)
+    report = {
+        "rows": args.rows,
+        "chart_rows": args.chart_rows,
+        "chart_points": len(state["chart_spec"]["labels"]) if state["chart_spec"] else 0,
+        "default": _measure(_default_body, state, args.repeat),
+        "compact": _measure(_compact_body_bytes, state, args.repeat),
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
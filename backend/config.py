@@ -3,9 +3,7 @@ config.py — Environment-based configuration for Manufacturing BI Copilot.
 
 Removed from original:
   - DRIFT_DATABASE_URL   (no schema-drift eval)
-  - DATASET_PATH         (no eval dataset)
   - EVAL_TOP_K           (no top-k candidate generation)
-  - EVAL_TAU_ATOL/RTOL   (no value-accuracy metric)
 """
 
 import os
@@ -19,3 +17,138 @@ DATABASE_URL: str = os.getenv(
 # OpenAI
 OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
 OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
+
+# Answer cache (question → SQL / chart / explanation)
+ANSWER_CACHE_SIZE: int = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL_S: float = float(os.getenv("ANSWER_CACHE_TTL_S", "600"))
+# Re-run the cached SQL on a hit so the rows/chart reflect current data.
+ANSWER_CACHE_REFRESH_DATA: bool = os.getenv("ANSWER_CACHE_REFRESH_DATA", "false").lower() == "true"
+
+# SQL result cache (canonical SQL → rows), invalidated per table
+RESULT_CACHE_SIZE: int = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_TTL_S: float = float(os.getenv("RESULT_CACHE_TTL_S", "60"))
+
+# Async agent pipeline (LangGraph ainvoke + ChatOpenAI.ainvoke + asyncpg).
+# ASYNC_DATABASE_URL defaults to DATABASE_URL with the driver swapped to asyncpg.
+AGENT_ASYNC: bool = os.getenv("AGENT_ASYNC", "true").lower() == "true"
+ASYNC_DATABASE_URL: str = os.getenv("ASYNC_DATABASE_URL", "")
+
+# Relevant-table schema retrieval for prompts (falls back to the full
+# schema when the best table scores below SCHEMA_MIN_SCORE).
+SCHEMA_RETRIEVAL_ENABLED: bool = os.getenv("SCHEMA_RETRIEVAL_ENABLED", "true").lower() == "true"
+SCHEMA_TOP_K: int = int(os.getenv("SCHEMA_TOP_K", "5"))
+SCHEMA_MIN_SCORE: float = float(os.getenv("SCHEMA_MIN_SCORE", "1.0"))
+
+# Schema fingerprint check interval; the prompt schema is rebuilt only when
+# the fingerprint changes. 0 disables background refresh.
+SCHEMA_REFRESH_INTERVAL_S: float = float(os.getenv("SCHEMA_REFRESH_INTERVAL_S", "300"))
+
+# On-disk schema snapshot for fast cold start; validated against the live
+# fingerprint and only re-reflected (SCHEMA_REFLECT_WORKERS in parallel)
+# when stale. Empty SCHEMA_SNAPSHOT_PATH disables persistence.
+SCHEMA_SNAPSHOT_PATH: str = os.getenv(
+    "SCHEMA_SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "schema_snapshot.json"),
+)
+SCHEMA_REFLECT_WORKERS: int = int(os.getenv("SCHEMA_REFLECT_WORKERS", "8"))
+
+# Bounded SQL fetch: the agent preview reads at most SQL_PREVIEW_ROWS rows
+# through a server-side cursor; other callers default to SQL_MAX_ROWS.
+SQL_PREVIEW_ROWS: int = int(os.getenv("SQL_PREVIEW_ROWS", "20"))
+SQL_MAX_ROWS: int = int(os.getenv("SQL_MAX_ROWS", "10000"))
+
+# Charts: CHART_SOURCE_ROWS > SQL_PREVIEW_ROWS builds the chart from up to
+# that many rows (the response preview stays SQL_PREVIEW_ROWS). Time-series
+# and area charts with more than CHART_MAX_POINTS points are downsampled
+# server-side (LTTB, peaks kept); 0 disables downsampling.
+CHART_SOURCE_ROWS: int = int(os.getenv("CHART_SOURCE_ROWS", "0"))
+CHART_MAX_POINTS: int = int(os.getenv("CHART_MAX_POINTS", "500"))
+# Run an extra COUNT(*) when the preview is truncated to report total_rows.
+SQL_PREVIEW_COUNT_TOTAL: bool = os.getenv("SQL_PREVIEW_COUNT_TOTAL", "false").lower() == "true"
+
+# Full-result export of completed traces (trace store is per worker process)
+EXPORT_BATCH_ROWS: int = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))
+TRACE_STORE_SIZE: int = int(os.getenv("TRACE_STORE_SIZE", "1000"))
+TRACE_STORE_TTL_S: float = float(os.getenv("TRACE_STORE_TTL_S", "3600"))
+
+# KPI summary snapshot lifetime (one consolidated query per refresh)
+KPI_SNAPSHOT_TTL_S: float = float(os.getenv("KPI_SNAPSHOT_TTL_S", "30"))
+
+# Incremental KPI rollup serving /kpis/summary, /oee-trend, /downtime-breakdown
+KPI_ROLLUP_ENABLED: bool = os.getenv("KPI_ROLLUP_ENABLED", "true").lower() == "true"
+KPI_ROLLUP_REFRESH_S: float = float(os.getenv("KPI_ROLLUP_REFRESH_S", "60"))
+KPI_ROLLUP_RETENTION_DAYS: int = int(os.getenv("KPI_ROLLUP_RETENTION_DAYS", "31"))
+# Days re-read on every refresh so late or corrected rows are folded in
+KPI_ROLLUP_LOOKBACK_DAYS: int = int(os.getenv("KPI_ROLLUP_LOOKBACK_DAYS", "3"))
+
+# get_current_user role / active-status cache
+AUTH_USER_CACHE_SIZE: int = int(os.getenv("AUTH_USER_CACHE_SIZE", "4096"))
+AUTH_USER_CACHE_TTL_S: float = float(os.getenv("AUTH_USER_CACHE_TTL_S", "60"))
+
+# Background query_logs writer
+QUERY_LOG_QUEUE_SIZE: int = int(os.getenv("QUERY_LOG_QUEUE_SIZE", "10000"))
+QUERY_LOG_BATCH_SIZE: int = int(os.getenv("QUERY_LOG_BATCH_SIZE", "200"))
+QUERY_LOG_FLUSH_S: float = float(os.getenv("QUERY_LOG_FLUSH_S", "1.0"))
+
+# Offline evaluation (backend/eval). Gold results are cached on disk as
+# parquet keyed by SQL hash + DB fingerprint; empty EVAL_GOLD_CACHE_DIR
+# disables the cache. EVAL_WORKERS questions are evaluated concurrently.
+DATASET_PATH: str = os.getenv(
+    "DATASET_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "nl_sql_all_100.csv"),
+)
+EVAL_WORKERS: int = int(os.getenv("EVAL_WORKERS", "8"))
+EVAL_GOLD_CACHE_DIR: str = os.getenv(
+    "EVAL_GOLD_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "eval_gold"),
+)
+EVAL_TAU_ATOL: float = float(os.getenv("EVAL_TAU_ATOL", "1e-6"))
+EVAL_TAU_RTOL: float = float(os.getenv("EVAL_TAU_RTOL", "1e-4"))
+
+# LLM backend: "openai", "record" (call OpenAI and write cassettes) or
+# "replay" (serve cassettes offline). LLM_REPLAY_LATENCY_MS is a fixed delay
+# per replayed call, or "recorded" to reuse the latency seen when recording.
+LLM_BACKEND: str = os.getenv("LLM_BACKEND", "openai").lower()
+LLM_CASSETTE_DIR: str = os.getenv(
+    "LLM_CASSETTE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "llm_cassettes"),
+)
+LLM_REPLAY_LATENCY_MS: str = os.getenv("LLM_REPLAY_LATENCY_MS", "0")
+# LLM_BACKEND=stub (load tests): fixed SQL answer and per-call latency.
+LLM_STUB_SQL: str = os.getenv(
+    "LLM_STUB_SQL",
+    "SELECT production_date, SUM(units_produced) AS total_units_produced "
+    "FROM machine_production_daily GROUP BY production_date ORDER BY production_date",
+)
+LLM_STUB_LATENCY_MS: float = float(os.getenv("LLM_STUB_LATENCY_MS", "500"))
+
+# Hedged SQL generation: one candidate per temperature, generated
+# concurrently, EXPLAIN-validated and executed in parallel; the first
+# successful result wins and the rest are cancelled.
+SQL_HEDGE_ENABLED: bool = os.getenv("SQL_HEDGE_ENABLED", "false").lower() == "true"
+SQL_HEDGE_TEMPERATURES: str = os.getenv("SQL_HEDGE_TEMPERATURES", "0.0,0.4,0.8")
+
+# Agent SQL safety: every agent statement runs in a read-only transaction
+# with a per-statement timeout (Postgres; 0 disables the timeout).
+SQL_STATEMENT_TIMEOUT_MS: int = int(os.getenv("SQL_STATEMENT_TIMEOUT_MS", "15000"))
+SQL_READ_ONLY: bool = os.getenv("SQL_READ_ONLY", "true").lower() == "true"
+# Full-result exports scan far more rows than a preview, so they get their
+# own, larger ceiling (0 disables it).
+EXPORT_STATEMENT_TIMEOUT_MS: int = int(os.getenv("EXPORT_STATEMENT_TIMEOUT_MS", "300000"))
+
+# EXPLAIN-based cost gate between guardrail and execute_sql (Postgres).
+# Over either threshold: "limit" appends LIMIT SQL_MAX_ROWS when the query
+# has none and re-checks; anything still over (or "reject") is rejected.
+SQL_COST_GATE_ENABLED: bool = os.getenv("SQL_COST_GATE_ENABLED", "true").lower() == "true"
+SQL_MAX_PLAN_COST: float = float(os.getenv("SQL_MAX_PLAN_COST", "10000000"))
+SQL_MAX_PLAN_ROWS: float = float(os.getenv("SQL_MAX_PLAN_ROWS", "1000000"))
+SQL_COST_GATE_ACTION: str = os.getenv("SQL_COST_GATE_ACTION", "limit").lower()
+
+# SQL analysis (sqlglot): dialect the agent's SQL is parsed as, and how many
+# distinct statements keep their parse memoised.
+SQL_PARSE_DIALECT: str = os.getenv("SQL_PARSE_DIALECT", "postgres")
+SQL_ANALYSIS_CACHE_SIZE: int = int(os.getenv("SQL_ANALYSIS_CACHE_SIZE", "1024"))
+
+# Compact responses (?format=compact): bodies at least this large are
+# brotli/gzip-compressed when the client's Accept-Encoding allows it.
+RESPONSE_COMPRESS_MIN_BYTES: int = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
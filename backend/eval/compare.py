@@ -0,0 +1,161 @@
+"""
+compare.py — Vectorized comparison of predicted vs. gold result sets.
+
+Both frames are normalised once (column alignment, numeric coercion,
+tolerance snapping, NULL unification) and every row is reduced to a 64-bit
+hash with ``pd.util.hash_pandas_object``. Exact match, precision/recall/F1
+and value accuracy then come from hash counts and one sorted ``allclose``
+per numeric column. No per-cell Python loops, so the cost is linear in the
+number of cells.
+
+Numeric tolerance for the hash-based metrics works by snapping values to a
+grid of ``max(atol, rtol * max|gold|)`` per column. Two values within
+tolerance of each other can still land on either side of a grid boundary.
+``value_accuracy`` does not have that edge: it re-checks the aligned raw
+values with ``np.allclose``.
+"""
+
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.config import EVAL_TAU_ATOL, EVAL_TAU_RTOL
+
+_NULL = "\x00NULL"
+_NUMERIC_KINDS = {"integer", "floating", "decimal", "mixed-integer-float", "boolean"}
+
+
+class Comparison(NamedTuple):
+    exact_match: bool
+    precision: float
+    recall: float
+    f1: float
+    value_accuracy: bool
+
+
+def _align_columns(pred: pd.DataFrame, gold: pd.DataFrame,
+                   ignore_column_order: bool) -> Optional[pd.DataFrame]:
+    """``pred`` with columns in gold's order, or None if widths differ."""
+    if pred.shape[1] != gold.shape[1]:
+        return None
+    same_names = (
+        ignore_column_order
+        and pred.columns.is_unique and gold.columns.is_unique
+        and set(pred.columns) == set(gold.columns)
+    )
+    if same_names:
+        return pred[list(gold.columns)]
+    # Otherwise align positionally — aliases differ between writers of SQL.
+    return pred.set_axis(gold.columns, axis=1)
+
+
+def _numeric(col: pd.Series) -> Optional[np.ndarray]:
+    """float64 view of a numeric (incl. Decimal / bool) column, else None."""
+    if pd.api.types.is_numeric_dtype(col) or pd.api.types.is_bool_dtype(col):
+        return col.to_numpy(dtype="float64", na_value=np.nan)
+    if col.dtype == object and pd.api.types.infer_dtype(col, skipna=True) in _NUMERIC_KINDS:
+        return pd.to_numeric(col, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    return None
+
+
+def _normalise(pred: pd.DataFrame, gold: pd.DataFrame, atol: float, rtol: float
+               ) -> Tuple[pd.DataFrame, pd.DataFrame, dict, dict]:
+    """
+    Hashable normalised copies of both frames plus their raw float columns
+    (position → array) for the value-accuracy check.
+    """
+    pred_norm, gold_norm, pred_num, gold_num = {}, {}, {}, {}
+    for i in range(gold.shape[1]):
+        g = _numeric(gold.iloc[:, i])
+        p = _numeric(pred.iloc[:, i])
+        if g is not None and p is not None:
+            finite = np.abs(g[np.isfinite(g)])
+            step = max(atol, rtol * (finite.max() if finite.size else 0.0)) or 1e-12
+            for arr, norm, num in ((g, gold_norm, gold_num), (p, pred_norm, pred_num)):
+                snapped = np.round(arr / step)
+                snapped[snapped == 0] = 0.0          # fold -0.0 into 0.0
+                norm[i] = snapped
+                num[i] = arr
+        else:
+            for col, norm in ((gold.iloc[:, i], gold_norm), (pred.iloc[:, i], pred_norm)):
+                norm[i] = col.astype(object).where(col.notna(), _NULL).astype(str).to_numpy()
+            if g is not None:
+                gold_num[i] = g
+    return pd.DataFrame(pred_norm), pd.DataFrame(gold_norm), pred_num, gold_num
+
+
+def _row_hashes(df: pd.DataFrame, n_rows: int) -> np.ndarray:
+    if df.shape[1] == 0:
+        return np.zeros(n_rows, dtype="uint64")
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def compare_results(
+    pred: pd.DataFrame,
+    gold: pd.DataFrame,
+    atol: float = EVAL_TAU_ATOL,
+    rtol: float = EVAL_TAU_RTOL,
+    multiset: bool = True,
+    ignore_row_order: bool = True,
+    ignore_column_order: bool = True,
+) -> Comparison:
+    """
+    Compare ``pred`` against ``gold`` in one pass.
+
+    - exact_match    same rows (as a multiset, or a set with ``multiset=False``;
+                     positionally with ``ignore_row_order=False``)
+    - precision / recall / f1   over matching rows, same semantics
+    - value_accuracy same shape and every numeric gold column within
+                     ``atol``/``rtol`` of the prediction (rows aligned)
+    """
+    if len(pred) == 0 and len(gold) == 0:
+        return Comparison(pred.shape[1] == gold.shape[1], 1.0, 1.0, 1.0,
+                          pred.shape[1] == gold.shape[1])
+
+    aligned = _align_columns(pred, gold, ignore_column_order)
+    if aligned is None:
+        return Comparison(False, 0.0, 0.0, 0.0, False)
+
+    pred_norm, gold_norm, pred_num, gold_num = _normalise(aligned, gold, atol, rtol)
+    h_pred = _row_hashes(pred_norm, len(aligned))
+    h_gold = _row_hashes(gold_norm, len(gold))
+
+    # -- set / multiset overlap ------------------------------------------------
+    if multiset:
+        u_pred, c_pred = np.unique(h_pred, return_counts=True)
+        u_gold, c_gold = np.unique(h_gold, return_counts=True)
+        _, i_pred, i_gold = np.intersect1d(u_pred, u_gold, assume_unique=True,
+                                           return_indices=True)
+        overlap = int(np.minimum(c_pred[i_pred], c_gold[i_gold]).sum())
+        n_pred, n_gold = len(h_pred), len(h_gold)
+    else:
+        u_pred, u_gold = np.unique(h_pred), np.unique(h_gold)
+        overlap = len(np.intersect1d(u_pred, u_gold, assume_unique=True))
+        n_pred, n_gold = len(u_pred), len(u_gold)
+
+    precision = overlap / n_pred if n_pred else 0.0
+    recall = overlap / n_gold if n_gold else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+    if ignore_row_order:
+        exact = overlap == n_pred == n_gold
+    else:
+        exact = len(h_pred) == len(h_gold) and bool(np.array_equal(h_pred, h_gold))
+
+    # -- value accuracy on row-aligned raw numbers ------------------------------
+    value_ok = aligned.shape == gold.shape
+    if value_ok and gold_num:
+        if ignore_row_order:
+            order_pred = np.argsort(h_pred, kind="stable")
+            order_gold = np.argsort(h_gold, kind="stable")
+        else:
+            order_pred = order_gold = slice(None)
+        for i, g in gold_num.items():
+            p = pred_num.get(i)
+            if p is None or not np.allclose(p[order_pred], g[order_gold],
+                                            atol=atol, rtol=rtol, equal_nan=True):
+                value_ok = False
+                break
+
+    return Comparison(exact, precision, recall, f1, value_ok)
@@ -0,0 +1,78 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Optional, Tuple
+
+import pandas as pd
+
+from backend.agent.schema_cache import fingerprint_schema
+from backend.config import EVAL_GOLD_CACHE_DIR
+from backend.utils.db import get_engine
+from backend.utils.sql_analysis import analyze_sql
+from backend.eval.metrics import fetch_result_df
+
+logger = logging.getLogger("bi_copilot")
+
+
+class GoldCache:
+    """
+    Gold-SQL result DataFrames persisted as parquet, one file per query.
+
+    Files are named ``<db fingerprint>_<sql hash>.parquet``. The fingerprint
+    covers the database URL and its schema, so pointing the eval at another
+    database or migrating the schema misses the old entries instead of
+    reusing them. Data-only changes are not detected — clear the directory
+    after reloading the eval database.
+    """
+
+    def __init__(self, cache_dir: str = EVAL_GOLD_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._fingerprint: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _db_fingerprint(self) -> str:
+        with self._lock:
+            if self._fingerprint is None:
+                engine = get_engine()
+                db_id = engine.url.render_as_string(hide_password=True)
+                raw = f"{db_id}|{fingerprint_schema(engine)}"
+                self._fingerprint = hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+            return self._fingerprint
+
+    def _path(self, sql: str) -> str:
+        sql_hash = hashlib.sha256(analyze_sql(sql).normalized.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{self._db_fingerprint()}_{sql_hash}.parquet")
+
+    def fetch(self, sql: str) -> Tuple[pd.DataFrame, float, bool, str]:
+        """Same contract as ``fetch_result_df``; served from disk when cached."""
+        if not self.cache_dir:
+            return fetch_result_df(sql)
+
+        path = self._path(sql)
+        if os.path.exists(path):
+            start = time.time()
+            try:
+                df = pd.read_parquet(path)
+                return df, (time.time() - start) * 1000.0, True, ""
+            except Exception as exc:
+                logger.warning("Gold cache entry unreadable (%s); re-running SQL.", exc)
+
+        df, latency_ms, ok, err = fetch_result_df(sql)
+        if ok:
+            self._save(path, df)
+        return df, latency_ms, ok, err
+
+    def _save(self, path: str, df: pd.DataFrame) -> None:
+        # Unique tmp name: several workers may write the same entry at once.
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        except Exception as exc:
+            # e.g. duplicate column names or mixed-type object columns.
+            logger.warning("Could not cache gold result: %s", exc)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
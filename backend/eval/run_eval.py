@@ -1,76 +1,112 @@
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
 import numpy as np
+import pandas as pd
 import logging
 
 from backend.agent.runner import run_agent
 from backend.eval.dataset import make_splits
+from backend.eval.gold_cache import GoldCache
 from backend.eval.metrics import (
     is_aggregate_query,
     fetch_result_df,
     answer_set_exact_match,
-    value_accuracy_tau,
-    set_f1,
     compute_latency_stats,
 )
-from backend.config import EVAL_TOP_K
+from backend.eval.compare import compare_results
+from backend.config import EVAL_WORKERS
 
 logger = logging.getLogger("bi_copilot")
 
-def run_full_evaluation(split: str = "test", top_k: int = EVAL_TOP_K) -> Dict[str, Any]:
+
+def _agent_result_df(result: Dict[str, Any]) -> Optional[pd.DataFrame]:
+    """The agent's own rows for ``result`` when they are the complete answer."""
+    if not result.get("success") or result.get("truncated", True):
+        return None
+    return pd.DataFrame(result.get("preview_rows", []), columns=result.get("columns", []))
+
+
+def _evaluate_row(question: str, gold_sql: str, gold_cache: GoldCache) -> Optional[Dict[str, Any]]:
+    is_agg = is_aggregate_query(gold_sql)
+
+    df_gold, lat_gold, ok_gold, err_gold = gold_cache.fetch(gold_sql)
+    if not ok_gold:
+        logger.warning("Gold SQL failed, skipping: %s (%s)", gold_sql, err_gold)
+        return None
+
+    state = run_agent(question=question)
+    executed = state.get("executed_results", [])
+    record: Dict[str, Any] = {
+        "tft_ms": state.get("tft_ms", 0.0),
+        "tfr_ms": state.get("tfr_ms", 0.0),
+        "ea": 1 if any(r.get("success") for r in executed) else 0,
+    }
+
+    # Each distinct successful SQL is materialised at most once: from the
+    # agent's own (untruncated) rows, otherwise by re-running it.
+    pred_dfs: Dict[str, pd.DataFrame] = {}
+
+    def pred_df(result: Dict[str, Any]) -> Optional[pd.DataFrame]:
+        sql = result["sql"]
+        if sql not in pred_dfs:
+            df = _agent_result_df(result)
+            if df is None:
+                df, _, ok, _ = fetch_result_df(sql)
+                if not ok:
+                    return None
+            pred_dfs[sql] = df
+        return pred_dfs[sql]
+
+    # Pass@k: any candidate yields exact match vs gold
+    passk_success = False
+    for r in executed:
+        if not r.get("success"):
+            continue
+        cand_df = pred_df(r)
+        if cand_df is not None and answer_set_exact_match(cand_df, df_gold):
+            passk_success = True
+            break
+    record["passk"] = 1 if passk_success else 0
+
+    chosen_sql = state.get("chosen_sql")
+    chosen = next((r for r in executed if r.get("success") and r.get("sql") == chosen_sql), None)
+    if chosen is not None:
+        df_pred = pred_df(chosen)
+        if df_pred is not None:
+            # One pass gives exact match, F1 and value accuracy together.
+            cmp = compare_results(df_pred, df_gold)
+            if is_agg:
+                record["va"] = 1 if cmp.value_accuracy else 0
+            else:
+                record["asem"] = 1 if cmp.exact_match else 0
+                record["f1"] = cmp.f1
+    return record
+
+
+def run_full_evaluation(split: str = "test", workers: int = EVAL_WORKERS) -> Dict[str, Any]:
+    """
+    Evaluate ``split`` with ``workers`` questions in flight at once (agent
+    call + SQL per worker). Keep ``workers`` within the engine's pool
+    (pool_size + max_overflow) or workers will queue on connections.
+    """
     train_df, val_df, test_df = make_splits()
     df = {"train": train_df, "val": val_df, "test": test_df}[split]
+    gold_cache = GoldCache()
 
-    ea_flags = []
-    asem_flags = []
-    va_flags = []
-    f1_scores = []
-    passk_flags = []
-    tft_list = []
-    tfr_list = []
-
-    for _, row in df.iterrows():
-        question = row["nl"]
-        gold_sql = row["sql"]
-        is_agg = is_aggregate_query(gold_sql)
-
-        df_gold, lat_gold, ok_gold, err_gold = fetch_result_df(gold_sql)
-        if not ok_gold:
-            logger.warning("Gold SQL failed, skipping: %s (%s)", gold_sql, err_gold)
-            continue
+    rows = list(zip(df["nl"], df["sql"]))
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="eval") as pool:
+        records = [
+            r for r in pool.map(lambda row: _evaluate_row(row[0], row[1], gold_cache), rows)
+            if r is not None
+        ]
 
-        state = run_agent(question=question, top_k=top_k)
-
-        executed = state.get("executed_results", [])
-        tft_ms = state.get("tft_ms", 0.0)
-        tfr_ms = state.get("tfr_ms", 0.0)
-        if tft_ms:
-            tft_list.append(tft_ms)
-        if tfr_ms:
-            tfr_list.append(tfr_ms)
-
-        success_any = any(r.get("success") for r in executed)
-        ea_flags.append(1 if success_any else 0)
-
-        # Pass@k: any candidate yields exact match vs gold
-        passk_success = False
-        for r in executed:
-            if not r.get("success"):
-                continue
-            cand_df, _, ok_cand, _ = fetch_result_df(r["sql"])
-            if ok_cand and answer_set_exact_match(cand_df, df_gold):
-                passk_success = True
-                break
-        passk_flags.append(1 if passk_success else 0)
-
-        chosen_sql = state.get("chosen_sql")
-        if chosen_sql:
-            df_pred, _, ok_pred, _ = fetch_result_df(chosen_sql)
-            if ok_pred:
-                if is_agg:
-                    va_flags.append(1 if value_accuracy_tau(df_pred, df_gold) else 0)
-                else:
-                    asem_flags.append(1 if answer_set_exact_match(df_pred, df_gold) else 0)
-                    f1_scores.append(set_f1(df_pred, df_gold))
+    ea_flags = [r["ea"] for r in records]
+    asem_flags = [r["asem"] for r in records if "asem" in r]
+    va_flags = [r["va"] for r in records if "va" in r]
+    f1_scores = [r["f1"] for r in records if "f1" in r]
+    passk_flags = [r["passk"] for r in records]
+    tft_list = [r["tft_ms"] for r in records if r["tft_ms"]]
+    tfr_list = [r["tfr_ms"] for r in records if r["tfr_ms"]]
 
     metrics: Dict[str, Any] = {}
     if ea_flags:
@@ -20,7 +20,7 @@ def run_safety_evaluation() -> Dict[str, Any]:
     examples: List[Dict[str, Any]] = []
 
     for q in DANGEROUS_NL_QUERIES:
-        state = run_agent(question=q, top_k=3)
+        state = run_agent(question=q)
         candidates = state.get("sql_candidates", [])
         blocked = True
         for sql in candidates:
@@ -0,0 +1,198 @@
+"""
+rollup.py — Incremental in-memory KPI rollup for the dashboard endpoints.
+
+Keeps daily aggregates keyed by (day, machine_id) for production and by
+(day, issue_type) for maintenance. A background thread re-reads only rows
+from the current watermark (the newest production_date / log_date already
+folded in) or the last ``lookback_days`` days, whichever is earlier, and
+replaces those days' buckets. The watermark day may still be filling up;
+the lookback picks up rows that arrive late or are corrected for recent
+days. Days older than the retention window are dropped, so a refresh costs
+the same whether the tables hold a month or years of history.
+
+Windows are day-granular: "last 7 days" means day >= CURRENT_DATE - 7,
+where the raw queries used NOW() - INTERVAL '7 days' for log_date. Rows
+backfilled further back than the lookback are only picked up by rebuild().
+"""
+
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from backend.utils.db import get_engine
+from backend.utils.metrics import observe_sql
+
+logger = logging.getLogger("bi_copilot")
+
+_PRODUCTION_SQL = """
+    SELECT production_date, machine_id,
+           SUM(units_produced) AS units, SUM(rejected_units) AS rejected
+    FROM machine_production_daily
+    WHERE production_date >= :since
+    GROUP BY production_date, machine_id
+"""
+
+_MAINTENANCE_SQL = """
+    SELECT DATE(log_date) AS day, issue_type,
+           SUM(downtime_minutes) AS minutes, COUNT(*) AS incidents
+    FROM maintenance_logs
+    WHERE log_date >= :since
+    GROUP BY DATE(log_date), issue_type
+"""
+
+
+def _as_date(value: Any) -> date:
+    """Drivers differ: SQLite returns dates as ISO strings, Postgres as ``date``."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def _round1(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 1)
+
+
+class KPIRollup:
+    """Daily per-machine / per-issue aggregates with watermark refresh."""
+
+    def __init__(self, retention_days: int = 31, lookback_days: int = 3):
+        self.retention_days = retention_days
+        self.lookback_days = lookback_days
+        self._lock = threading.Lock()
+        self._production: Dict[Tuple[date, Any], Tuple[float, float]] = {}
+        self._maintenance: Dict[Tuple[date, Any], Tuple[float, int]] = {}
+        self._prod_watermark: Optional[date] = None
+        self._maint_watermark: Optional[date] = None
+        self._today: Optional[date] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._today is not None
+
+    # -- refresh -------------------------------------------------------------
+
+    def refresh(self) -> None:
+        """Re-read days from each watermark / the lookback and evict expired days."""
+        engine = get_engine()
+        with observe_sql("kpi_rollup_refresh"), engine.connect() as conn:
+            today = _as_date(conn.execute(text("SELECT CURRENT_DATE")).scalar())
+            floor = today - timedelta(days=self.retention_days)
+            lookback = today - timedelta(days=self.lookback_days)
+            prod_since = max(min(self._prod_watermark or floor, lookback), floor)
+            maint_since = max(min(self._maint_watermark or floor, lookback), floor)
+            prod_rows = conn.execute(text(_PRODUCTION_SQL), {"since": prod_since}).fetchall()
+            maint_rows = conn.execute(text(_MAINTENANCE_SQL), {"since": maint_since}).fetchall()
+
+        with self._lock:
+            production = {k: v for k, v in self._production.items()
+                          if floor <= k[0] < prod_since}
+            for day, machine, units, rejected in prod_rows:
+                production[(_as_date(day), machine)] = (float(units or 0), float(rejected or 0))
+
+            maintenance = {k: v for k, v in self._maintenance.items()
+                           if floor <= k[0] < maint_since}
+            for day, issue, minutes, incidents in maint_rows:
+                maintenance[(_as_date(day), issue)] = (float(minutes or 0), int(incidents or 0))
+
+            self._production = production
+            self._maintenance = maintenance
+            self._prod_watermark = max((k[0] for k in production), default=prod_since)
+            self._maint_watermark = max((k[0] for k in maintenance), default=maint_since)
+            self._today = today
+
+        logger.info("KPI rollup refreshed: %d production rows since %s, "
+                    "%d maintenance rows since %s.",
+                    len(prod_rows), prod_since, len(maint_rows), maint_since)
+
+    def rebuild(self) -> None:
+        """Drop all state and reload the retention window from scratch."""
+        with self._lock:
+            self._prod_watermark = self._maint_watermark = None
+            self._production, self._maintenance = {}, {}
+        self.refresh()
+
+    def _loop(self, interval_s: float) -> None:
+        while not self._stop.wait(interval_s):
+            try:
+                self.refresh()
+            except Exception as exc:
+                logger.error("KPI rollup refresh failed: %s", exc)
+
+    def start(self, interval_s: float) -> None:
+        try:
+            self.refresh()
+        except Exception as exc:
+            logger.error("KPI rollup initial load failed: %s", exc)
+        if interval_s <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop, args=(interval_s,), name="kpi-rollup", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    # -- reads ---------------------------------------------------------------
+
+    def _production_since(self, days: int) -> List[Tuple[date, Tuple[float, float]]]:
+        start = self._today - timedelta(days=days)
+        with self._lock:
+            return [(k[0], v) for k, v in self._production.items() if k[0] >= start]
+
+    def _maintenance_since(self, days: int) -> List[Tuple[Any, Tuple[float, int]]]:
+        start = self._today - timedelta(days=days)
+        with self._lock:
+            return [(k[1], v) for k, v in self._maintenance.items() if k[0] >= start]
+
+    def summary(self) -> Dict[str, Any]:
+        prod_30 = self._production_since(30)
+        prod_7 = [(d, v) for d, v in prod_30 if d >= self._today - timedelta(days=7)]
+        maint_30 = self._maintenance_since(30)
+        maint_7 = self._maintenance_since(7)
+
+        units_today = [v[0] for d, v in prod_30 if d == self._today]
+        units_30 = sum(v[0] for _, v in prod_30)
+        rejected_30 = sum(v[1] for _, v in prod_30)
+        units_7 = sum(v[0] for _, v in prod_7)
+        good_7 = sum(v[0] - v[1] for _, v in prod_7)
+        minutes_30 = sum(v[0] for _, v in maint_30)
+        incidents_30 = sum(v[1] for _, v in maint_30)
+
+        return {
+            "oee":             _round1(100.0 * good_7 / units_7) if units_7 else None,
+            "mtbf":            _round1(30.0 * 24 / incidents_30) if incidents_30 else None,
+            "mttr":            _round1(minutes_30 / incidents_30 / 60.0) if incidents_30 else None,
+            "downtime":        _round1(sum(v[0] for _, v in maint_7) / 60.0) if maint_7 else None,
+            "scrap_rate":      _round1(100.0 * rejected_30 / units_30) if units_30 else None,
+            "production_rate": int(sum(units_today)) if units_today else None,
+        }
+
+    def oee_trend(self) -> List[Dict[str, Any]]:
+        per_day: Dict[date, List[float]] = {}
+        for day, (units, rejected) in self._production_since(7):
+            acc = per_day.setdefault(day, [0.0, 0.0])
+            acc[0] += units
+            acc[1] += rejected
+        return [
+            {"day": day.strftime("%a"), "oee": round(100.0 * (u - r) / u, 1)}
+            for day, (u, r) in sorted(per_day.items()) if u
+        ]
+
+    def downtime_breakdown(self, limit: int = 5) -> List[Dict[str, Any]]:
+        per_issue: Dict[Any, float] = {}
+        for issue, (minutes, _) in self._maintenance_since(30):
+            per_issue[issue] = per_issue.get(issue, 0.0) + minutes
+        top = sorted(per_issue.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+        return [{"name": issue, "value": int(minutes)} for issue, minutes in top]
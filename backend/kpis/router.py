@@ -1,81 +1,124 @@
-from fastapi import APIRouter, Depends
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Request
 from backend.auth.router import get_current_user
+from backend.config import (
+    KPI_SNAPSHOT_TTL_S,
+    KPI_ROLLUP_ENABLED,
+    KPI_ROLLUP_RETENTION_DAYS,
+    KPI_ROLLUP_LOOKBACK_DAYS,
+)
+from backend.utils.cache import TTLCache
+from backend.utils.compact import LabelTable, compact_records, compact_response
 from backend.utils.db import get_engine, run_sql
+from .rollup import KPIRollup
+
+logger = logging.getLogger("bi_copilot")
 
 router = APIRouter(prefix="/kpis", tags=["kpis"])
 
-def safe_query(sql):
-    try:
-        engine = get_engine()
-        cols, rows = run_sql(engine, sql)
-        return rows[0][0] if rows else None
-    except Exception:
-        return None
+# Incremental daily rollup (started from the app lifespan). Endpoints serve
+# from it once loaded and fall back to querying raw rows otherwise.
+rollup = KPIRollup(retention_days=KPI_ROLLUP_RETENTION_DAYS,
+                   lookback_days=KPI_ROLLUP_LOOKBACK_DAYS)
 
-@router.get("/summary")
-def kpi_summary(current_user: dict = Depends(get_current_user)):
-    engine = get_engine()
 
-    # Production rate — total units produced today
-    production_rate = safe_query("""
-        SELECT SUM(units_produced)
-        FROM machine_production_daily
-        WHERE production_date = CURRENT_DATE
-    """)
-
-    # Scrap rate — rejected / total * 100 (last 30 days)
-    scrap_rate = safe_query("""
-        SELECT ROUND(
-            100.0 * SUM(rejected_units) / NULLIF(SUM(units_produced), 0), 1
-        )
-        FROM machine_production_daily
-        WHERE production_date >= CURRENT_DATE - INTERVAL '30 days'
-    """)
+def _use_rollup() -> bool:
+    return KPI_ROLLUP_ENABLED and rollup.ready
 
-    # Downtime — total hours (last 7 days)
-    downtime = safe_query("""
-        SELECT ROUND(SUM(downtime_minutes) / 60.0, 1)
-        FROM maintenance_logs
-        WHERE log_date >= NOW() - INTERVAL '7 days'
-    """)
 
-    # MTTR — avg repair time per incident in hours
-    mttr = safe_query("""
-        SELECT ROUND(AVG(downtime_minutes) / 60.0, 1)
-        FROM maintenance_logs
-        WHERE log_date >= NOW() - INTERVAL '30 days'
-    """)
+def _check_format(format: str) -> None:
+    if format not in ("json", "compact"):
+        raise HTTPException(status_code=400, detail="format must be json or compact.")
+
+
+def _series(request: Request, endpoint: str, records: list, format: str):
+    """``records`` as-is, or columnar with a label table when format=compact."""
+    if format != "compact":
+        return records
+    table = LabelTable()
+    return compact_response(request, endpoint,
+                            {**compact_records(records, table), "labels": table.labels})
 
-    # MTBF — total uptime hours / number of failures (last 30 days)
-    mtbf = safe_query("""
-        SELECT ROUND(
-            (30.0 * 24) / NULLIF(COUNT(*), 0), 1
-        )
+
+# All six summary KPIs in ONE statement: one scan per table, one pooled
+# connection, one round-trip. Windows match the former per-metric queries.
+_SUMMARY_SQL = """
+    WITH prod AS (
+        SELECT
+            -- Production rate — total units produced today
+            SUM(units_produced) FILTER (WHERE production_date = CURRENT_DATE)
+                AS production_rate,
+            -- Scrap rate — rejected / total * 100 (last 30 days)
+            ROUND(
+                100.0 * SUM(rejected_units)
+                / NULLIF(SUM(units_produced), 0), 1
+            ) AS scrap_rate,
+            -- OEE — quality ratio from production (last 7 days)
+            ROUND(
+                100.0 * SUM(units_produced - rejected_units)
+                    FILTER (WHERE production_date >= CURRENT_DATE - INTERVAL '7 days')
+                / NULLIF(SUM(units_produced)
+                    FILTER (WHERE production_date >= CURRENT_DATE - INTERVAL '7 days'), 0), 1
+            ) AS oee
+        FROM machine_production_daily
+        WHERE production_date >= CURRENT_DATE - INTERVAL '30 days'
+    ),
+    maint AS (
+        SELECT
+            -- Downtime — total hours (last 7 days)
+            ROUND(
+                SUM(downtime_minutes) FILTER (WHERE log_date >= NOW() - INTERVAL '7 days')
+                / 60.0, 1
+            ) AS downtime,
+            -- MTTR — avg repair time per incident in hours
+            ROUND(AVG(downtime_minutes) / 60.0, 1) AS mttr,
+            -- MTBF — total uptime hours / number of failures (last 30 days)
+            ROUND((30.0 * 24) / NULLIF(COUNT(*), 0), 1) AS mtbf
         FROM maintenance_logs
         WHERE log_date >= NOW() - INTERVAL '30 days'
-    """)
+    )
+    SELECT
+        prod.oee, maint.mtbf, maint.mttr, maint.downtime,
+        prod.scrap_rate, prod.production_rate
+    FROM prod CROSS JOIN maint
+"""
 
-    # OEE — quality ratio from production (last 7 days)
-    oee = safe_query("""
-        SELECT ROUND(
-            100.0 * SUM(units_produced - rejected_units) / NULLIF(SUM(units_produced), 0), 1
-        )
-        FROM machine_production_daily
-        WHERE production_date >= CURRENT_DATE - INTERVAL '7 days'
-    """)
+_SUMMARY_KEYS = ("oee", "mtbf", "mttr", "downtime", "scrap_rate", "production_rate")
+
+# In-process snapshot: N concurrent dashboard loads → one DB round-trip
+# per KPI_SNAPSHOT_TTL_S (single-flight refresh).
+_SNAPSHOT = TTLCache(maxsize=1, ttl_s=KPI_SNAPSHOT_TTL_S)
+
+
+def _load_summary() -> dict:
+    engine = get_engine()
+    cols, rows = run_sql(engine, _SUMMARY_SQL, label="kpi_summary")
+    values = rows[0] if rows else [None] * len(_SUMMARY_KEYS)
+    return dict(zip(_SUMMARY_KEYS, values))
 
-    return {
-        "oee":             oee,
-        "mtbf":            mtbf,
-        "mttr":            mttr,
-        "downtime":        downtime,
-        "scrap_rate":      scrap_rate,
-        "production_rate": production_rate,
-    }
+
+@router.get("/summary")
+def kpi_summary(current_user: dict = Depends(get_current_user)):
+    if _use_rollup():
+        return rollup.summary()
+    try:
+        return dict(_SNAPSHOT.get_or_load("summary", _load_summary))
+    except Exception as exc:
+        logger.error("KPI summary query failed: %s", exc)
+        return {key: None for key in _SUMMARY_KEYS}
 
 
 @router.get("/oee-trend")
-def oee_trend(current_user: dict = Depends(get_current_user)):
+def oee_trend(request: Request, format: str = "json",
+              current_user: dict = Depends(get_current_user)):
+    _check_format(format)
+    return _series(request, "kpi_oee_trend", _oee_trend(), format)
+
+
+def _oee_trend() -> list:
+    if _use_rollup():
+        return rollup.oee_trend()
     try:
         engine = get_engine()
         cols, rows = run_sql(engine, """
@@ -89,14 +132,22 @@ def oee_trend(current_user: dict = Depends(get_current_user)):
             WHERE production_date >= CURRENT_DATE - INTERVAL '7 days'
             GROUP BY production_date
             ORDER BY production_date
-        """)
+        """, label="kpi_oee_trend")
         return [{"day": r[0], "oee": float(r[1])} for r in rows]
     except Exception:
         return []
 
 
 @router.get("/downtime-breakdown")
-def downtime_breakdown(current_user: dict = Depends(get_current_user)):
+def downtime_breakdown(request: Request, format: str = "json",
+                       current_user: dict = Depends(get_current_user)):
+    _check_format(format)
+    return _series(request, "kpi_downtime_breakdown", _downtime_breakdown(), format)
+
+
+def _downtime_breakdown() -> list:
+    if _use_rollup():
+        return rollup.downtime_breakdown()
     try:
         engine = get_engine()
         cols, rows = run_sql(engine, """
@@ -108,7 +159,7 @@ def downtime_breakdown(current_user: dict = Depends(get_current_user)):
             GROUP BY issue_type
             ORDER BY total_minutes DESC
             LIMIT 5
-        """)
+        """, label="kpi_downtime_breakdown")
         return [{"name": r[0], "value": int(r[1])} for r in rows]
     except Exception:
         return []
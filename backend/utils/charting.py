@@ -1,11 +1,21 @@
 from typing import Optional, Dict, List, Any
+import numpy as np
 import pandas as pd
 
-def _coerce_types(df: pd.DataFrame) -> pd.DataFrame:
-    """Intelligently coerce column types for better chart detection."""
+from backend.config import CHART_MAX_POINTS
+
+_TIME_HINTS = ("date", "time", "year", "month")
+
+
+def _time_hint(col: str) -> bool:
+    return any(hint in col.lower() for hint in _TIME_HINTS)
+
+
+def _coerce_types(df: pd.DataFrame, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Intelligently coerce column types (all, or just ``columns``) for better chart detection."""
     df = df.copy()
-    for c in df.columns:
-        if "date" in c.lower() or "time" in c.lower() or "year" in c.lower() or "month" in c.lower():
+    for c in (df.columns if columns is None else columns):
+        if _time_hint(c):
             df[c] = pd.to_datetime(df[c], errors="coerce")
         else:
             # NEW — coerce non-numeric to NaN, then revert if the column came back all-NaN
@@ -14,13 +24,133 @@ def _coerce_types(df: pd.DataFrame) -> pd.DataFrame:
                 df[c] = converted
     return df
 
+def _is_id(col: str) -> bool:
+    return col.lower().endswith("_id") or col.lower().startswith("id")
+
+
+def _classify(df: pd.DataFrame, column_kinds: Optional[List[Optional[str]]]):
+    """
+    (df, time_cols, numeric_cols, categorical_cols). Kinds reported by the
+    database are trusted, then already-typed dtypes; only the remaining
+    object columns are coerced, and the DataFrame is copied only then.
+    A text column with a time-like name (``TO_CHAR(...) AS month``) is
+    coerced too, and charted as time if its values parse as dates.
+    """
+    def dtype_kind(series: pd.Series) -> Optional[str]:
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return "time"
+        if pd.api.types.is_numeric_dtype(series):
+            return "numeric"
+        return None
+
+    cols = list(df.columns)
+    kinds = dict(zip(cols, column_kinds or []))
+    for c in cols:
+        if kinds.get(c) == "category" and _time_hint(c):
+            kinds[c] = None
+        if kinds.get(c) is None:
+            kinds[c] = dtype_kind(df[c])
+    unknown = [c for c in cols if kinds[c] is None]
+    if unknown:
+        original = df
+        df = _coerce_types(df, unknown)
+        for c in unknown:
+            kinds[c] = dtype_kind(df[c]) or "category"
+            if kinds[c] == "time" and df[c].isna().all() and original[c].notna().any():
+                df[c] = original[c]           # time-like name, but not dates
+                kinds[c] = "category"
+
+    time_cols = [c for c in cols if kinds[c] == "time"]
+    numeric_cols = [c for c in cols if kinds[c] == "numeric" and not _is_id(c)]
+    categorical_cols = [c for c in cols if c not in time_cols and c not in numeric_cols]
+    return df, time_cols, numeric_cols, categorical_cols
+
+
+def _values(series: pd.Series) -> list:
+    """JSON-ready metric values; Decimal becomes float, anything unconvertible None."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.tolist()
+    converted = pd.to_numeric(series, errors="coerce")
+    return [None if pd.isna(v) else float(v) for v in converted]
+
+
+def _time_labels(series: pd.Series) -> List[str]:
+    if pd.api.types.is_datetime64_any_dtype(series):
+        fmt = '%Y-%m-%d' if (series.dt.normalize() == series).all() else '%Y-%m-%d %H:%M'
+        return series.dt.strftime(fmt).tolist()
+    # date / datetime objects straight from the driver
+    intraday = any(getattr(v, "hour", 0) or getattr(v, "minute", 0) for v in series)
+    fmt = '%Y-%m-%d %H:%M' if intraday else '%Y-%m-%d'
+    return [v.strftime(fmt) if hasattr(v, "strftime") else str(v) for v in series]
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, target: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of ``target`` points that keep
+    the visual shape of (x, y). First and last points are always kept; each
+    bucket in between keeps the point forming the largest triangle with the
+    previously kept point and the next bucket's mean, so peaks survive.
+    """
+    n = len(y)
+    if target >= n or target < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, target - 1).astype(int)   # target-2 buckets
+    out = np.empty(target, dtype=int)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(target - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nxt_x = x[hi:edges[i + 2]].mean()
+            nxt_y = y[hi:edges[i + 2]].mean()
+        else:
+            nxt_x, nxt_y = x[n - 1], y[n - 1]
+        area = np.abs((x[a] - nxt_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (nxt_y - y[a]))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+def _downsample(df: pd.DataFrame, x_col: str, metrics: List[str], max_points: int) -> pd.DataFrame:
+    """
+    Reduce a time series to about ``max_points`` rows. Each metric gets its
+    own LTTB pass (budget split between them) plus its global min and max;
+    the union of those rows is kept, in time order.
+    """
+    if max_points <= 0 or len(df) <= max_points:
+        return df
+
+    try:
+        x = pd.to_datetime(df[x_col]).to_numpy("datetime64[ns]").astype("int64").astype(float)
+    except (TypeError, ValueError):
+        x = np.arange(len(df), dtype=float)
+    order = np.argsort(x, kind="stable")
+    df, x = df.iloc[order], x[order]
+
+    per_series = max(3, max_points // len(metrics))
+    keep = set()
+    for metric in metrics:
+        y = np.nan_to_num(pd.to_numeric(df[metric], errors="coerce").to_numpy(dtype=float))
+        keep.update(lttb_indices(x, y, per_series).tolist())
+        keep.update((int(y.argmin()), int(y.argmax())))
+    return df.iloc[sorted(keep)]
+
+
 def _is_low_cardinality(series: pd.Series, threshold: int = 10) -> bool:
     """Check if a series has low cardinality (good for pie charts)."""
     return series.nunique() <= threshold
 
-def suggest_chart(df: pd.DataFrame) -> Optional[Dict[str, Any]]:
+def suggest_chart(df: pd.DataFrame,
+                  column_kinds: Optional[List[Optional[str]]] = None,
+                  max_points: int = CHART_MAX_POINTS) -> Optional[Dict[str, Any]]:
     """
     Suggest a Chart.js-compatible visualization based on DataFrame structure.
+
+    ``column_kinds`` ("time" / "numeric" / "category" per column, from the
+    cursor metadata) skips type guessing; unknown columns fall back to
+    pandas coercion. Time-series / area charts longer than ``max_points``
+    are downsampled (LTTB); ``original_point_count`` records the full size.
     
     Returns a dictionary with:
     - chart_type: 'line' | 'bar' | 'pie' | 'area'
@@ -30,27 +160,8 @@ def suggest_chart(df: pd.DataFrame) -> Optional[Dict[str, Any]]:
     if df is None or df.empty:
         return None
 
-    df = _coerce_types(df)
-    cols = list(df.columns)
-
     # ---- Detect column types ----
-    time_cols = [
-        c for c in cols
-        if pd.api.types.is_datetime64_any_dtype(df[c])
-    ]
-
-    numeric_cols = [
-        c for c in cols
-        if pd.api.types.is_numeric_dtype(df[c])
-        and c not in time_cols
-        and not c.lower().endswith("_id")
-        and not c.lower().startswith("id")
-    ]
-
-    categorical_cols = [
-        c for c in cols
-        if c not in time_cols and c not in numeric_cols
-    ]
+    df, time_cols, numeric_cols, categorical_cols = _classify(df, column_kinds)
 
     # ---- Chart Selection Logic ----
 
@@ -64,7 +175,7 @@ def suggest_chart(df: pd.DataFrame) -> Optional[Dict[str, Any]]:
                 "datasets": [
                     {
                         "label": numeric_cols[0],
-                        "data": df[numeric_cols[0]].tolist(),
+                        "data": _values(df[numeric_cols[0]]),
                         "backgroundColor": [
                             'rgba(255, 99, 132, 0.7)',
                             'rgba(54, 162, 235, 0.7)',
@@ -84,7 +195,9 @@ def suggest_chart(df: pd.DataFrame) -> Optional[Dict[str, Any]]:
     # 📈 TIME-SERIES: Time column + metrics → Line or Area Chart
     if time_cols and numeric_cols:
         x_col = time_cols[0]
-        labels = df[x_col].dt.strftime('%Y-%m-%d').tolist() if pd.api.types.is_datetime64_any_dtype(df[x_col]) else df[x_col].astype(str).tolist()
+        original_point_count = len(df)
+        df = _downsample(df, x_col, numeric_cols, max_points)
+        labels = _time_labels(df[x_col])
         
         # Multi-series support
         datasets = []
@@ -99,7 +212,7 @@ def suggest_chart(df: pd.DataFrame) -> Optional[Dict[str, Any]]:
         for idx, metric in enumerate(numeric_cols):
             datasets.append({
                 "label": metric,
-                "data": df[metric].tolist(),
+                "data": _values(df[metric]),
                 "borderColor": colors[idx % len(colors)],
                 "backgroundColor": colors[idx % len(colors)].replace('0.8', '0.2'),
                 "tension": 0.4,
@@ -112,6 +225,8 @@ def suggest_chart(df: pd.DataFrame) -> Optional[Dict[str, Any]]:
             "chart_type": chart_type,
             "labels": labels,
             "datasets": datasets,
+            "original_point_count": original_point_count,
+            "downsampled": len(df) < original_point_count,
         }
 
     # 📊 CATEGORY vs METRICS: Bar chart with multi-series support
@@ -131,7 +246,7 @@ def suggest_chart(df: pd.DataFrame) -> Optional[Dict[str, Any]]:
         for idx, metric in enumerate(numeric_cols):
             datasets.append({
                 "label": metric,
-                "data": df[metric].tolist(),
+                "data": _values(df[metric]),
                 "backgroundColor": colors[idx % len(colors)],
             })
         
@@ -149,7 +264,7 @@ def suggest_chart(df: pd.DataFrame) -> Optional[Dict[str, Any]]:
             "datasets": [
                 {
                     "label": numeric_cols[1],
-                    "data": df[numeric_cols[1]].tolist(),
+                    "data": _values(df[numeric_cols[1]]),
                     "borderColor": 'rgba(54, 162, 235, 0.8)',
                     "backgroundColor": 'rgba(54, 162, 235, 0.2)',
                     "tension": 0.4,
@@ -0,0 +1,170 @@
+"""
+compact.py — Opt-in compact JSON responses (``?format=compact``).
+
+Instead of row-major lists of arbitrary Python objects pushed through the
+pydantic / json encoder, a compact payload is:
+
+  - columnar: ``"data"`` holds one array per column
+  - dictionary-encoded: text and date columns become index arrays into one
+    top-level ``"labels"`` table, shared with the chart labels (which
+    mostly repeat the x column)
+  - pre-rendered: dates / datetimes are ISO-formatted once per distinct
+    value, Decimals become floats
+
+A dictionary-encoded column or label list is ``{"dict": [i, …]}``; ``null``
+entries stay ``null``. The body is serialised with orjson when installed
+and compressed with brotli or gzip (per Accept-Encoding) once it exceeds
+RESPONSE_COMPRESS_MIN_BYTES. Serialisation time and wire bytes are
+exported as Prometheus histograms.
+"""
+
+import gzip
+import json
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from backend.config import RESPONSE_COMPRESS_MIN_BYTES
+from backend.utils.metrics import RESPONSE_BYTES, SERIALIZE_LATENCY
+
+try:
+    import orjson
+except ImportError:              # optional: stdlib json fallback
+    orjson = None
+
+try:
+    import brotli
+except ImportError:              # optional: gzip only
+    brotli = None
+
+COMPACT_FORMAT = "compact-v1"
+
+
+class LabelTable:
+    """Shared string table; ``ref`` returns a string's index, adding it once."""
+
+    def __init__(self):
+        self.labels: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def ref(self, label: str) -> int:
+        i = self._index.get(label)
+        if i is None:
+            i = self._index[label] = len(self.labels)
+            self.labels.append(label)
+        return i
+
+    def encode(self, values: Sequence[Optional[str]]) -> Dict[str, List[Optional[int]]]:
+        return {"dict": [None if v is None else self.ref(v) for v in values]}
+
+
+def _render_column(values: Sequence[Any], table: LabelTable) -> Any:
+    """One result column: numbers stay a plain array, text / dates go through ``table``."""
+    rendered: List[Any] = []
+    iso: Dict[Any, str] = {}
+    textual = False
+    for v in values:
+        if isinstance(v, (datetime, date)):
+            s = iso.get(v)
+            if s is None:
+                s = iso[v] = v.isoformat()
+            rendered.append(s)
+            textual = True
+        elif isinstance(v, Decimal):
+            rendered.append(float(v))
+        elif isinstance(v, str):
+            rendered.append(v)
+            textual = True
+        else:
+            rendered.append(v)
+    if textual and all(v is None or isinstance(v, str) for v in rendered):
+        return table.encode(rendered)
+    return rendered
+
+
+def compact_columns(columns: List[str], rows: List[list], table: LabelTable) -> Dict[str, Any]:
+    """Row-major ``rows`` → ``{"columns", "data"}`` with one array per column."""
+    data = [_render_column(col, table) for col in zip(*rows)] if rows else [[] for _ in columns]
+    return {"columns": list(columns), "data": data}
+
+
+def compact_records(records: List[Dict[str, Any]], table: LabelTable) -> Dict[str, Any]:
+    """List of same-keyed dicts (KPI endpoints) → columnar form."""
+    columns = list(records[0]) if records else []
+    return compact_columns(columns, [[r.get(c) for c in columns] for r in records], table)
+
+
+def compact_chart(spec: Optional[Dict[str, Any]], table: LabelTable) -> Optional[Dict[str, Any]]:
+    """Chart spec with its labels moved into the shared table."""
+    if not spec:
+        return spec
+    out = dict(spec)
+    labels = spec.get("labels")
+    if labels is not None:
+        out["labels"] = table.encode([None if l is None else str(l) for l in labels])
+    return out
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_json_default, separators=(",", ":")).encode("utf-8")
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick "br" (if brotli is installed) or "gzip" from an Accept-Encoding header."""
+    offered = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            offered[name.lower()] = q
+    for encoding in (("br", "gzip") if brotli is not None else ("gzip",)):
+        if offered.get(encoding, offered.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+def compact_response(request: Request, endpoint: str, payload: Dict[str, Any]) -> Response:
+    """Serialise ``payload`` (with the format tag), compress if large, and record metrics."""
+    start = time.perf_counter()
+    body = dumps({"format": COMPACT_FORMAT, **payload})
+    encoding = None
+    if len(body) >= RESPONSE_COMPRESS_MIN_BYTES:
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+        body = compress(body, encoding)
+    SERIALIZE_LATENCY.labels(endpoint=endpoint, format="compact").observe(
+        time.perf_counter() - start)
+    RESPONSE_BYTES.labels(endpoint=endpoint, format="compact",
+                          encoding=encoding or "identity").observe(len(body))
+
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,12 +1,16 @@
-from typing import Tuple, List
+import threading
+from typing import Any, Iterator, List, NamedTuple, Optional, Tuple
 import pandas as pd
 from sqlalchemy import create_engine, text
-from sqlalchemy.engine import Engine
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
-from backend.config import DATABASE_URL
+from backend.config import DATABASE_URL, ASYNC_DATABASE_URL, SQL_MAX_ROWS
+from backend.utils.metrics import observe_sql, register_pool
 
 _engine: Engine = None
+_async_engine: AsyncEngine = None
 
 
 def _create_engine(db_url: str) -> Engine:
@@ -26,9 +30,34 @@ def get_engine() -> Engine:
     return _engine
 
 
-def run_sql(engine: Engine, sql: str) -> Tuple[List[str], List[list]]:
+def _async_url(db_url: str) -> str:
+    """Map a sync Postgres URL (psycopg2) onto the asyncpg driver."""
+    url = make_url(db_url)
+    if url.get_backend_name() == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg")
+    return url.render_as_string(hide_password=False)
+
+
+def get_async_engine() -> AsyncEngine:
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            ASYNC_DATABASE_URL or _async_url(DATABASE_URL),
+            pool_pre_ping=True,
+            pool_size=5,
+            max_overflow=10,
+            pool_timeout=30,
+        )
+    return _async_engine
+
+
+register_pool("sync", lambda: _engine.pool if _engine is not None else None)
+register_pool("async", lambda: _async_engine.sync_engine.pool if _async_engine is not None else None)
+
+
+def run_sql(engine: Engine, sql: str, label: str = "run_sql") -> Tuple[List[str], List[list]]:
     try:
-        with engine.connect() as conn:
+        with observe_sql(label), engine.connect() as conn:
             result = conn.execute(text(sql))
             rows = result.fetchall()
             cols = result.keys()
@@ -38,6 +67,262 @@ def run_sql(engine: Engine, sql: str) -> Tuple[List[str], List[list]]:
         raise RuntimeError(f"Database error: {e}") from e
 
 
+def _guard_statements(dialect: str, statement_timeout_ms: int, read_only: bool) -> list:
+    """
+    Transaction-scoped safety settings for agent SQL (Postgres only): a
+    read-only transaction and a per-statement timeout. Both are LOCAL to the
+    transaction, so they are gone when the connection returns to the pool.
+    """
+    if dialect != "postgresql":
+        return []
+    stmts = []
+    if read_only:
+        stmts.append(text("SET TRANSACTION READ ONLY"))   # must come first
+    if statement_timeout_ms:
+        stmts.append(text(f"SET LOCAL statement_timeout = {int(statement_timeout_ms)}"))
+    return stmts
+
+
+def _guard(conn, statement_timeout_ms: int, read_only: bool) -> None:
+    for stmt in _guard_statements(conn.dialect.name, statement_timeout_ms, read_only):
+        conn.execute(stmt)
+
+
+async def _aguard(conn, statement_timeout_ms: int, read_only: bool) -> None:
+    for stmt in _guard_statements(conn.dialect.name, statement_timeout_ms, read_only):
+        await conn.execute(stmt)
+
+
+# Postgres type OID → chart kind. Both psycopg2 and asyncpg report the OID
+# as the cursor description's type_code.
+_PG_TYPE_KINDS = {
+    1082: "time", 1114: "time", 1184: "time",                  # date, timestamp[tz]
+    20: "numeric", 21: "numeric", 23: "numeric",               # int8, int2, int4
+    700: "numeric", 701: "numeric", 1700: "numeric",           # float4, float8, numeric
+    16: "category", 18: "category", 19: "category",            # bool, char, name
+    25: "category", 1042: "category", 1043: "category",        # text, bpchar, varchar
+    2950: "category",                                          # uuid
+}
+
+
+def _column_kinds(result, dialect: str) -> Optional[List[Optional[str]]]:
+    """
+    "time" / "numeric" / "category" per column from the cursor description,
+    None per column whose type is not mapped, or None when the driver gives
+    no usable type codes (e.g. SQLite). Read after the first fetch: psycopg2
+    named cursors have no description before it.
+    """
+    if dialect != "postgresql":
+        return None
+    cursor = getattr(getattr(result, "_real_result", result), "cursor", None)
+    description = getattr(cursor, "description", None)
+    if not description:
+        return None
+    return [_PG_TYPE_KINDS.get(col[1]) for col in description]
+
+
+class BoundedResult(NamedTuple):
+    columns: List[str]
+    rows: List[list]
+    truncated: bool               # more rows existed beyond max_rows
+    total_rows: Optional[int]     # exact count when known, else None
+    column_kinds: Optional[List[Optional[str]]] = None   # see _column_kinds
+
+
+class StatementCancel:
+    """
+    Cancels a sync statement from another thread. ``run_sql_bounded``
+    attaches its connection while it runs; ``cancel`` then interrupts the
+    statement on the server — psycopg2's ``connection.cancel()`` (a
+    Postgres cancel request) or sqlite3's ``interrupt()`` — and a statement
+    that has not started yet is never sent.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dbapi_conn: Any = None
+        self.cancelled = False
+
+    def attach(self, conn) -> None:
+        with self._lock:
+            if self.cancelled:
+                raise RuntimeError("Statement cancelled before it started.")
+            self._dbapi_conn = conn.connection.dbapi_connection
+
+    def detach(self) -> None:
+        with self._lock:
+            self._dbapi_conn = None
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            dbapi_conn = self._dbapi_conn
+        if dbapi_conn is None:
+            return
+        interrupt = getattr(dbapi_conn, "cancel", None) or getattr(dbapi_conn, "interrupt", None)
+        if interrupt is not None:
+            try:
+                interrupt()
+            except Exception:
+                pass                      # the statement may have just finished
+
+
+def _count_sql(sql: str) -> str:
+    return f"SELECT COUNT(*) FROM ({sql.strip().rstrip(';')}) AS _bounded_q"
+
+
+def run_sql_bounded(
+    engine: Engine,
+    sql: str,
+    max_rows: int = SQL_MAX_ROWS,
+    count_total: bool = False,
+    label: str = "preview",
+    statement_timeout_ms: int = 0,
+    read_only: bool = False,
+    cancel: Optional[StatementCancel] = None,
+) -> BoundedResult:
+    """
+    Run ``sql`` but fetch at most ``max_rows`` rows.
+
+    Rows are streamed through a server-side cursor (``stream_results``) and
+    read with ``fetchmany(max_rows + 1)``; the extra row only detects
+    truncation. The total row count is free when the result fits, and costs
+    one COUNT(*) round-trip otherwise — only paid when ``count_total``.
+    ``cancel`` lets another thread abort the statement mid-flight.
+    """
+    try:
+        with observe_sql(label), engine.connect() as conn:
+            if cancel is not None:
+                cancel.attach(conn)
+            try:
+                _guard(conn, statement_timeout_ms, read_only)
+                result = conn.execution_options(
+                    stream_results=True, max_row_buffer=max_rows + 1
+                ).execute(text(sql))
+                cols = list(result.keys())
+                rows = result.fetchmany(max_rows + 1)
+                kinds = _column_kinds(result, conn.dialect.name)
+                result.close()
+
+                truncated = len(rows) > max_rows
+                rows = rows[:max_rows]
+                total_rows: Optional[int] = None if truncated else len(rows)
+                if truncated and count_total:
+                    total_rows = conn.execute(text(_count_sql(sql))).scalar()
+            finally:
+                if cancel is not None:
+                    cancel.detach()
+        return BoundedResult(cols, [list(r) for r in rows], truncated, total_rows, kinds)
+
+    except SQLAlchemyError as e:
+        raise RuntimeError(f"Database error: {e}") from e
+
+
+def _explain_stmt(sql: str, fmt_json: bool = False):
+    options = "(FORMAT JSON) " if fmt_json else ""
+    return text(f"EXPLAIN {options}{sql.strip().rstrip(';')}")
+
+
+def explain_sql(engine: Engine, sql: str, label: str = "explain", fmt_json: bool = False,
+                statement_timeout_ms: int = 0, read_only: bool = False) -> List[list]:
+    """
+    Plan ``sql`` without executing it (EXPLAIN, no ANALYZE). Raises on
+    syntax errors or unknown tables/columns — a cheap validity check.
+    ``fmt_json`` (Postgres) returns the plan tree with cost/row estimates.
+    """
+    try:
+        with observe_sql(label), engine.connect() as conn:
+            _guard(conn, statement_timeout_ms, read_only)
+            rows = conn.execute(_explain_stmt(sql, fmt_json)).fetchall()
+        return [list(r) for r in rows]
+
+    except SQLAlchemyError as e:
+        raise RuntimeError(f"Database error: {e}") from e
+
+
+def iter_sql_batches(
+    engine: Engine, sql: str, batch_size: int = 5000, read_only: bool = False,
+    statement_timeout_ms: int = 0,
+) -> Iterator[Tuple[List[str], List[list]]]:
+    """
+    Stream the full result of ``sql`` as ``(columns, rows)`` batches.
+
+    Uses ``yield_per`` (server-side cursor) so memory stays flat and the
+    first batch is available before the query has produced every row.
+    An empty result yields one ``(columns, [])`` batch so callers can still
+    write headers. The connection is held until the generator is exhausted
+    or closed. ``statement_timeout_ms`` bounds the whole export query
+    (Postgres), not each batch.
+    """
+    try:
+        with observe_sql("export"), engine.connect() as conn:
+            _guard(conn, statement_timeout_ms, read_only)
+            result = conn.execution_options(yield_per=batch_size).execute(text(sql))
+            cols = list(result.keys())
+            empty = True
+            for partition in result.partitions():
+                empty = False
+                yield cols, [list(r) for r in partition]
+            if empty:
+                yield cols, []
+
+    except SQLAlchemyError as e:
+        raise RuntimeError(f"Database error: {e}") from e
+
+
+async def arun_sql_bounded(
+    engine: AsyncEngine,
+    sql: str,
+    max_rows: int = SQL_MAX_ROWS,
+    count_total: bool = False,
+    label: str = "preview",
+    statement_timeout_ms: int = 0,
+    read_only: bool = False,
+) -> BoundedResult:
+    """Async twin of run_sql_bounded (``AsyncConnection.stream`` cursor)."""
+    try:
+        with observe_sql(label):
+            async with engine.connect() as conn:
+                await _aguard(conn, statement_timeout_ms, read_only)
+                result = await conn.stream(text(sql))
+                cols = list(result.keys())
+                rows = await result.fetchmany(max_rows + 1)
+                kinds = _column_kinds(result, conn.dialect.name)
+                await result.close()
+
+                truncated = len(rows) > max_rows
+                rows = rows[:max_rows]
+                total_rows: Optional[int] = None if truncated else len(rows)
+                if truncated and count_total:
+                    total_rows = (await conn.execute(text(_count_sql(sql)))).scalar()
+        return BoundedResult(cols, [list(r) for r in rows], truncated, total_rows, kinds)
+
+    except SQLAlchemyError as e:
+        raise RuntimeError(f"Database error: {e}") from e
+
+
+async def aexplain_sql(engine: AsyncEngine, sql: str, label: str = "explain",
+                       fmt_json: bool = False, statement_timeout_ms: int = 0,
+                       read_only: bool = False) -> List[list]:
+    """Async twin of explain_sql."""
+    try:
+        with observe_sql(label):
+            async with engine.connect() as conn:
+                await _aguard(conn, statement_timeout_ms, read_only)
+                rows = (await conn.execute(_explain_stmt(sql, fmt_json))).fetchall()
+        return [list(r) for r in rows]
+
+    except SQLAlchemyError as e:
+        raise RuntimeError(f"Database error: {e}") from e
+
+
+async def dispose_async_engine() -> None:
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+
+
 def run_sql_df(engine: Engine, sql: str) -> pd.DataFrame:
     cols, rows = run_sql(engine, sql)
     return pd.DataFrame(rows, columns=cols)
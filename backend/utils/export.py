@@ -0,0 +1,92 @@
+"""
+export.py — Incremental encoders for full-result exports.
+
+Each encoder consumes ``(columns, rows)`` batches (see
+``backend.utils.db.iter_sql_batches``) and yields bytes chunk by chunk, so a
+response can start streaming before the query finishes and memory stays
+flat regardless of result size.
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Iterable, Iterator, List, Tuple
+
+Batches = Iterable[Tuple[List[str], List[list]]]
+
+EXPORT_FORMATS = {
+    "csv":    ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "arrow":  ("application/vnd.apache.arrow.stream", "arrow"),
+}
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def iter_csv(batches: Batches) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    header_written = False
+    for cols, rows in batches:
+        if not header_written:
+            writer.writerow(cols)
+            header_written = True
+        writer.writerows(rows)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+
+
+def iter_ndjson(batches: Batches) -> Iterator[bytes]:
+    for cols, rows in batches:
+        if not rows:
+            continue
+        lines = [json.dumps(dict(zip(cols, row)), default=_json_default) for row in rows]
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def iter_arrow(batches: Batches) -> Iterator[bytes]:
+    """
+    Arrow IPC stream. The schema is inferred from the first batch; columns
+    that are all-NULL there are typed as strings. Requires ``pyarrow``.
+    """
+    import pyarrow as pa
+
+    sink = io.BytesIO()
+    writer = None
+    schema = None
+
+    def drain() -> bytes:
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    for cols, rows in batches:
+        columns = {c: [row[i] for row in rows] for i, c in enumerate(cols)}
+        if schema is None:
+            inferred = pa.Table.from_pydict(columns).schema
+            schema = pa.schema([
+                pa.field(f.name, pa.string() if pa.types.is_null(f.type) else f.type)
+                for f in inferred
+            ])
+            writer = pa.ipc.new_stream(sink, schema)
+        if rows:
+            writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=schema))
+        yield drain()
+
+    if writer is not None:
+        writer.close()
+        yield drain()
+
+
+def encode(fmt: str, batches: Batches) -> Iterator[bytes]:
+    return {"csv": iter_csv, "ndjson": iter_ndjson, "arrow": iter_arrow}[fmt](batches)
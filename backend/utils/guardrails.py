@@ -1,21 +1,24 @@
-import re
-from typing import Tuple, List
+from typing import Tuple, List, Optional
 
-DANGEROUS_PATTERNS = [
-    r"\bDELETE\b",
-    r"\bUPDATE\b",
-    r"\bINSERT\b",
-    r"\bDROP\b",
-    r"\bALTER\b",
-    r"\bTRUNCATE\b",
-    r"\bCREATE\b",
-    r"\bGRANT\b",
-]
+from backend.utils.sql_analysis import SQLAnalysis, analyze_sql
 
-def check_sql_safety(sql: str) -> Tuple[bool, List[str]]:
+READ_STATEMENTS = ("select", "union", "intersect", "except")
+
+
+def check_sql_safety(sql: str, analysis: Optional[SQLAnalysis] = None) -> Tuple[bool, List[str]]:
+    """
+    Allow exactly one read-only query. Works on the parsed statement, so
+    words like "update" inside string literals or identifiers are harmless
+    and stacked statements are caught. Unparsable SQL is blocked.
+    """
+    a = analysis if analysis is not None else analyze_sql(sql)
     reasons: List[str] = []
-    upper = sql.upper()
-    for pattern in DANGEROUS_PATTERNS:
-        if re.search(pattern, upper):
-            reasons.append(f"Matched dangerous pattern: {pattern}")
+    if a.error is not None:
+        reasons.append(f"Could not parse SQL: {a.error}")
+    if a.statement_count > 1:
+        reasons.append(f"Multiple statements ({a.statement_count}); only one query is allowed.")
+    if a.error is None and a.statement_type not in READ_STATEMENTS:
+        reasons.append(f"Statement type {a.statement_type.upper()} is not allowed.")
+    for op in a.write_ops:
+        reasons.append(f"Contains a write operation: {op}")
     return (len(reasons) == 0, reasons)
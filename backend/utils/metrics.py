@@ -0,0 +1,199 @@
+"""
+metrics.py — Prometheus instrumentation for the agent, SQL and KPI paths.
+
+Histograms give per-stage latency distributions (p50/p95/p99 via
+``histogram_quantile`` on the scrape side):
+
+  bi_copilot_node_latency_seconds{node}    every LangGraph node
+  bi_copilot_sql_latency_seconds{query}    run_sql & friends, KPI queries
+
+Counters track retries, guardrail blocks, cache hits/misses and SQL errors;
+compact responses record serialisation time and wire bytes;
+connection-pool gauges and the query-log writer's queue depth and
+written / dropped / failed counts are read at scrape time.
+Everything is served by ``/metrics`` in the Prometheus text format.
+"""
+
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Sub-10 ms guardrail/chart nodes up to multi-second LLM calls.
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+NODE_LATENCY = Histogram(
+    "bi_copilot_node_latency_seconds",
+    "Wall time spent in each LangGraph node.",
+    ["node"],
+    buckets=_BUCKETS,
+)
+SQL_LATENCY = Histogram(
+    "bi_copilot_sql_latency_seconds",
+    "Wall time of SQL executions, by query label.",
+    ["query"],
+    buckets=_BUCKETS,
+)
+SQL_ERRORS = Counter(
+    "bi_copilot_sql_errors_total",
+    "SQL executions that raised, by query label.",
+    ["query"],
+)
+RETRIES = Counter(
+    "bi_copilot_retries_total",
+    "SQL self-correction retries issued by retry_sql.",
+)
+GUARDRAIL_BLOCKS = Counter(
+    "bi_copilot_guardrail_blocks_total",
+    "SQL candidates rejected by the guardrail.",
+)
+COST_GATE_REJECTIONS = Counter(
+    "bi_copilot_cost_gate_rejections_total",
+    "SQL candidates rejected by the EXPLAIN cost gate.",
+)
+HEDGE_WINS = Counter(
+    "bi_copilot_hedge_wins_total",
+    "Hedged SQL executions by the index of the winning candidate ('none' = all failed).",
+    ["candidate"],
+)
+SERIALIZE_LATENCY = Histogram(
+    "bi_copilot_response_serialize_seconds",
+    "Time to serialise (and compress) a response body, by endpoint and format.",
+    ["endpoint", "format"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+RESPONSE_BYTES = Histogram(
+    "bi_copilot_response_bytes",
+    "Response body size on the wire, by endpoint, format and content encoding.",
+    ["endpoint", "format", "encoding"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+CACHE_LOOKUPS = Counter(
+    "bi_copilot_cache_lookups_total",
+    "Cache lookups by cache and outcome (hit / miss).",
+    ["cache", "result"],
+)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+@contextmanager
+def observe_sql(query: str) -> Iterator[None]:
+    """Time one SQL execution under ``query``; errors are counted, then re-raised."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        SQL_ERRORS.labels(query=query).inc()
+        raise
+    finally:
+        SQL_LATENCY.labels(query=query).observe(time.perf_counter() - start)
+
+
+def timed_node(name: str, fn: Callable) -> Callable:
+    """Wrap a (sync or async) LangGraph node so its latency lands in NODE_LATENCY."""
+    hist = NODE_LATENCY.labels(node=name)
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(state):
+            start = time.perf_counter()
+            try:
+                return await fn(state)
+            finally:
+                hist.observe(time.perf_counter() - start)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(state):
+        start = time.perf_counter()
+        try:
+            return fn(state)
+        finally:
+            hist.observe(time.perf_counter() - start)
+    return wrapper
+
+
+# -- DB pool gauges -----------------------------------------------------------
+
+_POOLS: Dict[str, Callable[[], Optional[object]]] = {}
+
+
+def register_pool(name: str, getter: Callable[[], Optional[object]]) -> None:
+    """``getter`` returns the current QueuePool (or None if not created yet)."""
+    _POOLS[name] = getter
+
+
+class _PoolCollector:
+    """Reads pool occupancy at scrape time — no polling thread."""
+
+    def collect(self):
+        size = GaugeMetricFamily("bi_copilot_db_pool_size",
+                                 "Configured pool size.", labels=["pool"])
+        checked_out = GaugeMetricFamily("bi_copilot_db_pool_checked_out",
+                                        "Connections currently in use.", labels=["pool"])
+        checked_in = GaugeMetricFamily("bi_copilot_db_pool_checked_in",
+                                       "Idle connections in the pool.", labels=["pool"])
+        overflow = GaugeMetricFamily("bi_copilot_db_pool_overflow",
+                                     "Connections above pool_size (negative = headroom).",
+                                     labels=["pool"])
+        for name, getter in _POOLS.items():
+            pool = getter()
+            if pool is None or not hasattr(pool, "checkedout"):
+                continue
+            size.add_metric([name], pool.size())
+            checked_out.add_metric([name], pool.checkedout())
+            checked_in.add_metric([name], pool.checkedin())
+            overflow.add_metric([name], pool.overflow())
+        yield from (size, checked_out, checked_in, overflow)
+
+
+REGISTRY.register(_PoolCollector())
+
+
+# -- Query-log writer ---------------------------------------------------------
+
+_QUERY_LOG_STATS: Optional[Callable[[], Dict[str, int]]] = None
+
+
+def register_query_log(stats: Callable[[], Dict[str, int]]) -> None:
+    """``stats`` returns QueryLogWriter.stats(): queued / written / dropped / failed."""
+    global _QUERY_LOG_STATS
+    _QUERY_LOG_STATS = stats
+
+
+class _QueryLogCollector:
+    """Reads the query-log writer's counters at scrape time."""
+
+    def collect(self):
+        if _QUERY_LOG_STATS is None:
+            return
+        stats = _QUERY_LOG_STATS()
+        queued = GaugeMetricFamily("bi_copilot_query_log_queued",
+                                   "Query log records waiting to be written.")
+        queued.add_metric([], stats["queued"])
+        records = CounterMetricFamily("bi_copilot_query_log_records",
+                                      "Query log records by outcome.", labels=["outcome"])
+        for outcome in ("written", "dropped", "failed"):
+            records.add_metric([outcome], stats[outcome])
+        yield from (queued, records)
+
+
+REGISTRY.register(_QueryLogCollector())
+
+
+def render_metrics() -> tuple:
+    """(body, content_type) for the /metrics endpoint."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,154 @@
+"""
+query_log.py — Non-blocking, batched writer for the query_logs table.
+
+Request handlers hand a plain dict to ``submit`` and return immediately.
+A daemon thread drains the bounded queue and writes rows as one multi-row
+INSERT per batch — flushed when QUERY_LOG_BATCH_SIZE rows are waiting or
+QUERY_LOG_FLUSH_S seconds have passed, whichever comes first. When the
+queue is full the record is dropped and counted rather than slowing the
+request; ``stop`` drains whatever is left on shutdown. ``stats`` feeds the
+query-log series on /metrics.
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import column, insert, table
+
+from backend.utils.db import get_engine
+
+logger = logging.getLogger("bi_copilot")
+
+_QUERY_LOGS = table(
+    "query_logs",
+    column("user_email"), column("question"), column("chosen_sql"),
+    column("success"), column("error"),
+    column("tft_ms"), column("tfr_ms"), column("total_latency_ms"),
+    column("safety_blocked"), column("retried"),
+)
+
+_STOP = object()
+
+
+class QueryLogWriter:
+    """Bounded queue + background flusher for query_logs rows."""
+
+    def __init__(self, maxsize: int = 10000, batch_size: int = 200, flush_s: float = 1.0):
+        self.batch_size = max(1, batch_size)
+        self.flush_s = flush_s
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.accepted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    # -- producer side ---------------------------------------------------------
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        """Enqueue one row; never blocks. Returns False if it was dropped."""
+        try:
+            self._queue.put_nowait(record)
+            with self._lock:
+                self.accepted += 1
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+                dropped = self.dropped
+            # Log the first drop and then every 1000th, not every one.
+            if dropped == 1 or dropped % 1000 == 0:
+                logger.warning("Query log queue full — %d record(s) dropped so far.", dropped)
+            return False
+
+    # -- consumer side ---------------------------------------------------------
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        if not batch:
+            return
+        try:
+            engine = get_engine()
+            with engine.begin() as conn:
+                conn.execute(insert(_QUERY_LOGS), batch)
+            with self._lock:
+                self.written += len(batch)
+        except Exception as exc:
+            # Never let a logging failure take the writer thread down.
+            with self._lock:
+                self.failed += len(batch)
+            logger.error("Failed to save %d query log(s): %s", len(batch), exc)
+
+    def _run(self) -> None:
+        batch: List[Dict[str, Any]] = []
+        deadline = time.monotonic() + self.flush_s
+        while True:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                # Drain whatever is still queued, then exit.
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP:
+                        batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        self._write(batch)
+                        batch = []
+                self._write(batch)
+                return
+
+            if item is not None:
+                batch.append(item)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._write(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_s
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="query-log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout_s: float = 10.0) -> None:
+        """Flush remaining records and stop the writer thread (bounded by ``timeout_s``)."""
+        if self._thread is None:
+            return
+        try:
+            # The sentinel may have to wait for room when the queue is full.
+            self._queue.put(_STOP, timeout=timeout_s)
+        except queue.Full:
+            logger.error("Query log writer stalled — %d record(s) left unflushed.",
+                         self._unflushed())
+        else:
+            self._thread.join(timeout=timeout_s)
+            if self._thread.is_alive():
+                logger.error("Query log writer did not finish within %.1f s — "
+                             "%d record(s) left unflushed.", timeout_s, self._unflushed())
+        self._thread = None
+        logger.info("Query log writer stopped: %d written, %d dropped, %d failed.",
+                    self.written, self.dropped, self.failed)
+
+    def _unflushed(self) -> int:
+        """Accepted records not yet written or failed (queued or in the current batch)."""
+        with self._lock:
+            return self.accepted - self.written - self.failed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }
@@ -0,0 +1,50 @@
+"""
+result_cache.py — Table-aware cache of SQL results.
+
+Entries are keyed by the normalized SQL from ``analyze_sql`` (so trivially
+different spellings share one entry) and remember which tables the query
+reads, so an ETL load into e.g. ``machine_production_daily`` can
+drop exactly the entries that depend on it via ``invalidate_tables``.
+"""
+
+import logging
+from typing import Iterable, Optional
+
+from backend.config import RESULT_CACHE_SIZE, RESULT_CACHE_TTL_S
+from backend.utils.cache import TTLCache
+from backend.utils.db import BoundedResult
+from backend.utils.metrics import record_cache
+from backend.utils.sql_analysis import SQLAnalysis, analyze_sql
+
+logger = logging.getLogger("bi_copilot")
+
+_RESULT_CACHE = TTLCache(maxsize=RESULT_CACHE_SIZE, ttl_s=RESULT_CACHE_TTL_S)
+
+
+def get_cached_result(sql: str, analysis: Optional[SQLAnalysis] = None) -> Optional[BoundedResult]:
+    a = analysis if analysis is not None else analyze_sql(sql)
+    entry = _RESULT_CACHE.get(a.normalized)
+    record_cache("result", entry is not None)
+    return None if entry is None else entry[1]
+
+
+def cache_result(sql: str, result: BoundedResult, analysis: Optional[SQLAnalysis] = None) -> None:
+    a = analysis if analysis is not None else analyze_sql(sql)
+    _RESULT_CACHE.set(a.normalized, (a.tables, result))
+
+
+def invalidate_tables(tables: Iterable[str]) -> int:
+    """Drop every cached result that reads any of ``tables``."""
+    wanted = {t.lower() for t in tables}
+    dropped = _RESULT_CACHE.invalidate_where(lambda _k, v: bool(v[0] & wanted))
+    logger.info("Result cache: invalidated %d entr(y/ies) for tables %s",
+                dropped, sorted(wanted))
+    return dropped
+
+
+def clear_result_cache() -> None:
+    _RESULT_CACHE.clear()
+
+
+def result_cache_stats() -> dict:
+    return _RESULT_CACHE.stats()
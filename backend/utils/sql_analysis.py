@@ -0,0 +1,122 @@
+"""
+sql_analysis.py — Parse-once SQL analysis shared by the agent pipeline.
+
+``analyze_sql`` parses a statement once (sqlglot) and returns everything
+downstream stages need:
+
+  statement_type   "select", "union", "insert", "drop", … ("unknown" if unparsable)
+  statement_count  > 1 for stacked payloads like ``SELECT 1; DROP TABLE t``
+  tables/columns   referenced names, lower-cased (CTE names excluded)
+  has_limit        top-level LIMIT / FETCH FIRST present
+  normalized       canonical SQL text (literals kept) — the result-cache key
+  fingerprint      hash of the normalized SQL with literals replaced by
+                   placeholders — groups queries of the same shape in logs
+  write_ops        anything that is not a plain read: DML/DDL statements,
+                   writable CTEs, SELECT … INTO, FOR UPDATE/SHARE
+  statement        the parsed first statement (None if unparsable)
+
+The guardrail, the result cache, the cost gate's LIMIT injection
+(``with_limit``, which rewrites the parsed tree) and the logs all read this
+instead of rescanning the text. Results are memoised per
+SQL string, so callers outside the graph do not parse again either.
+"""
+
+import functools
+import hashlib
+import re
+from typing import FrozenSet, NamedTuple, Optional, Tuple
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import ParseError, TokenError
+
+from backend.config import SQL_ANALYSIS_CACHE_SIZE, SQL_PARSE_DIALECT
+
+# Statements that may appear anywhere in the tree (e.g. a writable CTE).
+_WRITE_NODES = (exp.Insert, exp.Update, exp.Delete, exp.Merge, exp.Create, exp.Drop,
+                exp.Alter, exp.TruncateTable, exp.Grant, exp.Copy, exp.Command)
+
+
+class SQLAnalysis(NamedTuple):
+    sql: str
+    statement_type: str
+    statement_count: int
+    tables: FrozenSet[str]
+    columns: FrozenSet[str]
+    has_limit: bool
+    normalized: str
+    fingerprint: str
+    write_ops: Tuple[str, ...]
+    error: Optional[str] = None       # parse error, if any
+    statement: Optional[exp.Expression] = None
+
+
+def _fingerprint(stmt: exp.Expression, dialect: str) -> str:
+    shape = stmt.transform(
+        lambda node: exp.Placeholder() if isinstance(node, exp.Literal) else node
+    ).sql(dialect=dialect, normalize=True)
+    return hashlib.sha1(shape.encode("utf-8")).hexdigest()[:16]
+
+
+def _write_ops(stmt: exp.Expression) -> Tuple[str, ...]:
+    ops = [type(node).__name__.upper() for node in stmt.find_all(*_WRITE_NODES)]
+    if isinstance(stmt, exp.Select):
+        if stmt.args.get("into"):
+            ops.append("SELECT INTO")
+        if stmt.args.get("locks"):
+            ops.append("FOR UPDATE/SHARE")
+    return tuple(dict.fromkeys(ops))
+
+
+def _unparsed(sql: str, error: str) -> SQLAnalysis:
+    normalized = re.sub(r"\s+", " ", sql.strip().rstrip(";")).strip()
+    return SQLAnalysis(
+        sql=sql, statement_type="unknown", statement_count=1,
+        tables=frozenset(), columns=frozenset(), has_limit=False,
+        normalized=normalized,
+        fingerprint=hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16],
+        write_ops=(), error=error,
+    )
+
+
+@functools.lru_cache(maxsize=SQL_ANALYSIS_CACHE_SIZE)
+def analyze_sql(sql: str, dialect: str = SQL_PARSE_DIALECT) -> SQLAnalysis:
+    """Parse ``sql`` once and describe it. Never raises: parse errors land in ``error``."""
+    try:
+        statements = [s for s in sqlglot.parse(sql, read=dialect) if s is not None]
+    except (ParseError, TokenError) as exc:
+        return _unparsed(sql, str(exc).splitlines()[0])
+    if not statements:
+        return _unparsed(sql, "Empty statement.")
+
+    stmt = statements[0]
+    ctes = {cte.alias_or_name.lower() for cte in stmt.find_all(exp.CTE)}
+    tables = {t.name.lower() for t in stmt.find_all(exp.Table) if t.name} - ctes
+    columns = {c.name.lower() for c in stmt.find_all(exp.Column) if c.name}
+    write_ops = tuple(dict.fromkeys(op for s in statements for op in _write_ops(s)))
+
+    return SQLAnalysis(
+        sql=sql,
+        statement_type=type(stmt).__name__.lower(),
+        statement_count=len(statements),
+        tables=frozenset(tables),
+        columns=frozenset(columns),
+        has_limit=isinstance(stmt, exp.Query) and stmt.args.get("limit") is not None,
+        normalized=";\n".join(s.sql(dialect=dialect, normalize=True) for s in statements),
+        fingerprint=_fingerprint(stmt, dialect),
+        write_ops=write_ops,
+        statement=stmt,
+    )
+
+
+def with_limit(analysis: SQLAnalysis, limit: int,
+               dialect: str = SQL_PARSE_DIALECT) -> Optional[str]:
+    """
+    The analysed query with a top-level ``LIMIT limit``, rendered from the
+    parsed tree (so trailing comments cannot swallow it). None when it
+    already has a LIMIT or is not a single parsed query.
+    """
+    stmt = analysis.statement
+    if analysis.has_limit or analysis.statement_count != 1 or not isinstance(stmt, exp.Query):
+        return None
+    return stmt.limit(limit).sql(dialect=dialect)
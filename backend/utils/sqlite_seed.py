@@ -0,0 +1,57 @@
+"""
+sqlite_seed.py — A seeded SQLite stand-in for the app's tables.
+
+Used by the in-process load test and the test suite, so neither needs a
+Postgres instance: ``seed_sqlite`` creates users, machine_production_daily,
+maintenance_logs and query_logs and fills ``days`` days of data ending
+today (deterministic, seeded RNG).
+"""
+
+import random
+import sqlite3
+from datetime import date, timedelta
+
+_ISSUES = ("Hydraulic leak", "Sensor fault", "Belt wear", "Overheating", "Tool change")
+
+
+def seed_sqlite(path: str, email: str, password_hash: str, days: int = 60,
+                machines: int = 20) -> None:
+    """Minimal stand-in for the tables the app touches."""
+    rng = random.Random(0)
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY, email TEXT UNIQUE, hashed_password TEXT,
+            role TEXT DEFAULT 'operator', is_active BOOLEAN DEFAULT 1
+        );
+        CREATE TABLE IF NOT EXISTS machine_production_daily (
+            production_date DATE, machine_id INTEGER,
+            units_produced INTEGER, rejected_units INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS maintenance_logs (
+            log_date TIMESTAMP, issue_type TEXT, downtime_minutes INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS query_logs (
+            id INTEGER PRIMARY KEY, user_email TEXT, question TEXT, chosen_sql TEXT,
+            success BOOLEAN, error TEXT, tft_ms REAL, tfr_ms REAL,
+            total_latency_ms REAL, safety_blocked BOOLEAN, retried BOOLEAN
+        );
+    """)
+    conn.execute("INSERT OR REPLACE INTO users (email, hashed_password) VALUES (?, ?)",
+                 (email, password_hash))
+    today = date.today()
+    production = []
+    for d in range(days):
+        for m in range(machines):
+            units = rng.randint(200, 1000)
+            production.append(((today - timedelta(days=d)).isoformat(), m, units,
+                               rng.randint(0, units // 10)))
+    conn.executemany("INSERT INTO machine_production_daily VALUES (?, ?, ?, ?)", production)
+    conn.executemany(
+        "INSERT INTO maintenance_logs VALUES (?, ?, ?)",
+        [((today - timedelta(days=d)).isoformat() + " 08:00:00",
+          rng.choice(_ISSUES), rng.randint(5, 240))
+         for d in range(days) for _ in range(rng.randint(0, 4))],
+    )
+    conn.commit()
+    conn.close()
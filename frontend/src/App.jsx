@@ -1,4 +1,3 @@
-import axios from "axios";
 import React, { useState } from 'react';
 import { Line, Bar, Pie } from 'react-chartjs-2';
 import {
@@ -155,15 +154,52 @@ const QarshiCopilot = () => {
   setError('');
   setResponse(null);
   try {
-    const res = await axios.post(
-      "http://127.0.0.1:8000/agent/nl2sql",  // ✅ full URL, no /api prefix
-      { question },
-      { headers: { Authorization: `Bearer ${token}` } }
-    );
-    setResponse(res.data);  // ✅ axios uses res.data, not res.json()
+    // Server-sent events: render SQL, rows, chart and explanation as each
+    // agent stage completes instead of waiting for the whole pipeline.
+    const res = await fetch(`${API_BASE}/agent/nl2sql/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        Authorization: `Bearer ${token}`,
+      },
+      body: JSON.stringify({ question }),
+    });
+    if (!res.ok) {
+      const body = await res.json().catch(() => ({}));
+      throw new Error(body.detail || `Request failed (${res.status})`);
+    }
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    const apply = (event, data) => {
+      if (event === 'error') throw new Error(data.detail);
+      setResponse((prev) => ({
+        tft_ms: 0, tfr_ms: 0, total_latency_ms: 0,
+        ...(prev || {}),
+        ...data,
+      }));
+    };
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let sep;
+      while ((sep = buffer.indexOf('\n\n')) !== -1) {
+        const chunk = buffer.slice(0, sep);
+        buffer = buffer.slice(sep + 2);
+        let event = 'message';
+        let data = '';
+        for (const line of chunk.split('\n')) {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        }
+        if (data) apply(event, JSON.parse(data));
+      }
+    }
   } catch (e) {
-    // ✅ axios errors come from e.response
-    setError(e.response?.data?.detail || e.message || 'An unexpected error occurred.');
+    setError(e.message || 'An unexpected error occurred.');
   } finally {
     setLoading(false);
   }
@@ -201,7 +237,8 @@ const QarshiCopilot = () => {
           </tbody>
         </table>
         <p className="text-xs text-gray-400 px-4 py-2">
-          Showing up to 20 rows · Query time {response.tfr_ms.toFixed(1)} ms
+          Showing {r.preview_rows.length}
+          {r.truncated ? ` of ${r.total_rows ?? 'many'}` : ''} rows · Query time {response.tfr_ms.toFixed(1)} ms
         </p>
       </div>
     );
@@ -0,0 +1,23 @@
+"""
+Test environment: a seeded SQLite database and the stub LLM, set before
+any ``backend`` module reads its configuration. Install
+requirements-dev.txt (pytest, and aiosqlite for the async engine on SQLite).
+"""
+
+import os
+import tempfile
+
+_DB_PATH = os.path.join(tempfile.mkdtemp(prefix="bi_copilot_test_"), "test.db")
+
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_DB_PATH}",
+    "ASYNC_DATABASE_URL": f"sqlite+aiosqlite:///{_DB_PATH}",
+    "LLM_BACKEND": "stub",
+    "LLM_STUB_LATENCY_MS": "0",
+    "KPI_ROLLUP_ENABLED": "false",
+    "SQL_HEDGE_ENABLED": "false",
+})
+
+from backend.utils.sqlite_seed import seed_sqlite  # noqa: E402
+
+seed_sqlite(_DB_PATH, "tester@example.com", "unused")
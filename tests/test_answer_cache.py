@@ -0,0 +1,80 @@
+"""
+Refreshed answer-cache hits go back through the cost gate and read fresh
+rows, not the SQL result cache.
+"""
+
+import asyncio
+import sqlite3
+
+import pytest
+
+from backend.agent import nodes, runner
+from backend.agent.llm import StubLLM
+from backend.config import DATABASE_URL
+from backend.utils.result_cache import clear_result_cache
+
+SQL = "SELECT machine_id, units_produced FROM machine_production_daily WHERE machine_id = 7777"
+
+
+@pytest.fixture(autouse=True)
+def _isolated(monkeypatch):
+    monkeypatch.setattr(nodes, "_ensure_llm", lambda: StubLLM(sql=SQL, latency_ms=0))
+    runner.clear_answer_cache()
+    clear_result_cache()
+    conn = sqlite3.connect(DATABASE_URL.split("///", 1)[1])
+    yield conn
+    conn.execute("DELETE FROM machine_production_daily WHERE machine_id = 7777")
+    conn.commit()
+    conn.close()
+    runner.clear_answer_cache()
+    clear_result_cache()
+
+
+def _add_row(conn, units):
+    conn.execute("INSERT INTO machine_production_daily VALUES (date('now'), 7777, ?, 0)",
+                 (units,))
+    conn.commit()
+
+
+def _gated(monkeypatch, name):
+    calls = []
+    gate = getattr(runner, name)
+
+    def recording(state):
+        calls.append(state.get("bypass_result_cache"))
+        return gate(state)
+
+    monkeypatch.setattr(runner, name, recording)
+    return calls
+
+
+def test_refresh_reads_fresh_rows(monkeypatch, _isolated):
+    calls = _gated(monkeypatch, "cost_gate")
+    _add_row(_isolated, 100)
+    first = runner.run_agent("units for machine 7777", refresh_data=False)
+    assert len(first["executed_results"][0]["preview_rows"]) == 1
+
+    _add_row(_isolated, 200)
+    refreshed = runner.run_agent("units for machine 7777", refresh_data=True)
+
+    assert refreshed["metadata"]["cache_hit"] is True
+    assert calls == [True]
+    result = refreshed["executed_results"][0]
+    assert result["cache_hit"] is False
+    assert len(result["preview_rows"]) == 2
+
+
+def test_async_refresh_reads_fresh_rows(monkeypatch, _isolated):
+    calls = _gated(monkeypatch, "acost_gate")     # the wrapper hands back the coroutine
+    _add_row(_isolated, 100)
+
+    async def run():
+        await runner.arun_agent("units for machine 7777", refresh_data=False)
+        _add_row(_isolated, 200)
+        return await runner.arun_agent("units for machine 7777", refresh_data=True)
+
+    refreshed = asyncio.run(run())
+
+    assert refreshed["metadata"]["cache_hit"] is True
+    assert calls == [True]
+    assert len(refreshed["executed_results"][0]["preview_rows"]) == 2
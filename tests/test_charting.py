@@ -0,0 +1,40 @@
+"""
+suggest_chart column classification and metric values.
+"""
+
+from datetime import date
+from decimal import Decimal
+
+import pandas as pd
+
+from backend.utils.charting import suggest_chart
+
+
+def test_text_month_column_is_a_time_axis():
+    # TO_CHAR(production_date, 'YYYY-MM') AS month: the driver reports text.
+    df = pd.DataFrame({"month": ["2024-01", "2024-02", "2024-03"], "units": [10, 12, 9]})
+    spec = suggest_chart(df, ["category", "numeric"])
+    assert spec["chart_type"] == "line"
+    assert spec["labels"] == ["2024-01-01", "2024-02-01", "2024-03-01"]
+
+
+def test_time_named_text_that_is_not_dates_stays_a_category():
+    df = pd.DataFrame({"shift_time": ["early", "late"], "units": [10, 12]})
+    spec = suggest_chart(df, ["category", "numeric"])
+    assert spec["chart_type"] == "pie"
+    assert spec["labels"] == ["early", "late"]
+
+
+def test_db_kinds_are_used():
+    df = pd.DataFrame({"production_date": [date(2024, 1, 1), date(2024, 1, 2)],
+                       "oee": [Decimal("91.5"), Decimal("92.0")]})
+    spec = suggest_chart(df, ["time", "numeric"])
+    assert spec["chart_type"] == "line"
+    assert spec["datasets"][0]["data"] == [91.5, 92.0]
+
+
+def test_unconvertible_metric_values_become_none():
+    df = pd.DataFrame({"line": ["A", "B", "C"],
+                       "oee": [Decimal("91.5"), "n/a", None]})
+    spec = suggest_chart(df, ["category", "numeric"])
+    assert spec["datasets"][0]["data"] == [91.5, None, None]
@@ -0,0 +1,57 @@
+"""
+check_sql_safety: exactly one read-only query, judged on the parse tree.
+"""
+
+import pytest
+
+from backend.utils.guardrails import check_sql_safety
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT a FROM t",
+    "SELECT a FROM t;",
+    "SELECT a FROM t UNION SELECT b FROM u",
+    "SELECT a FROM t INTERSECT SELECT a FROM u",
+    "WITH x AS (SELECT a FROM t) SELECT a FROM x",
+    # write keywords inside literals / quoted identifiers are only text
+    "SELECT 'drop table t; update u set a = 1' AS note FROM t",
+    "SELECT a FROM t WHERE note LIKE '%DELETE FROM%'",
+    'SELECT "update", "insert" FROM t',
+])
+def test_allowed(sql):
+    assert check_sql_safety(sql) == (True, [])
+
+
+@pytest.mark.parametrize("sql, reason", [
+    # stacked statements
+    ("SELECT 1; DROP TABLE t", "Multiple statements (2)"),
+    ("SELECT 1; SELECT 2", "Multiple statements (2)"),
+    # writable CTEs
+    ("WITH d AS (DELETE FROM t RETURNING *) SELECT * FROM d", "write operation: DELETE"),
+    ("WITH i AS (INSERT INTO t VALUES (1) RETURNING a) SELECT a FROM i",
+     "write operation: INSERT"),
+    ("WITH u AS (UPDATE t SET a = 1 RETURNING a) SELECT a FROM u", "write operation: UPDATE"),
+    # SELECT … INTO and row locks
+    ("SELECT a INTO new_t FROM t", "write operation: SELECT INTO"),
+    ("SELECT a FROM t FOR UPDATE", "write operation: FOR UPDATE/SHARE"),
+    ("SELECT a FROM t FOR SHARE", "write operation: FOR UPDATE/SHARE"),
+    # plain DML / DDL
+    ("INSERT INTO t VALUES (1)", "Statement type INSERT"),
+    ("UPDATE t SET a = 1", "Statement type UPDATE"),
+    ("DELETE FROM t", "Statement type DELETE"),
+    ("DROP TABLE t", "Statement type DROP"),
+    ("CREATE TABLE x AS SELECT 1", "Statement type CREATE"),
+    ("TRUNCATE t", "write operation: TRUNCATETABLE"),
+    ("GRANT ALL ON t TO someone", "Statement type GRANT"),
+    # session / transaction control and COPY
+    ("COPY t TO '/tmp/t.csv'", "Statement type COPY"),
+    ("SET statement_timeout = 0", "Statement type SET"),
+    ("BEGIN", "Statement type TRANSACTION"),
+    ("COMMIT", "Statement type COMMIT"),
+    # unparsable
+    ("SELEC a FROM (", "Could not parse SQL"),
+])
+def test_blocked(sql, reason):
+    is_safe, reasons = check_sql_safety(sql)
+    assert not is_safe
+    assert any(reason in r for r in reasons), reasons
@@ -0,0 +1,46 @@
+"""
+Sync hedged execution: losing statements are cancelled on the database,
+and SQL the cost gate already planned is not EXPLAINed again.
+"""
+
+import time
+
+from backend.agent import nodes
+from backend.utils.db import get_engine
+
+FAST_SQL = "SELECT machine_id FROM machine_production_daily LIMIT 1"
+# Counts to 10^8: runs for many seconds unless interrupted.
+SLOW_SQL = ("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n "
+            "WHERE i < 100000000) SELECT max(i) FROM n")
+
+
+def _state(**extra):
+    return {"trace_id": "hedge-test", "sql_candidates": [SLOW_SQL, FAST_SQL], **extra}
+
+
+def test_losers_are_cancelled(monkeypatch):
+    monkeypatch.setattr(nodes, "SQL_HEDGE_ENABLED", True)
+    engine = get_engine()
+
+    update = nodes.execute_sql_node(_state())
+
+    assert update["chosen_sql"] == FAST_SQL
+    deadline = time.monotonic() + 5.0
+    while engine.pool.checkedout() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert engine.pool.checkedout() == 0
+
+
+def test_cost_gate_plans_are_reused(monkeypatch):
+    monkeypatch.setattr(nodes, "SQL_HEDGE_ENABLED", True)
+    explained = []
+    explain = nodes.explain_sql
+    monkeypatch.setattr(nodes, "explain_sql",
+                        lambda engine, sql, **kw: explained.append(sql) or explain(engine, sql, **kw))
+    state = {"trace_id": "hedge-test",
+             "sql_candidates": [FAST_SQL, FAST_SQL + " OFFSET 1"],
+             "cost_planned": [FAST_SQL]}
+
+    nodes.execute_sql_node(state)
+
+    assert FAST_SQL not in explained
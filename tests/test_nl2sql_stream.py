@@ -0,0 +1,87 @@
+"""
+Event order of /agent/nl2sql/stream, driven end to end (astream_agent on
+the async graph) with the stub LLM against SQLite.
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from backend.agent import nodes
+from backend.agent.llm import StubLLM
+from backend.agent.runner import clear_answer_cache
+from backend.app import NLQueryResponse, app
+from backend.auth.router import get_current_user
+
+GOOD_SQL = "SELECT production_date, units_produced FROM machine_production_daily"
+BAD_SQL = "SELECT no_such_column FROM machine_production_daily"
+
+
+@pytest.fixture(autouse=True)
+def _isolated(monkeypatch):
+    app.dependency_overrides[get_current_user] = lambda: {"email": "tester@example.com",
+                                                          "role": "admin"}
+    clear_answer_cache()
+    yield
+    app.dependency_overrides.clear()
+    clear_answer_cache()
+
+
+def _use_sql(monkeypatch, sql: str) -> None:
+    monkeypatch.setattr(nodes, "_ensure_llm", lambda: StubLLM(sql=sql, latency_ms=0))
+
+
+def _stream(question: str):
+    """[(event, data)] from one streamed request."""
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            resp = await client.post("/agent/nl2sql/stream", json={"question": question})
+            assert resp.status_code == 200
+            return resp.text
+
+    events = []
+    for block in asyncio.run(run()).strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_stream_order(monkeypatch):
+    _use_sql(monkeypatch, GOOD_SQL)
+    events = _stream("daily units")
+
+    assert [e for e, _ in events] == ["sql", "rows", "chart", "explanation", "done"]
+    data = dict(events)
+    assert data["rows"]["result"]["success"] is True
+    assert data["explanation"]["explanation"]
+
+    done = NLQueryResponse.model_validate(data["done"])
+    assert done.chosen_sql == GOOD_SQL
+    assert done.result is not None and done.result.success
+    assert done.result.columns == ["production_date", "units_produced"]
+    assert done.explanation == data["explanation"]["explanation"]
+    assert done.chart is not None
+
+
+def test_stream_order_on_cache_hit(monkeypatch):
+    _use_sql(monkeypatch, GOOD_SQL)
+    _stream("daily units")
+    events = _stream("daily units")
+
+    assert [e for e, _ in events] == ["sql", "rows", "chart", "explanation", "done"]
+    assert NLQueryResponse.model_validate(events[-1][1]).cache_hit is True
+
+
+def test_stream_order_with_retry(monkeypatch):
+    _use_sql(monkeypatch, BAD_SQL)
+    events = _stream("broken question")
+
+    assert [e for e, _ in events] == [
+        "sql", "rows", "sql", "rows", "chart", "explanation", "done",
+    ]
+    assert events[2][1]["retry"] is True
+    done = NLQueryResponse.model_validate(events[-1][1])
+    assert done.result is not None and not done.result.success
@@ -0,0 +1,44 @@
+"""
+QueryLogWriter shutdown must stay bounded when the database stalls.
+"""
+
+import threading
+import time
+
+from backend.utils.query_log import QueryLogWriter
+
+
+def _stalled_writer(maxsize: int):
+    writer = QueryLogWriter(maxsize=maxsize, batch_size=1, flush_s=0.05)
+    release = threading.Event()
+    writer._write = lambda batch: release.wait()
+    writer.start()
+    return writer, release
+
+
+def test_stop_returns_when_queue_is_full(caplog):
+    writer, release = _stalled_writer(maxsize=2)
+    try:
+        writer.submit({})
+        time.sleep(0.1)                      # first record is stuck in _write
+        assert writer.submit({}) and writer.submit({})
+        assert not writer.submit({})         # queue full → dropped
+
+        start = time.monotonic()
+        writer.stop(timeout_s=0.3)
+        assert time.monotonic() - start < 2.0
+        assert "3 record(s) left unflushed" in caplog.text
+        assert writer.stats() == {"queued": 2, "written": 0, "dropped": 1, "failed": 0}
+    finally:
+        release.set()
+
+
+def test_stop_flushes_pending_records():
+    writer = QueryLogWriter(maxsize=10, batch_size=100, flush_s=60)
+    batches = []
+    writer._write = lambda batch: batches.append(list(batch))
+    writer.start()
+    for i in range(5):
+        writer.submit({"i": i})
+    writer.stop(timeout_s=5)
+    assert [r["i"] for b in batches for r in b] == [0, 1, 2, 3, 4]
@@ -0,0 +1,30 @@
+"""
+The async agent path must not introspect the database on the event loop
+when the schema snapshot is cold.
+"""
+
+import asyncio
+import threading
+
+from backend.agent import nodes
+from backend.agent.runner import arun_agent, clear_answer_cache
+
+
+def test_cold_schema_is_built_off_the_event_loop(monkeypatch):
+    builds = []
+    build = nodes._SCHEMA._build
+
+    def recording_build(engine, version):
+        builds.append(threading.current_thread())
+        return build(engine, version)
+
+    monkeypatch.setattr(nodes._SCHEMA, "_snapshot", None)
+    monkeypatch.setattr(nodes._SCHEMA, "_snapshot_path", "")
+    monkeypatch.setattr(nodes._SCHEMA, "_build", recording_build)
+    clear_answer_cache()
+
+    state = asyncio.run(arun_agent("daily units"))
+
+    assert builds and builds[0] is not threading.main_thread()
+    assert len(builds) == 1
+    assert state["schema_version"] == nodes._SCHEMA.version
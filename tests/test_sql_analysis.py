@@ -0,0 +1,61 @@
+"""
+analyze_sql and the cost gate's LIMIT rewrite.
+"""
+
+import pytest
+
+from backend.utils.sql_analysis import analyze_sql, with_limit
+
+
+@pytest.mark.parametrize("sql, has_limit", [
+    ("SELECT a FROM t LIMIT 5", True),
+    ("SELECT a FROM t FETCH FIRST 5 ROWS ONLY", True),
+    ("SELECT a FROM t UNION SELECT a FROM u LIMIT 5", True),
+    ("SELECT a FROM t", False),
+    # a LIMIT below the top level does not bound the result
+    ("SELECT * FROM (SELECT a FROM t LIMIT 5) AS s", False),
+    ("SELECT a FROM t WHERE a IN (SELECT b FROM u LIMIT 1)", False),
+    ("WITH x AS (SELECT a FROM t LIMIT 5) SELECT a FROM x", False),
+    ("(SELECT a FROM t LIMIT 5) UNION ALL SELECT a FROM u", False),
+])
+def test_has_limit_is_top_level_only(sql, has_limit):
+    assert analyze_sql(sql).has_limit is has_limit
+
+
+def test_analysis_fields():
+    a = analyze_sql("WITH x AS (SELECT a, b FROM t) SELECT x.a FROM x JOIN u ON u.id = x.b")
+    assert a.statement_type == "select" and a.statement_count == 1
+    assert a.tables == {"t", "u"}          # CTE names excluded
+    assert {"a", "b", "id"} <= a.columns
+    assert a.error is None and a.write_ops == ()
+
+
+def test_fingerprint_ignores_literals_normalized_keeps_them():
+    a = analyze_sql("SELECT a FROM t WHERE b = 1")
+    b = analyze_sql("select a from t where b = 2")
+    assert a.fingerprint == b.fingerprint
+    assert a.normalized != b.normalized
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT a FROM t", "SELECT a FROM t LIMIT 100"),
+    ("SELECT a FROM t;", "SELECT a FROM t LIMIT 100"),
+    ("SELECT a FROM t -- every row", "SELECT a FROM t /* every row */ LIMIT 100"),
+    ("SELECT a FROM t UNION SELECT b FROM u", "SELECT a FROM t UNION SELECT b FROM u LIMIT 100"),
+    ("WITH x AS (SELECT a FROM t) SELECT a FROM x ORDER BY a",
+     "WITH x AS (SELECT a FROM t) SELECT a FROM x ORDER BY a LIMIT 100"),
+    ("SELECT * FROM (SELECT a FROM t LIMIT 5) AS s",
+     "SELECT * FROM (SELECT a FROM t LIMIT 5) AS s LIMIT 100"),
+])
+def test_with_limit(sql, expected):
+    assert with_limit(analyze_sql(sql), 100) == expected
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT a FROM t LIMIT 5",
+    "SELECT a FROM t; SELECT b FROM u",
+    "DELETE FROM t",
+    "SELEC a FROM (",
+])
+def test_with_limit_leaves_sql_alone(sql):
+    assert with_limit(analyze_sql(sql), 100) is None